@@ -9,7 +9,7 @@ if settings.options.verbose:
 
 # Import the actual model
 from .defaults      import * # Depends on settings
-from .misc          import * # Depends on version
+from .misc          import * # Depends on version, defaults
 from .parameters    import * # Depends on settings, misc
 from .utils         import * # Depends on defaults
 from .plotting      import * # Depends on defaults, misc
@@ -43,6 +43,15 @@ class Analyzer(sc.prettyobj):
         return
 
 
+    def people_fields(self):
+        '''
+        Return the people fields that the analyzer needs beyond those stored with
+        every people profile (see pars['people_profile']), e.g. 'date_exposed' or
+        'infection_log', so the sim can check they are stored before it runs.
+        '''
+        return []
+
+
     def apply(self, sim):
         '''
         Apply analyzer at each time point. The analyzer has full access to the
@@ -174,6 +183,8 @@ class age_histogram(Analyzer):
         agehist = cv.age_histogram(sim=sim)
     '''
 
+    default_states = ['exposed', 'dead', 'tested', 'diagnosed'] # The states to record if none are supplied
+
     def __init__(self, days=None, states=None, edges=None, datafile=None, sim=None, die=True, **kwargs):
         super().__init__(**kwargs) # Initialize the Analyzer object
         self.days      = days # To be converted to integer representations
@@ -223,7 +234,7 @@ class age_histogram(Analyzer):
 
         # Handle states
         if self.states is None:
-            self.states = ['exposed', 'dead', 'tested', 'diagnosed']
+            self.states = self.default_states[:]
         self.states = sc.promotetolist(self.states)
         for s,state in enumerate(self.states):
             self.states[s] = state.replace('date_', '') # Allow keys starting with date_ as input, but strip it off here
@@ -241,6 +252,12 @@ class age_histogram(Analyzer):
         return
 
 
+    def people_fields(self):
+        ''' The dates of the recorded states '''
+        states = self.default_states if self.states is None else sc.promotetolist(self.states)
+        return [f'date_{state.replace("date_", "")}' for state in states]
+
+
     def apply(self, sim):
         for ind in cvi.find_day(self.days, sim.t):
             date = self.dates[ind] # Find the date for this index
@@ -398,6 +415,11 @@ class daily_stats(Analyzer):
         return
 
 
+    def people_fields(self):
+        ''' New infections are found from their dates, and their sources from the infection log '''
+        return ['date_exposed', 'infection_log']
+
+
     def intersect(self, *args):
         '''
         Compute the intersection between arrays of indices, handling either keys
@@ -440,7 +462,7 @@ class daily_stats(Analyzer):
                 stats.stocks[key] = len(self.inds[key])
 
             # Transmission stats
-            newinfs = cvu.true(ppl.date_exposed == sim.t)
+            newinfs = ppl.on_date('date_exposed', sim.t)
             stats.trans.new_infections = len(newinfs)
             for key in ['known_contact', 'quarantined']:
                 stats.trans[key] = len(self.intersect(newinfs, key))
@@ -449,8 +471,8 @@ class daily_stats(Analyzer):
 
             # Source stats
             inflog = sim.people.infection_log
-            infloginds = [i for i,e in enumerate(inflog) if (e['date']==sim.t and e['source'] is not None)] # Person was infected today and was not a seed infection
-            sourceinds = list(set([inflog[i]['source'] for i in infloginds]))
+            infloginds = cvu.true((inflog.date == sim.t) & (inflog.source >= 0)) # Person was infected today and was not a seed infection
+            sourceinds = np.unique(inflog.source[infloginds])
             stats.source.new_sources = len(sourceinds)
             for key in self.keys:
                 stats.source[key] = len(self.intersect(sourceinds, key))
@@ -458,7 +480,7 @@ class daily_stats(Analyzer):
                     stats.empty.source.append(key)
 
             # Testing stats
-            newtests = cvu.true(ppl.date_tested == sim.t)
+            newtests = ppl.on_date('date_tested', sim.t)
             stats.test.new_tests = len(newtests)
             for key in self.keys:
                 stats.test[key] = len(self.intersect(newtests,key))
@@ -466,9 +488,9 @@ class daily_stats(Analyzer):
                     stats.empty.test.append(key)
 
             # Quarantine stats
-            q_inds = np.union1d(self.inds['quarantined'], cvu.true(ppl.date_end_quarantine == sim.t)) # Append people who finished quarantine today
-            eq_inds = cvu.true(ppl.date_quarantined == sim.t-1) # People entering quarantine the day before (their first full day of quarantine)
-            fq_inds = cvu.true(ppl.date_end_quarantine == sim.t+1) # People finishing quarantine; +1 since on the date of quarantine end, they are released back and can get infected at normal rates
+            q_inds = np.union1d(self.inds['quarantined'], ppl.on_date('date_end_quarantine', sim.t)) # Append people who finished quarantine today
+            eq_inds = ppl.on_date('date_quarantined', sim.t-1) # People entering quarantine the day before (their first full day of quarantine)
+            fq_inds = ppl.on_date('date_end_quarantine', sim.t+1) # People finishing quarantine; +1 since on the date of quarantine end, they are released back and can get infected at normal rates
             stats.quar.in_quarantine = len(q_inds) # Similar to stats.quar.quarantined, but slightly more
             stats.quar.entered_quar  = len(eq_inds)
             stats.quar.finished_quar = len(fq_inds)
@@ -489,8 +511,9 @@ class daily_stats(Analyzer):
             stats.extra.per_presymp = stats.extra.presymp*per_factor
             stats.extra.per_asymp   = stats.extra.asymp*per_factor
             stats.layer_counts = {k:0 for k in sim.layer_keys()}
-            for i in infloginds:
-                stats.layer_counts[inflog[i]['layer']] += 1
+            codes, counts = np.unique(inflog.layer_code[infloginds], return_counts=True)
+            for code,count in zip(codes, counts):
+                stats.layer_counts[inflog.layer_keys[code]] += count
 
             # Calculate extras for quarantine testing
             t_inds = newtests # Everyone who tested this timestep
@@ -1027,15 +1050,13 @@ class TransTree(sc.prettyobj):
         self.source_dates = [None for i in range(self.pop_size)]
         self.target_dates = [[]   for i in range(self.pop_size)]
 
-        for entry in self.infection_log:
-            source = entry['source']
-            target = entry['target']
-            date   = entry['date']
-            if source:
-                self.sources[target] = source # Each target has at most one source
-                self.targets[source].append(target) # Each source can have multiple targets
-                self.source_dates[target] = date # Each target has at most one source
-                self.target_dates[source].append(date) # Each source can have multiple targets
+        log = self.infection_log
+        has_source = log.source >= 0 # Skip seed infections
+        for source,target,date in zip(log.source[has_source].tolist(), log.target[has_source].tolist(), log.date[has_source].tolist()):
+            self.sources[target] = source # Each target has at most one source
+            self.targets[source].append(target) # Each source can have multiple targets
+            self.source_dates[target] = date # Each target has at most one source
+            self.target_dates[source].append(date) # Each source can have multiple targets
 
         # Count the number of targets each person has
         self.n_targets = self.count_targets()
@@ -1082,10 +1103,9 @@ class TransTree(sc.prettyobj):
 
         This excludes edges corresponding to seeded infections without a source
         """
-        output = []
-        for d in self.infection_log:
-            if d['source'] is not None:
-                output.append([d['source'], d['target']])
+        log = self.infection_log
+        has_source = log.source >= 0
+        output = np.column_stack([log.source[has_source], log.target[has_source]]).tolist()
         return output
 
 
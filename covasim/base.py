@@ -4,6 +4,7 @@ People and Sim classes (e.g. loading, saving, key lookups, etc.), so those class
 can be focused on the disease-specific functionality.
 '''
 
+import copyreg
 import numpy as np
 import pandas as pd
 import sciris as sc
@@ -16,7 +17,7 @@ from . import parameters as cvpar
 from .settings import options as cvo
 
 # Specify all externally visible classes this file defines
-__all__ = ['ParsObj', 'Result', 'BaseSim', 'BasePeople', 'Person', 'FlexDict', 'Contacts', 'Layer']
+__all__ = ['ParsObj', 'Result', 'BaseSim', 'BasePeople', 'Person', 'FlexDict', 'Contacts', 'Layer', 'InfectionLog', 'PackedState', 'IntDays']
 
 
 #%% Define simulation classes
@@ -272,6 +273,7 @@ class BaseSim(ParsObj):
         if seed != -1:
             self['rand_seed'] = seed
         cvu.set_seed(self['rand_seed'])
+        self.rng = cvu.RandStreams(self['rand_seed']) # Counter-based random number streams, used if pars['rand_streams'] is True
         return
 
     @property
@@ -573,9 +575,9 @@ class BaseSim(ParsObj):
             shrunken_sim (Sim): a Sim object with the listed attributes removed
         '''
 
-        # By default, skip people (~90% of memory), the popdict (which is usually empty anyway), and _orig_pars (which is just a backup)
+        # By default, skip people (~90% of memory), the popdict (which is usually empty anyway), _orig_pars (which is just a backup), the viral load (which is recalculated each timestep), and the initial people (used by sim.rewind())
         if skip_attrs is None:
-            skip_attrs = ['popdict', 'people', '_orig_pars']
+            skip_attrs = ['popdict', 'people', '_orig_pars', '_viral_load', '_initial_people']
 
         # Create the new object, and copy original dict, skipping the skipped attributes
         if in_place:
@@ -800,6 +802,8 @@ class BasePeople(FlexPretty):
             return self.__dict__[key]
         except:
             errormsg = f'Key "{key}" is not a valid attribute of people'
+            if key in self.meta.disabled:
+                errormsg = f'Key "{key}" is not stored with the people profile "{self.meta.profile}"; use pars["people_profile"] = "full" to store it'
             raise AttributeError(errormsg)
 
 
@@ -826,8 +830,9 @@ class BasePeople(FlexPretty):
     def __add__(self, people2):
         ''' Combine two people arrays '''
         newpeople = sc.dcp(self)
-        for key in self.keys():
-            newpeople.set(key, np.concatenate([newpeople[key], people2[key]]), die=False) # Allow size mismatch
+        combined = {key:np.concatenate([newpeople[key], people2[key]]) for key in self.keys()} # Combine everything first, since packed states share an array
+        for key,value in combined.items():
+            newpeople.set(key, value, die=False) # Allow size mismatch
 
         # Validate
         newpeople.pop_size += people2.pop_size
@@ -1109,9 +1114,15 @@ class BasePeople(FlexPretty):
             if lkey not in self.contacts:
                 self.contacts[lkey] = Layer()
 
-            # Actually include them, and update properties if supplied
+            # Actually include them, and update properties if supplied; static layers are written straight to files if memory-mapped (see people.memmap_contacts())
+            memmap = self.pars.get('people_storage') == 'memmap' and not self.pars.get('dynam_layer', {}).get(lkey)
             for col in self.contacts[lkey].keys(): # Loop over the supplied columns
-                self.contacts[lkey][col] = np.concatenate([self.contacts[lkey][col], new_layer[col]])
+                arrs = [self.contacts[lkey][col], np.asarray(new_layer[col])]
+                if memmap:
+                    out = cvm.memmap_array(shape=(len(arrs[0]) + len(arrs[1]),), dtype=np.result_type(*arrs)).view(np.ndarray)
+                    self.contacts[lkey][col] = np.concatenate(arrs, out=out)
+                else:
+                    self.contacts[lkey][col] = np.concatenate(arrs)
             self.contacts[lkey].validate()
 
         return
@@ -1271,8 +1282,103 @@ class Contacts(FlexDict):
         return
 
 
+    def __getstate__(self):
+        ''' Don't copy or save the edge table, since the layers' arrays would be saved separately anyway '''
+        state = self.__dict__.copy()
+        state.pop('_edge_table', None)
+        return state
+
+
+    def consolidate(self):
+        '''
+        Store the p1, p2, and beta arrays of every layer in a single edge table,
+        with an extra column ("layer") giving the index of each edge's layer in
+        contacts.keys(). The edges of each layer are contiguous, in the same order
+        as in the layer, and each layer's arrays are replaced by views of its slice
+        of the table, so the layers work as before and modifying their values in
+        place also modifies the table. Other keys of the layers are not included,
+        and layers whose beta is stored as a single value (see layer.compact_beta())
+        keep it.
+
+        The table is a Layer, so e.g. table.find_contacts() or table.to_df() apply to
+        all layers at once. It is for analysis only: the simulation itself uses
+        the layers, so consolidating doesn't change the results. It is valid until
+        a layer or one of its arrays is replaced (e.g. by a dynamic layer being
+        updated, or by clip_edges()); use contacts.edge_table() to get the table,
+        consolidating again if needed. If any of the layers are stored in files
+        (see cv.memmap_array()), so is the table.
+
+        Returns:
+            table (Layer): the edge table
+
+        **Example**::
+
+            table = sim.people.contacts.consolidate()
+            df = table.to_df() # All edges in a single dataframe
+            contacts_of_0 = table.find_contacts(0) # In any layer
+        '''
+        lkeys = self.keys()
+        keys = ['p1', 'p2', 'beta']
+        table = Layer()
+        table.meta['layer'] = np.int8 if len(lkeys) <= np.iinfo(np.int8).max else cvd.default_int # Use a compact dtype for the layer index if possible
+        lens = [len(self[lkey][table.basekey]) for lkey in lkeys]
+        bounds = np.cumsum([0] + lens)
+        memmap = any(cvm.is_memmap(self[lkey][key]) for lkey in lkeys for key in keys)
+        for key in keys + ['layer']:
+            shape = (bounds[-1],)
+            table[key] = cvm.memmap_array(shape=shape, dtype=table.meta[key]).view(np.ndarray) if memmap else np.empty(shape, dtype=table.meta[key])
+        for l,lkey in enumerate(lkeys): # Copy each layer into its slice, rather than concatenating, so memory-mapped layers aren't copied into memory
+            start, stop = bounds[l], bounds[l+1]
+            for key in keys:
+                table[key][start:stop] = self[lkey][key]
+            table['layer'][start:stop] = l
+
+        # Replace the layers' arrays with views of the table
+        views = {}
+        for l,lkey in enumerate(lkeys):
+            start, stop = bounds[l], bounds[l+1]
+            layer = self[lkey]
+            for key in keys:
+                if not cvm.is_scalar_array(layer[key]):
+                    layer[key] = table[key][start:stop]
+            views[lkey] = [layer[key] for key in keys]
+        self._edge_table = dict(table=table, views=views)
+        return table
+
+
+    def edge_table(self):
+        '''
+        Return the edge table of all layers (see contacts.consolidate()), or consolidate
+        the layers again if any of them have been replaced since it was made.
+        '''
+        edges = getattr(self, '_edge_table', None)
+        valid = edges is not None and self.keys() == list(edges['views'].keys())
+        if valid:
+            for lkey,views in edges['views'].items():
+                layer = self[lkey]
+                if any(layer[key] is not view for key,view in zip(['p1', 'p2', 'beta'], views)):
+                    valid = False
+                    break
+        if valid:
+            return edges['table']
+        else:
+            return self.consolidate()
+
+
 class Layer(FlexDict):
-    ''' A small class holding a single layer of contacts '''
+    '''
+    A small class holding a single layer of contacts
+
+    If beta is supplied as a single value, it is used for every edge, and only
+    stored once (see layer.compact_beta()).
+
+    **Example**::
+
+        layer = cv.Layer(p1=[0,1,2], p2=[3,4,5], beta=1.0)
+    '''
+
+    _index   = None # The edge index, if one has been built; see get_index()
+    _version = 0    # Incremented whenever p1 or p2 is set, so the edge index is rebuilt
 
     def __init__(self, **kwargs):
         self.meta = {
@@ -1289,10 +1395,20 @@ class Layer(FlexDict):
         # Set data, if provided
         for key,value in kwargs.items():
             self[key] = np.array(value, dtype=self.meta[key])
+        for key,value in kwargs.items(): # Expand single values once the number of edges is known
+            if key != self.basekey and np.ndim(value) == 0:
+                self[key] = cvm.scalar_array(value, len(self), dtype=self.meta[key])
 
         return
 
 
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in ['p1', 'p2']:
+            self._version += 1
+        return
+
+
     def __len__(self):
         try:
             return len(self[self.basekey])
@@ -1318,14 +1434,21 @@ class Layer(FlexDict):
         Returns: True if person index appears in any interactions
 
         """
-        return (item in self['p1']) or (item in self['p2'])
+        index = self.valid_index()
+        if index is None or not isinstance(item, (int, np.integer)):
+            return (item in self['p1']) or (item in self['p2'])
+        offsets = index['offsets']
+        return 0 <= item < len(offsets)-1 and offsets[item+1] > offsets[item] # Use the edge index rather than checking every edge
 
     @property
     def members(self):
         """
         Return sorted array of all members
         """
-        return np.unique([self['p1'], self['p2']])
+        index = self.valid_index()
+        if index is None:
+            return np.unique([self['p1'], self['p2']])
+        return np.flatnonzero(np.diff(index['offsets'])).astype(cvd.default_int) # Everyone with at least one edge
 
 
     def meta_keys(self):
@@ -1333,6 +1456,96 @@ class Layer(FlexDict):
         return self.meta.keys()
 
 
+    def __getstate__(self):
+        '''
+        Don't copy or save the edge index, since it can be rebuilt; values that are
+        only stored once (see compact_beta()) are copied or saved as a single value
+        '''
+        attrs = self.__dict__.copy()
+        attrs.pop('_index', None)
+        values = {}
+        scalar_lens = {}
+        for key,arr in self.items():
+            if cvm.is_scalar_array(arr):
+                values[key] = arr[0]
+                scalar_lens[key] = len(arr)
+            else:
+                values[key] = arr
+        return dict(attrs=attrs, values=values, scalar_lens=scalar_lens)
+
+
+    def __setstate__(self, state):
+        ''' Restore the layer, storing values that were only stored once in the same way '''
+        if 'attrs' not in state: # Saved by an earlier version: the state is just the attributes, and the values have already been restored as items
+            self.__dict__.update(state)
+            return
+        self.__dict__.update(state['attrs'])
+        for key,value in state['values'].items():
+            if key in state['scalar_lens']:
+                value = cvm.scalar_array(value, state['scalar_lens'][key], dtype=value.dtype)
+            self[key] = value
+        return
+
+
+    def __reduce_ex__(self, protocol):
+        ''' Copy or save the values with the rest of the state (see __getstate__()), rather than as separate items '''
+        return (copyreg.__newobj__, (self.__class__,), self.__getstate__())
+
+
+    def get_index(self, n=None, rebuild=False):
+        '''
+        Return an index from each person to the edges they are part of (as either
+        p1 or p2), so that the contacts of a small number of people can be found
+        without checking every edge. The edges of person i are
+        edges[offsets[i]:offsets[i+1]].
+
+        The index is stored and reused until p1 or p2 is set (e.g. by
+        layer.pop_inds() or layer.append()). If the arrays are instead modified
+        in place, set them again (e.g. layer['p1'] = layer['p1']) or call
+        layer.get_index() with rebuild=True. Once built, the index is also used
+        by layer.find_contacts(), layer.members, and "ind in layer"; these check
+        every edge if there is no index, rather than building one.
+
+        Args:
+            n (int): the number of people (default: the number used for the stored index, or else one more than the largest index in the layer)
+            rebuild (bool): whether to rebuild the index even if the arrays have not been replaced
+
+        Returns:
+            offsets, edges (int[]): the index arrays
+
+        **Example**::
+
+            offsets, edges = sim.people.contacts['h'].get_index(len(sim.people))
+            contacts_of_0 = edges[offsets[0]:offsets[1]]
+        '''
+        p1 = self['p1']
+        p2 = self['p2']
+        index = self.valid_index()
+        if n is None:
+            n = index['n'] if index is not None else int(max(p1.max(initial=-1), p2.max(initial=-1))) + 1
+        if rebuild or index is None or index['n'] < n:
+            offsets, edges = cvu.build_edge_index(p1, p2, n)
+            index = dict(p1=p1, p2=p2, len=len(p1), version=self._version, n=n, offsets=offsets, edges=edges)
+            self._index = index
+        return index['offsets'], index['edges']
+
+
+    def valid_index(self):
+        ''' Return the stored edge index (see get_index()) if there is one and p1 and p2 haven't been set since it was built, otherwise None '''
+        index = self._index
+        if index is not None and index['version'] == self._version and index['p1'] is self['p1'] and index['p2'] is self['p2'] and index['len'] == len(self['p1']):
+            return index
+        return None
+
+
+    def share_index(self, other):
+        ''' Use the edge index of another layer with the same p1 and p2 arrays, if it has a valid one, rather than building another '''
+        index = other.valid_index()
+        if index is not None and self['p1'] is other['p1'] and self['p2'] is other['p2']:
+            self._index = dict(index, version=self._version)
+        return
+
+
     def validate(self):
         ''' Check the integrity of the layer: right types, right lengths '''
         n = len(self[self.basekey])
@@ -1360,8 +1573,13 @@ class Layer(FlexDict):
         '''
         output = {}
         for key in self.meta_keys():
-            output[key] = self[key][inds] # Copy to the output object
-            self[key] = np.delete(self[key], inds) # Remove from the original
+            arr = self[key]
+            if key != self.basekey and cvm.is_scalar_array(arr): # Keep values that are only stored once (see compact_beta()); the base key is done first, so it gives the lengths
+                output[key] = cvm.scalar_array(arr[0], len(output[self.basekey]), dtype=arr.dtype)
+                self[key] = cvm.scalar_array(arr[0], len(self[self.basekey]), dtype=arr.dtype)
+            else:
+                output[key] = arr[inds] # Copy to the output object
+                self[key] = np.delete(arr, inds) # Remove from the original
         return output
 
 
@@ -1377,11 +1595,43 @@ class Layer(FlexDict):
             n_curr = len(self[key]) # Current number of contacts
             n_new = len(new_arr) # New contacts to add
             n_total = n_curr + n_new # New size
+            if cvm.is_scalar_array(new_arr) and (not n_curr or (cvm.is_scalar_array(self[key]) and self[key][0] == new_arr[0])): # Keep values that are only stored once
+                self[key] = cvm.scalar_array(new_arr[0], n_total, dtype=self[key].dtype)
+                continue
             self[key] = np.resize(self[key], n_total) # Resize to make room, preserving dtype
             self[key][n_curr:] = new_arr # Copy contacts into the layer
         return
 
 
+    def scalar_beta(self):
+        ''' Return the beta of every edge if it is stored as a single value (see compact_beta()), otherwise None '''
+        beta = self['beta']
+        return beta[0] if cvm.is_scalar_array(beta) else None
+
+
+    def compact_beta(self):
+        '''
+        If every edge has the same beta, store it as a single value (see cv.scalar_array())
+        rather than one value per edge. This saves memory for large layers, and
+        transmission is calculated without looking up each edge's beta; results
+        are identical. Since the value is only stored once, setting the beta of
+        any edge in place (e.g. layer['beta'][0] = 0.5) sets the beta of every
+        edge; to change the beta of some edges, replace the array instead. Called
+        automatically for each layer if pars['scalar_beta'] is True.
+
+        Returns:
+            Whether the beta is stored as a single value
+        '''
+        beta = self['beta']
+        if cvm.is_scalar_array(beta):
+            return True
+        elif len(beta) and (beta == beta[0]).all():
+            self['beta'] = cvm.scalar_array(beta[0], len(beta), dtype=beta.dtype)
+            return True
+        else:
+            return False
+
+
     def to_df(self):
         ''' Convert to dataframe '''
         df = pd.DataFrame.from_dict(self)
@@ -1427,10 +1677,425 @@ class Layer(FlexDict):
         if inds.dtype != np.int64: # This is int64 since indices often come from cv.true(), which returns int64
             inds = np.array(inds, dtype=np.int64)
 
-        # Find the contacts
-        contact_inds = cvu.find_contacts(self['p1'], self['p2'], inds)
-        if as_array:
-            contact_inds = np.fromiter(contact_inds, dtype=cvd.default_int)
-            contact_inds.sort()  # Sorting ensures that the results are reproducible for a given seed as well as being identical to previous versions of Covasim
+        # Find the contacts, using the edge index if there is one so only the edges of these people are checked
+        index = self.valid_index()
+        if index is not None:
+            contact_inds = cvu.find_contacts_index(index['offsets'], index['edges'], self['p1'], self['p2'], inds)
+            if as_array:
+                contact_inds = np.unique(contact_inds) # Sorting ensures that the results are reproducible for a given seed as well as being identical to previous versions of Covasim
+            else:
+                contact_inds = set(contact_inds.tolist())
+        else:
+            contact_inds = cvu.find_contacts(self['p1'], self['p2'], inds)
+            if as_array:
+                contact_inds = np.fromiter(contact_inds, dtype=cvd.default_int)
+                contact_inds.sort() # As above
 
         return contact_inds
+
+
+class InfectionLog:
+    '''
+    A record of infections, stored as arrays of sources, targets, dates, and layers
+    (as integer codes), which grow as needed. Seed infections and importations have
+    a source of -1. For backwards compatibility, the log can also be used as a list
+    of dicts with keys source, target, date, and layer (with a source of None for
+    seed infections), e.g. infection_log[0] or [e['target'] for e in infection_log],
+    but for large numbers of infections the arrays are much faster.
+
+    Args:
+        entries (list): if supplied, a list of dicts to initialize the log with
+
+    **Examples**::
+
+        log = sim.people.infection_log
+        sources = log.source[log.date == 10] # Everyone who infected someone on day 10
+        df = log.to_df()
+    '''
+
+    def __init__(self, entries=None):
+        self.n = 0 # Number of infections recorded
+        self.layer_keys = [] # The layer key corresponding to each layer code
+        self._layer_codes = {} # The reverse mapping
+        self._source = np.empty(0, dtype=cvd.default_int)
+        self._target = np.empty(0, dtype=cvd.default_int)
+        self._date   = np.empty(0, dtype=cvd.default_int)
+        self._layer  = np.empty(0, dtype=cvd.default_int)
+        if entries is not None:
+            for entry in entries:
+                self.append(entry)
+        return
+
+
+    def __len__(self):
+        return self.n
+
+
+    def __repr__(self):
+        return f'InfectionLog({self.n} infections; layers: {self.layer_keys})'
+
+
+    def __getitem__(self, ind):
+        ''' Get an entry (or, for a slice, a list of entries) as a dict '''
+        if isinstance(ind, slice):
+            return [self[i] for i in range(*ind.indices(self.n))]
+        if ind < 0:
+            ind += self.n
+        if not 0 <= ind < self.n:
+            raise IndexError(f'Infection log index {ind} is out of range for a log of length {self.n}')
+        source = self._source[ind]
+        return dict(source=source if source >= 0 else None, target=self._target[ind], date=int(self._date[ind]), layer=self.layer_keys[self._layer[ind]])
+
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self[i]
+
+
+    @property
+    def source(self):
+        ''' Source of each infection (-1 for seed infections and importations) '''
+        return self._source[:self.n]
+
+    @property
+    def target(self):
+        ''' Person infected by each infection '''
+        return self._target[:self.n]
+
+    @property
+    def date(self):
+        ''' Timestep of each infection '''
+        return self._date[:self.n]
+
+    @property
+    def layer_code(self):
+        ''' Layer of each infection, as an index into log.layer_keys '''
+        return self._layer[:self.n]
+
+    @property
+    def layer(self):
+        ''' Layer key of each infection, as an object array '''
+        return np.array(self.layer_keys + [None], dtype=object)[:-1][self.layer_code] # The extra entry ensures a 1D array even if the keys are tuples
+
+
+    def get_layer_code(self, layer):
+        ''' Get the code for a layer key, adding it if it is new '''
+        try:
+            return self._layer_codes[layer]
+        except KeyError:
+            code = len(self.layer_keys)
+            self.layer_keys.append(layer)
+            self._layer_codes[layer] = code
+            return code
+
+
+    def add(self, target, source=None, date=None, layer=None):
+        '''
+        Add infections to the log
+
+        Args:
+            target (array): the people infected
+            source (array): the person who infected each target (None if seed infections or importations)
+            date (int): the timestep of the infections
+            layer (str or array): the layer of the infections, or an array of layer keys, one per infection
+        '''
+        target = np.asarray(target)
+        n_new = len(target)
+        if not n_new:
+            return
+
+        # Make room
+        start = self.n
+        end = start + n_new
+        if end > len(self._target):
+            capacity = max(end, 2*len(self._target), 16)
+            for attr in ['_source', '_target', '_date', '_layer']:
+                new = np.empty(capacity, dtype=cvd.default_int)
+                new[:start] = getattr(self, attr)[:start]
+                setattr(self, attr, new)
+
+        # Convert the layer keys to codes
+        if layer is None or isinstance(layer, str):
+            codes = self.get_layer_code(layer)
+        else:
+            codes = np.fromiter((self.get_layer_code(key) for key in layer), dtype=cvd.default_int, count=n_new)
+
+        # Store
+        self._target[start:end] = target
+        self._source[start:end] = -1 if source is None else source
+        self._date[start:end]   = -1 if date is None else date
+        self._layer[start:end]  = codes
+        self.n = end
+        return
+
+
+    def append(self, entry):
+        ''' Add a single infection, as a dict with keys source, target, date, and layer, as for a list '''
+        source = entry.get('source')
+        self.add(target=[entry['target']], source=None if source is None else [source], date=entry.get('date'), layer=entry.get('layer'))
+        return
+
+
+    def to_list(self):
+        ''' Convert to a list of dicts, as used by Covasim prior to version 2.0.3 '''
+        return list(self)
+
+
+    def to_df(self):
+        ''' Convert to a dataframe, with a source of -1 for seed infections and importations '''
+        df = pd.DataFrame(dict(source=self.source, target=self.target, date=self.date, layer=self.layer))
+        return df
+
+
+class PackedState(np.lib.mixins.NDArrayOperatorsMixin):
+    '''
+    A boolean state (e.g. people.exposed) stored as a single bit of an integer
+    array that holds all the states, which uses much less memory than one boolean
+    array per state. Used by People if pars['packed_states'] is True. It can be
+    used like a boolean array -- e.g. people.exposed[inds] = True, people.true('exposed'),
+    ~people.exposed -- but reading the whole state (e.g. np.array(people.exposed))
+    creates a new boolean array, so changing that array does not change the state.
+
+    Args:
+        flags (array): the integer array of states, shared by all the states
+        bit (int): the bit used for this state
+
+    **Example**::
+
+        flags = np.zeros(100, dtype=np.uint16)
+        exposed = cv.PackedState(flags, 1)
+        exposed[[3,5,8]] = True
+        inds = exposed.nonzero()[0]
+    '''
+
+    dtype = np.dtype(bool)
+    ndim = 1
+
+    def __init__(self, flags, bit):
+        self.flags = flags
+        self.bit   = bit
+        self.mask  = flags.dtype.type(1 << bit)
+        return
+
+
+    def __len__(self):
+        return len(self.flags)
+
+
+    @property
+    def shape(self):
+        return self.flags.shape
+
+
+    @property
+    def size(self):
+        return self.flags.size
+
+
+    def __repr__(self):
+        return f'PackedState(bit={self.bit}, {self.__array__()})'
+
+
+    def __array__(self, dtype=None, copy=None):
+        arr = (self.flags & self.mask) != 0
+        if dtype is not None:
+            arr = arr.astype(dtype)
+        return arr
+
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        ''' Convert to boolean arrays for any Numpy operation, e.g. ~people.exposed '''
+        inputs = tuple(np.asarray(x) if isinstance(x, PackedState) else x for x in inputs)
+        out = kwargs.pop('out', None)
+        result = getattr(ufunc, method)(*inputs, **kwargs)
+        if out is not None: # For in-place operations, e.g. people.quarantined &= ~people.dead
+            out[0][:] = result
+            return out[0]
+        return result
+
+
+    def __getitem__(self, inds):
+        return (self.flags[inds] & self.mask) != 0
+
+
+    def __setitem__(self, inds, value):
+        value = np.asarray(value)
+        if value.ndim == 0: # Set or clear the bit for everyone
+            if value:
+                self.flags[inds] |= self.mask
+            else:
+                self.flags[inds] &= ~self.mask
+        else:
+            flags = self.flags[inds]
+            self.flags[inds] = np.where(value.astype(bool), flags | self.mask, flags & ~self.mask)
+        return
+
+
+    def __iter__(self):
+        return iter(self.__array__())
+
+
+    def nonzero(self):
+        return self.__array__().nonzero()
+
+
+    def sum(self, *args, **kwargs):
+        return self.__array__().sum(*args, **kwargs)
+
+
+    def any(self):
+        return bool((self.flags & self.mask).any())
+
+
+    def all(self):
+        return bool(((self.flags & self.mask) != 0).all())
+
+
+    def copy(self):
+        ''' Return a copy as a boolean array '''
+        return self.__array__()
+
+
+    def astype(self, dtype, **kwargs):
+        return self.__array__().astype(dtype, **kwargs)
+
+
+    def resize(self, new_shape, refcheck=False):
+        ''' Resize the array of states, which resizes every state that shares it '''
+        if len(self.flags) != new_shape:
+            self.flags.resize(new_shape, refcheck=refcheck)
+        return
+
+
+class IntDays(np.lib.mixins.NDArrayOperatorsMixin):
+    '''
+    An array of dates or durations (e.g. people.date_recovered), stored as whole
+    days in 16-bit integers rather than as floats, which uses much less memory.
+    Used by People if pars['int_dates'] is True. Values that are not defined
+    (NaN) are stored as the largest 16-bit integer, so "never" is later than any
+    day. It can be used like a float array -- e.g. people.date_dead[inds] = t,
+    np.isnan(people.date_dead), people.date_dead == t -- but reading the whole
+    array (e.g. np.array(people.date_dead)) creates a new float array, so changing
+    that array does not change the dates. Comparisons with whole numbers (e.g.
+    people.date_dead <= t) are done directly on the integers.
+
+    Non-integer values are rounded up to the next whole day, so comparisons with
+    the current day (e.g. date_infectious <= t) are unchanged, but durations
+    are not exact. Values must be between -32767 and 32766.
+
+    Args:
+        n (int): the number of values, all of which are initially undefined
+
+    **Example**::
+
+        dates = cv.IntDays(100)
+        dates[[3,5,8]] = 10
+        inds = cv.true(dates <= 12)
+    '''
+
+    dtype    = np.dtype(cvd.default_float) # The type of the values as used, not as stored
+    ndim     = 1
+    sentinel = np.iinfo(np.int16).max # Used for undefined values
+
+    # Comparison operators, and the equivalent operator if the arguments are swapped
+    _comparisons = {np.equal:np.equal, np.not_equal:np.not_equal, np.less:np.greater, np.less_equal:np.greater_equal, np.greater:np.less, np.greater_equal:np.less_equal}
+
+    def __init__(self, n):
+        self.values = np.full(n, self.sentinel, dtype=np.int16)
+        return
+
+
+    def __len__(self):
+        return len(self.values)
+
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+
+    @property
+    def size(self):
+        return self.values.size
+
+
+    def __repr__(self):
+        return f'IntDays({self.__array__()})'
+
+
+    def _to_float(self, values):
+        ''' Convert stored values to floats, with NaN for undefined values '''
+        arr = values.astype(self.dtype)
+        arr[values == self.sentinel] = np.nan
+        return arr
+
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self._to_float(self.values)
+        if dtype is not None:
+            arr = arr.astype(dtype)
+        return arr
+
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        ''' Compare with whole numbers directly, and convert to float arrays for any other Numpy operation '''
+
+        # Handle comparisons with a whole number, e.g. people.date_dead == t
+        if method == '__call__' and ufunc in self._comparisons and len(inputs) == 2 and not kwargs:
+            this, other = inputs
+            if isinstance(other, IntDays): # The number comes first, e.g. t == people.date_dead
+                this, other = other, this
+                ufunc = self._comparisons[ufunc]
+            if not isinstance(other, IntDays) and np.ndim(other) == 0 and np.isfinite(other) and other == np.round(other) and abs(other) < self.sentinel:
+                result = ufunc(this.values, np.int64(other))
+                if ufunc in [np.greater, np.greater_equal]: # Undefined values are stored as large numbers, but NaN compares as false
+                    result &= this.values != self.sentinel
+                return result
+
+        # Otherwise, convert to floats
+        inputs = tuple(np.asarray(x) if isinstance(x, IntDays) else x for x in inputs)
+        out = kwargs.pop('out', None)
+        result = getattr(ufunc, method)(*inputs, **kwargs)
+        if out is not None: # For in-place operations, e.g. people.date_dead += 1
+            out[0][:] = result
+            return out[0]
+        return result
+
+
+    def __getitem__(self, inds):
+        values = self.values[inds]
+        if np.ndim(values) == 0:
+            return self.dtype.type(np.nan) if values == self.sentinel else self.dtype.type(values)
+        return self._to_float(values)
+
+
+    def __setitem__(self, inds, value):
+        value = np.asarray(value, dtype=np.float64)
+        undefined = np.isnan(value)
+        days = np.ceil(np.where(undefined, 0, value))
+        if np.any(np.abs(days) >= self.sentinel):
+            errormsg = f'Values must be between {-self.sentinel} and {self.sentinel-1} to be stored as 16-bit integers'
+            raise OverflowError(errormsg)
+        self.values[inds] = np.where(undefined, self.sentinel, days)
+        return
+
+
+    def __iter__(self):
+        return iter(self.__array__())
+
+
+    def copy(self):
+        ''' Return a copy as a float array '''
+        return self.__array__()
+
+
+    def astype(self, dtype, **kwargs):
+        return self.__array__().astype(dtype, **kwargs)
+
+
+    def resize(self, new_shape, refcheck=False):
+        ''' Resize the array; any new values are undefined '''
+        n = len(self.values)
+        self.values.resize(new_shape, refcheck=refcheck)
+        self.values[n:] = self.sentinel
+        return
@@ -82,6 +82,10 @@ class PeopleMeta(sc.prettyobj):
 
     all_states = person + states + dates + durs
 
+    # The fields that are not stored, and the people profile that excludes them (see people_profiles below); set per instance by People
+    disabled = []
+    profile  = 'full'
+
 
 #%% Define other defaults
 
@@ -114,6 +118,25 @@ result_flows = {'infections':  'infections',
 new_result_flows = [f'new_{key}' for key in result_flows.keys()]
 cum_result_flows = [f'cum_{key}' for key in result_flows.keys()]
 
+# The disease state transitions that can be scheduled in advance by the event calendar -- used in people.py; order does not matter since each date has a matching state
+calendar_states = ['infectious', 'symptomatic', 'severe', 'critical', 'dead', 'recovered']
+
+# The bit used for each state if they are packed into a single integer per person (see cv.PackedState) -- used in people.py and utils.py
+state_bits = {state:bit for bit,state in enumerate(PeopleMeta.states)}
+
+# The dates that people.on_date() can find without checking every person, if pars['date_index'] is True -- used in people.py
+indexed_dates = ['date_exposed', 'date_tested', 'date_diagnosed', 'date_quarantined', 'date_end_quarantine']
+
+# The fields that are not stored for each people profile, i.e. pars['people_profile'] -- used in people.py
+people_profiles = {
+    'full':     [],
+    'standard': ['date_susceptible'] + PeopleMeta.durs,
+    'results':  ['date_susceptible', 'date_exposed'] + PeopleMeta.durs + ['infection_log'],
+}
+
+# The durations sampled for each new infection when prognoses are batched, in the order expected by cvu.compute_prognoses() -- used in people.py
+prognosis_durs = ['exp2inf', 'asym2rec', 'inf2sym', 'mild2rec', 'sym2sev', 'sev2rec', 'sev2crit', 'crit2rec', 'crit2die']
+
 # Default age data, based on Seattle 2018 census data -- used in population.py
 default_age_data = np.array([
             [ 0,  4, 0.0605],
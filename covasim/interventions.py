@@ -12,6 +12,7 @@ import datetime as dt
 from . import utils as cvu
 from . import defaults as cvd
 from . import base as cvb
+from . import misc as cvm
 from . import parameters as cvpar
 from collections import defaultdict
 
@@ -143,6 +144,15 @@ class Intervention:
         return
 
 
+    def people_fields(self):
+        '''
+        Return the people fields that the intervention needs beyond those stored
+        with every people profile (see pars['people_profile']), e.g. 'date_exposed'
+        or 'infection_log', so the sim can check they are stored before it runs.
+        '''
+        return []
+
+
     def apply(self, sim):
         '''
         Apply the intervention. This is the core method which each derived intervention
@@ -431,25 +441,36 @@ class clip_edges(Intervention):
     and a 1% chance of infecting each) versus an edge clipping (i.e., 10 contacts
     and a 2% chance of infecting each).
 
+    By default, removing or restoring edges copies the whole layer. With inplace=True,
+    the removed edges are instead kept at the end of the layer's arrays, and the
+    layer holds views of the edges that are still active; edges are removed and
+    restored by swapping them across the boundary, so each change only costs as
+    much as the number of edges changed. Since the edges end up in a different
+    order, this gives different (but statistically equivalent) results.
+
     Args:
         days (int or array): the day or array of days to isolate contacts
         changes (float or array): the changes in the number of contacts (1 = no change, 0 = no contacts)
         layers (str or list): the layers in which to isolate contacts (if None, then all layers)
+        inplace (bool): whether to remove and restore edges in place rather than copying the layer
         kwargs (dict): passed to Intervention()
 
     **Examples**::
 
         interv = cv.clip_edges(25, 0.3) # On day 25, reduce overall contacts by 70% to 0.3
         interv = cv.clip_edges([14, 28], [0.7, 1], layers='w') # On day 14, remove 30% of school contacts, and on day 28, restore them
+        interv = cv.clip_edges([14, 28], [0.7, 1], layers='w', inplace=True) # As above, without copying the layer
     '''
 
-    def __init__(self, days, changes, layers=None, **kwargs):
+    def __init__(self, days, changes, layers=None, inplace=False, **kwargs):
         super().__init__(**kwargs) # Initialize the Intervention object
         self._store_args() # Store the input arguments so the intervention can be recreated
         self.days     = sc.dcp(days)
         self.changes  = sc.dcp(changes)
         self.layers   = sc.dcp(layers)
+        self.inplace  = inplace
         self.contacts = None
+        self.edges    = None
         return
 
 
@@ -461,10 +482,59 @@ class clip_edges(Intervention):
         else:
             self.layers = sc.promotetolist(self.layers)
         self.contacts = cvb.Contacts(layer_keys=self.layers)
+        self.edges = {}
         self.initialized = True
         return
 
 
+    def get_edges(self, lkey, layer):
+        '''
+        Get the full edge arrays for a layer, with the active edges first, and the
+        number of active edges; used if inplace=True. The arrays are copied the
+        first time (or if the layer has been replaced since), so that arrays shared
+        with other objects are never modified.
+        '''
+        edges = self.edges.get(lkey)
+        if edges is None or layer.keys() != list(edges['views'].keys()) or any(layer[key] is not view for key,view in edges['views'].items()):
+            arrays = {}
+            for key in layer.keys():
+                if edges is not None and key in edges['arrays']: # Keep the edges that were removed from the previous arrays
+                    arrays[key] = np.concatenate([layer[key], edges['arrays'][key][edges['n_active']:]])
+                elif cvm.is_scalar_array(layer[key]): # A single value for every edge (see layer.compact_beta()), so swapping edges doesn't change it
+                    arrays[key] = layer[key]
+                else:
+                    arrays[key] = layer[key].copy()
+            edges = dict(arrays=arrays, n_active=len(layer), views={})
+            self.edges[lkey] = edges
+        return edges
+
+
+    def apply_inplace(self, sim, lkey, change):
+        ''' Remove or restore edges in place, by swapping them between the active and removed parts of the arrays '''
+        layer = sim.people.contacts[lkey]
+        edges = self.get_edges(lkey, layer)
+        arrays = edges['arrays']
+        n_active = edges['n_active']
+        n_contacts = len(arrays[layer.basekey])
+        if n_contacts:
+            n_to_move = int((n_active/n_contacts - change)*n_contacts) # Number of contacts to move, as for the default method
+            if n_to_move > 0: # Move the chosen edges to the end of the active part, then exclude them
+                inds = cvu.choose(max_n=n_active, n=n_to_move)
+                n_active -= n_to_move
+                move_edges(arrays, inds, n_active)
+            elif n_to_move < 0: # Move the chosen edges to the start of the removed part, then include them
+                inds = n_active + cvu.choose(max_n=n_contacts-n_active, n=-n_to_move)
+                move_edges(arrays, inds, n_active)
+                n_active -= n_to_move
+            for key,arr in arrays.items():
+                layer[key] = arr[:n_active] # Replacing the arrays means that the layer's edge index is rebuilt when needed
+            edges['n_active'] = n_active
+            edges['views'] = {key:layer[key] for key in arrays.keys()}
+        else:
+            print(f'Warning: clip_edges() was applied to layer "{lkey}", but no edges were found; please check sim.people.contacts["{lkey}"]')
+        return
+
+
     def apply(self, sim):
 
         # If this day is found in the list, apply the intervention
@@ -472,6 +542,9 @@ class clip_edges(Intervention):
 
             # Do the contact moving
             for lkey in self.layers:
+                if self.inplace:
+                    self.apply_inplace(sim, lkey, self.changes[ind])
+                    continue
                 s_layer = sim.people.contacts[lkey] # Contact layer in the sim
                 i_layer = self.contacts[lkey] # Contact layer in the intervention
                 n_sim = len(s_layer) # Number of contacts in the simulation layer
@@ -497,10 +570,33 @@ class clip_edges(Intervention):
         # Ensure the edges get deleted at the end
         if sim.t == sim.tvec[-1]:
             self.contacts = None # Reset to save memory
+            self.edges = None
 
         return
 
 
+def move_edges(arrays, inds, start):
+    '''
+    Move the edges at the given positions to the block of positions starting at
+    start, in place, by swapping them with the edges already there; used by
+    clip_edges() with inplace=True. The positions must all lie in a region that
+    contains the block.
+
+    Args:
+        arrays (dict): the edge arrays (p1, p2, beta, etc.) to modify in place
+        inds (array): the positions of the edges to move
+        start (int): the first position of the block
+    '''
+    in_block = (inds >= start) & (inds < start + len(inds))
+    filled = np.zeros(len(inds), dtype=bool)
+    filled[inds[in_block] - start] = True
+    src = inds[~in_block] # Edges to move into the block
+    dst = start + np.flatnonzero(~filled) # Positions in the block not already holding one of these edges
+    for arr in arrays.values():
+        arr[src], arr[dst] = arr[dst], arr[src] # Fancy indexing makes copies, so this is a swap
+    return
+
+
 
 #%% Testing interventions
 
@@ -602,13 +698,13 @@ def get_quar_inds(quar_policy, sim):
     '''
     t = sim.t
     if   quar_policy is None:    quar_test_inds = np.array([])
-    elif quar_policy == 'start': quar_test_inds = cvu.true(sim.people.date_quarantined==t-1) # Actually do the day after since testing usually happens before contact tracing
-    elif quar_policy == 'end':   quar_test_inds = cvu.true(sim.people.date_end_quarantine==t+1) # +1 since they are released on date_end_quarantine, so do the day before
-    elif quar_policy == 'both':  quar_test_inds = np.concatenate([cvu.true(sim.people.date_quarantined==t-1), cvu.true(sim.people.date_end_quarantine==t+1)])
-    elif quar_policy == 'daily': quar_test_inds = cvu.true(sim.people.quarantined)
+    elif quar_policy == 'start': quar_test_inds = sim.people.on_date('date_quarantined', t-1) # Actually do the day after since testing usually happens before contact tracing
+    elif quar_policy == 'end':   quar_test_inds = sim.people.on_date('date_end_quarantine', t+1) # +1 since they are released on date_end_quarantine, so do the day before
+    elif quar_policy == 'both':  quar_test_inds = np.concatenate([sim.people.on_date('date_quarantined', t-1), sim.people.on_date('date_end_quarantine', t+1)])
+    elif quar_policy == 'daily': quar_test_inds = sim.people.true('quarantined')
     elif sc.isnumber(quar_policy) or (sc.isiterable(quar_policy) and not sc.isstring(quar_policy)):
         quar_policy = sc.promotetoarray(quar_policy)
-        quar_test_inds = np.unique(np.concatenate([cvu.true(sim.people.date_quarantined==t-1-q) for q in quar_policy]))
+        quar_test_inds = np.unique(np.concatenate([sim.people.on_date('date_quarantined', t-1-q) for q in quar_policy]))
     elif callable(quar_policy):
         quar_test_inds = quar_policy(sim)
     else:
@@ -707,7 +803,7 @@ class test_num(Intervention):
         test_probs = np.ones(sim.n) # Begin by assigning equal testing weight (converted to a probability) to everyone
 
         # Calculate test probabilities for people with symptoms
-        symp_inds = cvu.true(sim.people.symptomatic)
+        symp_inds = sim.people.true('symptomatic')
         symp_test = self.symp_test
         if self.pdf: # Handle the onset to swab delay
             symp_time = cvd.default_int(t - sim.people.date_symptomatic[symp_inds]) # Find time since symptom onset
@@ -736,7 +832,7 @@ class test_num(Intervention):
             test_probs[subtarget_inds] = test_probs[subtarget_inds]*subtarget_vals
 
         # Don't re-diagnose people
-        diag_inds  = cvu.true(sim.people.diagnosed)
+        diag_inds  = sim.people.true('diagnosed')
         test_probs[diag_inds] = 0.0
 
         # With dynamic rescaling, we have to correct for uninfected people outside of the population who would test
@@ -819,7 +915,7 @@ class test_prob(Intervention):
             return
 
         # Find probablity for symptomatics to be tested
-        symp_inds  = cvu.true(sim.people.symptomatic)
+        symp_inds  = sim.people.true('symptomatic')
         symp_prob = self.symp_prob
         if self.pdf:
             symp_time = cvd.default_int(t - sim.people.date_symptomatic[symp_inds]) # Find time since symptom onset
@@ -848,7 +944,7 @@ class test_prob(Intervention):
         quar_test_inds = get_quar_inds(self.quar_policy, sim)
         symp_quar_inds  = np.intersect1d(quar_test_inds, symp_inds)
         asymp_quar_inds = np.intersect1d(quar_test_inds, asymp_inds)
-        diag_inds       = cvu.true(sim.people.diagnosed)
+        diag_inds       = sim.people.true('diagnosed')
 
         # Construct the testing probabilities piece by piece -- complicated, since need to do it in the right order
         test_probs = np.zeros(sim.n) # Begin by assigning equal testing probability to everyone
@@ -957,9 +1053,9 @@ class contact_tracing(Intervention):
         Return people to be traced at this time step
         '''
         if not self.presumptive:
-            inds = cvu.true(sim.people.date_diagnosed == sim.t) # Diagnosed this time step, time to trace
+            inds = sim.people.on_date('date_diagnosed', sim.t) # Diagnosed this time step, time to trace
         else:
-            just_tested = cvu.true(sim.people.date_tested == sim.t) # Tested this time step, time to trace
+            just_tested = sim.people.on_date('date_tested', sim.t) # Tested this time step, time to trace
             inds = cvu.itruei(sim.people.exposed, just_tested) # This is necessary to avoid infinite chains of asymptomatic testing
         return inds
 
@@ -1016,7 +1112,7 @@ class contact_tracing(Intervention):
             contacts: {trace_time: np.array(inds)} dictionary storing which people to notify
         '''
         for trace_time, contact_inds in contacts.items():
-            sim.people.known_contact[contact_inds] = True
+            sim.people.set_state('known_contact', contact_inds, True)
             sim.people.date_known_contact[contact_inds] = np.fmin(sim.people.date_known_contact[contact_inds], sim.t + trace_time)
             sim.people.schedule_quarantine(contact_inds, start_date=sim.t + trace_time, period=self.quar_period - trace_time)  # Schedule quarantine for the notified people to start on the date they will be notified
         return
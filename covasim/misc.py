@@ -2,12 +2,16 @@
 Miscellaneous functions that do not belong anywhere else
 '''
 
+import os
+import tempfile
 import numpy as np
 import pandas as pd
 import pylab as pl
 import sciris as sc
 import scipy.stats as sps
 from . import version as cvv
+from .settings import options as cvo
+from . import defaults as cvd
 
 
 #%% Convenience imports from Sciris
@@ -22,7 +26,7 @@ date_range = sc.daterange
 
 #%% Loading/saving functions
 
-__all__ += ['load_data', 'load', 'save', 'migrate', 'savefig']
+__all__ += ['load_data', 'load', 'save', 'migrate', 'savefig', 'memmap_array', 'is_memmap', 'scalar_array', 'is_scalar_array']
 
 
 def load_data(datafile, columns=None, calculate=True, check_date=True, verbose=True, **kwargs):
@@ -170,6 +174,7 @@ def migrate(obj, update=True, verbose=True, die=False):
     from . import base as cvb
     from . import run as cvr
     from . import interventions as cvi
+    from . import parameters as cvpar
 
     # Migrations for simulations
     if isinstance(obj, cvb.BaseSim):
@@ -196,6 +201,16 @@ def migrate(obj, update=True, verbose=True, die=False):
                 except:
                     pass
 
+        # Add any parameters that did not exist when the sim was saved, using their default values
+        default_pars = cvpar.make_pars()
+        for key,val in default_pars.items():
+            if key not in sim.pars:
+                sim.pars[key] = val
+
+        # Convert the infection log from a list of dicts to an InfectionLog
+        if sim.people and isinstance(sim.people.infection_log, list):
+            sim.people.infection_log = cvb.InfectionLog(sim.people.infection_log)
+
     # Migrations for People
     elif isinstance(obj, cvb.BasePeople):
         ppl = obj
@@ -203,6 +218,10 @@ def migrate(obj, update=True, verbose=True, die=False):
             if verbose: print(f'Migrating people from version <2.0 to version {cvv.__version__}')
             cvb.set_metadata(ppl) # Set all metadata
 
+        # Convert the infection log from a list of dicts to an InfectionLog
+        if isinstance(getattr(ppl, 'infection_log', None), list):
+            ppl.infection_log = cvb.InfectionLog(ppl.infection_log)
+
     # Migrations for MultiSims -- use recursion
     elif isinstance(obj, cvr.MultiSim):
         msim = obj
@@ -290,6 +309,82 @@ def savefig(filename=None, comments=None, **kwargs):
     return filename
 
 
+def memmap_array(arr=None, shape=None, dtype=None, folder=None):
+    '''
+    Create an array that is stored in a temporary file rather than in memory,
+    so that arrays larger than the available memory can be used (see the
+    people_storage parameter). Where possible (i.e. not on Windows), the file
+    is deleted as soon as it is created, so it does not need to be cleaned up,
+    although the data remain available until the array is deleted.
+
+    Args:
+        arr (array): if supplied, the values to copy into the new array
+        shape (tuple): otherwise, the shape of the new array
+        dtype (type): and its dtype
+        folder (str): the folder to store the file in (default: cv.options.scratch_dir, or the system temporary folder)
+
+    Returns:
+        A Numpy memmap array
+
+    **Example**::
+
+        arr = cv.memmap_array(np.arange(100))
+    '''
+    if arr is not None:
+        shape = arr.shape
+        dtype = arr.dtype
+    if folder is None:
+        folder = cvo.scratch_dir
+    if not np.prod(shape): # Empty files can't be memory-mapped
+        return np.empty(shape, dtype=dtype)
+    fd, path = tempfile.mkstemp(prefix='covasim_', suffix='.dat', dir=folder)
+    os.close(fd)
+    output = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    try:
+        os.remove(path) # The data remain available until the array is deleted
+    except OSError: # pragma: no cover
+        pass
+    if arr is not None:
+        output[:] = arr
+    return output
+
+
+def is_memmap(arr):
+    ''' Check whether an array is stored in a file, i.e. is from cv.memmap_array() or is a view of one '''
+    while isinstance(arr, np.ndarray):
+        if isinstance(arr, np.memmap):
+            return True
+        arr = arr.base
+    return False
+
+
+def scalar_array(value, n, dtype=None):
+    '''
+    Create an array of n elements with the same value, which only stores the value
+    once (the array has a stride of 0). It can be used like any other array, e.g.
+    by Numba functions, but since every element refers to the same value, setting
+    any element sets all of them. Used for contact layers where every edge has
+    the same beta (see layer.compact_beta()).
+
+    Args:
+        value (float): the value of every element
+        n (int): the number of elements
+        dtype (type): the dtype of the array (default: cv.default_float)
+
+    **Example**::
+
+        beta = cv.scalar_array(1.0, 1_000_000) # Uses 8 bytes rather than 8 MB
+    '''
+    if dtype is None:
+        dtype = cvd.default_float
+    return np.lib.stride_tricks.as_strided(np.full(1, value, dtype=dtype), shape=(n,), strides=(0,))
+
+
+def is_scalar_array(arr):
+    ''' Check whether an array is a non-empty array from cv.scalar_array(), i.e. with a single value stored once '''
+    return isinstance(arr, np.ndarray) and arr.ndim == 1 and len(arr) > 0 and arr.strides == (0,)
+
+
 
 #%% Versioning functions
 
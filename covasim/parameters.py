@@ -96,6 +96,25 @@ def make_pars(set_prognoses=False, prog_by_age=True, version=None, **kwargs):
     pars['no_hosp_factor'] = 2.0  # Multiplier for how much more likely severely ill people are to become critical if no hospital beds are available
     pars['no_icu_factor']  = 2.0  # Multiplier for how much more likely critically ill people are to die if no ICU beds are available
 
+    # Performance options: these change how the model is computed (and may change the random number stream), but not the model itself
+    pars['trans_mode'] = 'layered' # How to compute transmission: 'layered' (one calculation per layer and direction), 'fused' (all layers and both directions in a single compiled pass), or 'sparse' (only the contacts of infectious people)
+    pars['event_calendar'] = False # Whether to schedule disease state transitions in a calendar when people are infected, rather than checking everyone who is exposed every day; gives identical results, but requires that the dates (e.g. date_recovered) are only set by people.infect()
+    pars['stock_counts'] = 'recount' # How to count the number of people in each state (e.g. severe) each day: 'recount' (check every person), 'incremental' (keep running counts, requiring states to be changed via people.set_state()), or 'check' (keep running counts and check them against a recount)
+    pars['batch_infect'] = False # Whether to collect the infections from all layers and infect them in a single batch, with prognoses computed in a single compiled pass; results are statistically equivalent, but the random number stream differs
+    pars['dynam_inplace'] = False # Whether to regenerate dynamic layers (e.g. community) in the same arrays each day, rather than allocating new ones; gives identical results, but any references to a dynamic layer's arrays will see them change
+    pars['dynam_pool'] = 0 # If greater than 0, pre-generate this many random networks for each dynamic layer (e.g. community) and use one chosen at random each day, rather than generating a new network each day; faster, but uses more memory
+    pars['packed_states'] = False # Whether to store the states of each person (e.g. exposed) as the bits of a single integer rather than as separate boolean arrays, which uses much less memory; gives identical results
+    pars['int_dates'] = False # Whether to store the dates and durations of each person (e.g. date_recovered) as whole days in 16-bit integers rather than floats, which uses much less memory; gives identical results if durations are whole numbers of days (e.g. the default 'lognormal_int' distributions)
+    pars['people_storage'] = 'arrays' # How to store the values of each person (e.g. people.age): 'arrays' (a separate array for each) or 'blocks' (all arrays of the same type as rows of one contiguous block, for faster copying and saving; see people.snapshot()), or 'memmap' (blocks stored in files rather than in memory, as are the static contact layers; see cv.memmap_array())
+    pars['people_profile'] = 'full' # Which values to store for each person: 'full' (everything), 'standard' (no durations, e.g. people.dur_disease), or 'results' (also no infection log or dates only used by analyzers, e.g. people.date_exposed); gives identical results; see defaults.people_profiles
+    pars['index_cache'] = False # Whether to cache the indices returned by people.true() and people.false() (e.g. people.true('diagnosed')) within each timestep, rather than finding them each time they're needed; requires states to be changed via people.set_state(), as for stock_counts; gives identical results
+    pars['date_index'] = False # Whether to keep an index of the people with certain dates (e.g. date_tested) on each day, so that people.on_date() (e.g. used by contact tracing) doesn't need to check every person; requires these dates to be changed via people.set_date(); gives identical results
+    pars['rewindable'] = False # Whether to keep a copy of the population as it was created, so that the sim can be rerun (e.g. with a different seed) via sim.rewind() without creating the population again; uses more memory
+    pars['fast_mode'] = False # Whether to skip checks on each timestep: the interventions and analyzers are checked once when the sim is initialized rather than on every timestep (see sim.init_step_calls()), the time limit and stopping function are only checked if used, and progress is not printed on each timestep (regardless of verbose); gives identical results
+    pars['scalar_beta'] = False # Whether to store the beta of contact layers where every edge has the same beta (usually 1) as a single value rather than one per edge (see layer.compact_beta()); gives identical results
+    pars['reorder_people'] = None # How to renumber the people when the population is created, so that people in contact have nearby indices, which makes transmission faster for large populations: None (creation order), 'rcm' (reverse Cuthill-McKee ordering of the static layers), or a layer key (e.g. 'h') to group people by their clusters in that layer; people.uid gives the original IDs (see cv.reorder_people()); results are statistically equivalent
+    pars['rand_streams'] = False # Whether to use counter-based random number streams for transmission, which give identical results with or without Numba parallelization, in every transmission mode (see cv.RandStreams)
+
     # Update with any supplied parameter values and generate things that need to be generated
     pars.update(kwargs)
     reset_layer_pars(pars)
@@ -7,6 +7,7 @@ import numpy as np
 import sciris as sc
 from collections import defaultdict
 from . import version as cvv
+from . import misc as cvm
 from . import utils as cvu
 from . import defaults as cvd
 from . import base as cvb
@@ -36,6 +37,16 @@ class People(cvb.BasePeople):
         ppl2 = cv.People(sim.pars)
     '''
 
+    _stock_counts = None # Running counts of the states in the results; see count()
+    _dynam_pool   = None # Pre-generated networks for dynamic layers, if pars['dynam_pool'] is set; see sample_dynam_pool()
+    _flags        = None # The packed states, if pars['packed_states'] is True; see cv.PackedState
+    _blocks       = None # The blocks of storage for each dtype, if pars['people_storage'] is 'blocks'; see make_blocks()
+    _block_rows   = None # The block and row of each array in the blocks
+    _index_cache  = None # The indices returned by true() and false() during this timestep, if pars['index_cache'] is True
+    _date_index   = None # The people with each of cvd.indexed_dates on each day, if pars['date_index'] is True: {(key,day):[inds]}; see on_date()
+    _date_index_start = None # The first day still in the date index for each date, once past days have been dropped: {key:day}; see prune_date_index()
+    _date_index_lags  = None # How many days before the current day each date has been looked up: {key:days}; see on_date()
+
     def __init__(self, pars, strict=True, **kwargs):
 
         # Handle pars and population size
@@ -52,25 +63,49 @@ class People(cvb.BasePeople):
         self.meta = cvd.PeopleMeta() # Store list of keys and dtypes
         self.contacts = None
         self.init_contacts() # Initialize the contacts
-        self.infection_log = [] # Record of infections - keys for ['source','target','date','layer']
-
-        # Set person properties -- all floats except for UID
-        for key in self.meta.person:
-            if key == 'uid':
-                self[key] = np.arange(self.pop_size, dtype=cvd.default_int)
-            else:
-                self[key] = np.full(self.pop_size, np.nan, dtype=cvd.default_float)
 
-        # Set health states -- only susceptible is true by default -- booleans
-        for key in self.meta.states:
-            if key == 'susceptible':
-                self[key] = np.full(self.pop_size, True, dtype=bool)
-            else:
-                self[key] = np.full(self.pop_size, False, dtype=bool)
+        # Optionally skip storing fields the run doesn't need, depending on the people profile
+        profile = pars.get('people_profile', 'full')
+        if profile != 'full':
+            disabled = cvd.people_profiles[profile]
+            self.meta.profile    = profile
+            self.meta.disabled   = disabled[:]
+            self.meta.dates      = [key for key in self.meta.dates if key not in disabled]
+            self.meta.durs       = [key for key in self.meta.durs  if key not in disabled]
+            self.meta.all_states = self.meta.person + self.meta.states + self.meta.dates + self.meta.durs
+        if 'infection_log' not in self.meta.disabled:
+            self.infection_log = cvb.InfectionLog() # Record of infections - keys for ['source','target','date','layer']
+
+        # Work out the storage array for each value, and its initial value: person properties are all floats except for UID;
+        # health states are booleans (only susceptible is true by default), optionally packed into the bits of a single array;
+        # and dates and durations are floats, optionally stored as whole days
+        packed = pars.get('packed_states')
+        int_dates = pars.get('int_dates')
+        specs = [(key, cvd.default_int, None) if key == 'uid' else (key, cvd.default_float, np.nan) for key in self.meta.person]
+        if packed:
+            specs.append(('_flags', np.uint16, 1 << cvd.state_bits['susceptible']))
+        else:
+            specs += [(key, bool, key == 'susceptible') for key in self.meta.states]
+        for key in self.meta.dates + self.meta.durs:
+            specs.append((key, np.int16, cvb.IntDays.sentinel) if int_dates else (key, cvd.default_float, np.nan))
+        arrays, blocks, block_rows = self.alloc_storage(specs)
 
-        # Set dates and durations -- both floats
+        # Set the values
+        for key in self.meta.person:
+            self[key] = arrays[key]
+        if packed:
+            self._flags = arrays['_flags']
+            for key in self.meta.states:
+                self[key] = cvb.PackedState(self._flags, cvd.state_bits[key])
+        else:
+            for key in self.meta.states:
+                self[key] = arrays[key]
         for key in self.meta.dates + self.meta.durs:
-            self[key] = np.full(self.pop_size, np.nan, dtype=cvd.default_float)
+            if int_dates:
+                self[key] = cvb.IntDays(0)
+                self[key].values = arrays[key]
+            else:
+                self[key] = arrays[key]
 
         # Store the dtypes used in a flat dict
         self._dtypes = {key:self[key].dtype for key in self.keys()} # Assign all to float by default
@@ -82,6 +117,10 @@ class People(cvb.BasePeople):
         # Although we have called init(), we still need to call initialize()
         self.initialized = False
 
+        # If the arrays are stored in a few contiguous blocks, keep track of them
+        self._blocks = blocks
+        self._block_rows = block_rows
+
         # Handle contacts, if supplied (note: they usually are)
         if 'contacts' in kwargs:
             self.add_contacts(kwargs.pop('contacts'))
@@ -93,7 +132,76 @@ class People(cvb.BasePeople):
             else:
                 self[key] = value
 
-        self._pending_quarantine = defaultdict(list)  # Internal cache to record people that need to be quarantined on each timestep {t:(person, quarantine_end_day)}
+        self._pending_quarantine = defaultdict(list)  # Internal cache to record people that need to be quarantined on each timestep {t:[(inds, quarantine_end_day)]}
+        self._events = defaultdict(list) # Internal event calendar, if pars['event_calendar'] is True: {(t,state):[inds]}
+        if pars.get('date_index'):
+            self.make_date_index()
+        self._next_event_day = 0 # The first timestep for which the events have not yet been checked
+        return
+
+
+    def __getattr__(self, attr):
+        ''' Only called if the attribute is missing: if it's not stored with the current people profile, say so '''
+        meta = self.__dict__.get('meta')
+        if meta is not None and attr in meta.disabled:
+            return self[attr] # Raises an informative error
+        errormsg = f"'{self.__class__.__name__}' object has no attribute '{attr}'"
+        raise AttributeError(errormsg)
+
+
+    def __setitem__(self, key, value):
+        '''
+        If a whole state array is replaced, the running stock counts need to be
+        recalculated; if the states are packed, the dates are stored as whole
+        days, or the arrays are stored in blocks, the new values are copied in;
+        and if a whole indexed date array is replaced, its index is remade
+        '''
+        if self._stock_counts is not None and key in self._stock_counts:
+            self._stock_counts = None
+        if self._index_cache:
+            self.clear_index_cache(key)
+        current = self.__dict__.get(key)
+        if self._blocks is not None and current is not None and hasattr(value, '__len__') and len(value) != len(current):
+            self.unlink_blocks() # Blocks can't be resized, so use separate arrays until they are remade by validate()
+        if isinstance(current, (cvb.PackedState, cvb.IntDays)) and not isinstance(value, type(current)):
+            current.resize(len(value)) # In case the population size has changed, e.g. people1 + people2
+            current[:] = value
+        elif self._blocks is not None and key in self._block_rows and isinstance(value, np.ndarray) and value is not current:
+            current[:] = value
+        else:
+            super().__setitem__(key, value)
+        if self._date_index is not None and key in cvd.indexed_dates:
+            self.make_date_index(key)
+        return
+
+
+    def __getstate__(self):
+        ''' If the arrays are stored in blocks, only store the blocks, not each row as well '''
+        state = self.__dict__.copy()
+        if self._blocks is not None:
+            state['_blocks'] = {dtype:block.view(np.ndarray) for dtype,block in self._blocks.items()} # Memory-mapped arrays can't always be pickled directly
+            for name in self._block_rows.keys():
+                if name == '_flags':
+                    state['_flags'] = None
+                    for key in self.meta.states:
+                        state[key] = sc.cp(state[key])
+                        state[key].flags = None
+                elif isinstance(state[name], cvb.IntDays):
+                    state[name] = sc.cp(state[name])
+                    state[name].values = None
+                else:
+                    state[name] = None
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._blocks is not None:
+            if self.pars.get('people_storage') == 'memmap': # Memory-mapped arrays are copied into memory, so move them back to files
+                self._blocks = {dtype:cvm.memmap_array(block) for dtype,block in self._blocks.items()}
+                if self.contacts is not None:
+                    self.memmap_contacts()
+            self.link_blocks()
         return
 
 
@@ -101,10 +209,285 @@ class People(cvb.BasePeople):
         ''' Perform initializations '''
         self.set_prognoses()
         self.validate()
+        if self.pars.get('scalar_beta') and self.contacts is not None:
+            for layer in self.contacts.values():
+                layer.compact_beta()
+        if self.pars.get('people_storage') == 'memmap':
+            self.memmap_contacts()
         self.initialized = True
         return
 
 
+    def validate(self, die=True, verbose=False):
+        ''' Check that the arrays are consistent; also remake the blocks if the arrays have been resized '''
+        super().validate(die=die, verbose=verbose)
+        if self._blocks is None and self.pars.get('people_storage', 'arrays') != 'arrays':
+            self.make_blocks()
+        return
+
+
+    def _resize_arrays(self, pop_size=None, keys=None):
+        ''' Resize arrays if any mismatches are found, remaking the blocks if needed '''
+        blocks = self._blocks is not None
+        if blocks:
+            self.unlink_blocks()
+        self.clear_index_cache()
+        super()._resize_arrays(pop_size=pop_size, keys=keys)
+        if self._date_index is not None:
+            self.make_date_index()
+        if blocks:
+            self.make_blocks()
+        return
+
+
+    def storage_arrays(self):
+        '''
+        Return the arrays that hold the values of each person, by name: usually the
+        arrays themselves (e.g. people.age), but the arrays inside them if the states
+        are packed (people._flags) or the dates are stored as whole days.
+        '''
+        arrays = {}
+        for key in self.keys():
+            value = self.__dict__[key]
+            if isinstance(value, cvb.PackedState):
+                arrays['_flags'] = value.flags
+            elif isinstance(value, cvb.IntDays):
+                arrays[key] = value.values
+            else:
+                arrays[key] = value
+        return arrays
+
+
+    def _set_storage(self, name, arr):
+        ''' Replace one of the storage arrays (see storage_arrays()) '''
+        if name == '_flags':
+            self._flags = arr
+            for key in self.meta.states:
+                self.__dict__[key].flags = arr
+        elif isinstance(self.__dict__[name], cvb.IntDays):
+            self.__dict__[name].values = arr
+        else:
+            self.__dict__[name] = arr
+        return
+
+
+    def alloc_storage(self, specs):
+        '''
+        Allocate the arrays that hold the values of each person (see storage_arrays()),
+        filled with their initial values. If pars['people_storage'] is 'blocks' or
+        'memmap', the blocks (see make_blocks()) are allocated first and each array is
+        a row of a block, so no other arrays are created; this means that with
+        'memmap', populations larger than the available memory can be created.
+
+        Args:
+            specs (list): the name, dtype, and initial value of each array; an initial value of None means 0, 1, 2, etc.
+
+        Returns:
+            arrays (dict): the arrays, by name
+            blocks (dict): the blocks for each dtype, or None if the arrays are stored separately
+            block_rows (dict): the block and row of each array, or None
+        '''
+        n = self.pop_size
+        storage = self.pars.get('people_storage', 'arrays')
+        if storage == 'arrays':
+            blocks = block_rows = None
+            arrays = {name:np.empty(n, dtype=dtype) for name,dtype,value in specs}
+        else:
+            names = defaultdict(list)
+            for name,dtype,value in specs:
+                names[np.dtype(dtype).str].append(name)
+            blocks = {}
+            block_rows = {}
+            arrays = {}
+            for dtype,dnames in names.items():
+                shape = (len(dnames), n)
+                blocks[dtype] = cvm.memmap_array(shape=shape, dtype=dtype) if storage == 'memmap' else np.empty(shape, dtype=dtype)
+                for row,name in enumerate(dnames):
+                    block_rows[name] = (dtype, row)
+                    arrays[name] = blocks[dtype][row].view(np.ndarray) # Use plain arrays, even if the blocks are memory-mapped
+
+        # Fill in the initial values; 0, 1, 2, etc. are filled in in chunks, to avoid creating a temporary array of the full length
+        chunk = 2**20
+        for name,dtype,value in specs:
+            arr = arrays[name]
+            if value is None:
+                for start in range(0, n, chunk):
+                    stop = min(start+chunk, n)
+                    arr[start:stop] = np.arange(start, stop, dtype=arr.dtype)
+            else:
+                arr.fill(value)
+        return arrays, blocks, block_rows
+
+
+    def make_blocks(self):
+        '''
+        Move all the arrays of people's values (e.g. people.age) into a few contiguous
+        2D blocks, one for each dtype, so that each array is a row of a block. This
+        means that all the values can be copied (see snapshot()), saved, or shared in
+        a few operations rather than one per array. If pars['people_storage'] is
+        'blocks' or 'memmap', the blocks are allocated when the people are created
+        (see alloc_storage()), and this is called to remake them if needed, e.g.
+        after the population is resized.
+        '''
+        arrays = self.storage_arrays()
+        names = defaultdict(list)
+        for name,arr in arrays.items():
+            names[arr.dtype.str].append(name)
+        self._blocks = {}
+        self._block_rows = {}
+        memmap = self.pars.get('people_storage') == 'memmap'
+        for dtype,dnames in names.items():
+            shape = (len(dnames), len(self))
+            block = cvm.memmap_array(shape=shape, dtype=dtype) if memmap else np.empty(shape, dtype=dtype)
+            for row,name in enumerate(dnames):
+                block[row,:] = arrays[name]
+                self._block_rows[name] = (dtype, row)
+            self._blocks[dtype] = block
+        self.link_blocks()
+        return
+
+
+    def link_blocks(self):
+        ''' Set each array to be a view of its row of the blocks '''
+        for name,(dtype,row) in self._block_rows.items():
+            self._set_storage(name, self._blocks[dtype][row].view(np.ndarray)) # Use plain arrays, even if the blocks are memory-mapped
+        return
+
+
+    def memmap_contacts(self):
+        '''
+        Store the arrays of each static contact layer (i.e. not in pars['dynam_layer'])
+        in files rather than in memory; see cv.memmap_array(). If pars['people_storage']
+        is 'memmap', the static layers are created in files by add_contacts(), and this
+        is called automatically for any layers added in other ways. Arrays that are
+        replaced later (e.g. by clip_edges()) are stored in memory as usual.
+        '''
+        dynam_layer = self.pars.get('dynam_layer', {})
+        for lkey,layer in self.contacts.items():
+            if not dynam_layer.get(lkey):
+                for key,arr in layer.items():
+                    if not isinstance(arr.base, np.memmap) and not cvm.is_scalar_array(arr): # Values stored only once don't need to be moved
+                        layer[key] = cvm.memmap_array(arr).view(np.ndarray)
+        return
+
+
+    def unlink_blocks(self):
+        ''' Copy each array out of the blocks, e.g. so they can be resized '''
+        for name,(dtype,row) in self._block_rows.items():
+            self._set_storage(name, self._blocks[dtype][row].copy())
+        self._blocks = None
+        self._block_rows = None
+        return
+
+
+    def snapshot(self):
+        '''
+        Return a copy of the values of every person (e.g. their ages, states, and
+        dates), which can be restored with people.restore(). If the arrays are stored
+        in blocks, this copies a few blocks rather than each array. Other properties,
+        e.g. the contacts and the infection log, are not included.
+
+        **Example**::
+
+            snap = sim.people.snapshot()
+            sim.people.infect(inds=np.arange(100))
+            sim.people.restore(snap)
+        '''
+        if self._blocks is not None:
+            return {dtype:block.copy() for dtype,block in self._blocks.items()}
+        else:
+            return {name:arr.copy() for name,arr in self.storage_arrays().items()}
+
+
+    def restore(self, snapshot):
+        '''
+        Restore the values of every person from people.snapshot(); the people must
+        not have been resized in the meantime.
+        '''
+        if self._blocks is not None:
+            for dtype,block in self._blocks.items():
+                block[:] = snapshot[dtype]
+        else:
+            for name,arr in self.storage_arrays().items():
+                arr[:] = snapshot[name]
+        self._stock_counts = None # The running counts need to be recalculated
+        return
+
+
+    def reorder(self, order):
+        '''
+        Renumber the people, so that the person at index i is the person who was
+        previously at index order[i]. The contacts are relabeled to match, and the
+        edges of each layer are sorted by p1. Since people.uid is reordered along
+        with everything else, it still gives each person's original ID. Usually
+        called via cv.reorder_people(); the people must not have been initialized.
+
+        Args:
+            order (array): a permutation of the indices of the people
+
+        **Example**::
+
+            people.reorder(np.argsort(people.age)) # Order the people by age
+            orig_inds = people.uid # The index of each person before reordering
+        '''
+        if self.initialized:
+            errormsg = 'The people can only be reordered before they are initialized, since e.g. their scheduled events refer to their indices'
+            raise RuntimeError(errormsg)
+        order = np.asarray(order)
+        n = len(self)
+        if len(order) != n or not np.array_equal(np.sort(order), np.arange(n)):
+            errormsg = f'To reorder {n} people, the order must be a permutation of the indices 0 to {n-1}'
+            raise ValueError(errormsg)
+
+        # Reorder the values of each person, in place so that e.g. blocks are preserved
+        for arr in self.storage_arrays().values():
+            arr[:] = arr[order]
+
+        # Relabel the contacts, and sort the edges so that the people in each edge are looked up roughly in order
+        new_inds = np.empty(n, dtype=cvd.default_int)
+        new_inds[order] = np.arange(n, dtype=cvd.default_int)
+        for layer in self.contacts.values():
+            layer['p1'] = new_inds[layer['p1']]
+            layer['p2'] = new_inds[layer['p2']]
+            edge_order = np.argsort(layer['p1'], kind='stable')
+            for key in layer.keys():
+                if not cvm.is_scalar_array(layer[key]): # Values that are only stored once are the same for every edge
+                    layer[key] = layer[key][edge_order]
+
+        self._stock_counts = None
+        self.clear_index_cache()
+        if self._date_index is not None:
+            self.make_date_index()
+        return
+
+
+    def reset(self, snapshot, contacts):
+        '''
+        Reset the people to how they were before the sim was initialized, from a
+        snapshot of their values (see snapshot()) and a copy of their contacts, so
+        they can be initialized and run again. Used by sim.rewind().
+
+        Args:
+            snapshot (dict): the values of each person, from people.snapshot()
+            contacts (Contacts): the contacts, which are copied since they can change during the sim
+        '''
+        self.restore(snapshot)
+        self.contacts = sc.dcp(contacts)
+        self.t = 0
+        self.flows = {key:0 for key in cvd.new_result_flows}
+        if 'infection_log' not in self.meta.disabled:
+            self.infection_log = cvb.InfectionLog()
+        self._pending_quarantine = defaultdict(list)
+        self._events = defaultdict(list)
+        self._next_event_day = 0
+        self._dynam_pool = None
+        self.clear_index_cache()
+        if self._date_index is not None:
+            self.make_date_index()
+        self.initialized = False
+        return
+
+
     def set_prognoses(self):
         '''
         Set the prognoses for each person based on age during initialization. Need
@@ -145,6 +528,9 @@ class People(cvb.BasePeople):
         # Initialize
         self.t = t
         self.is_exp = self.true('exposed') # For storing the interim values since used in every subsequent calculation
+        if self._date_index is not None:
+            self.prune_date_index()
+        self._next_event_day = t + 1 # Any events scheduled from now on happen on the next timestep at the earliest
 
         # Perform updates
         self.flows  = {key:0 for key in cvd.new_result_flows}
@@ -173,36 +559,348 @@ class People(cvb.BasePeople):
         dynam_keys = [lkey for lkey,is_dynam in self.pars['dynam_layer'].items() if is_dynam]
 
         # Loop over dynamic keys
+        inplace = self.pars.get('dynam_inplace')
+        n_pool  = self.pars.get('dynam_pool')
         for lkey in dynam_keys:
-            # Remove existing contacts
-            self.contacts.pop(lkey)
+            # Remove existing contacts; the layer is moved to the end, as when it is recreated
+            layer = self.contacts.pop(lkey)
 
             # Choose how many contacts to make
             pop_size   = len(self)
             n_contacts = self.pars['contacts'][lkey]
             n_new = int(n_contacts*pop_size/2) # Since these get looped over in both directions later
 
-            # Create the contacts
-            new_contacts = {} # Initialize
-            new_contacts['p1']   = np.array(cvu.choose_r(max_n=pop_size, n=n_new), dtype=cvd.default_int) # Choose with replacement
-            new_contacts['p2']   = np.array(cvu.choose_r(max_n=pop_size, n=n_new), dtype=cvd.default_int)
-            new_contacts['beta'] = np.ones(n_new, dtype=cvd.default_float)
-
-            # Add to contacts
-            self.add_contacts(new_contacts, lkey=lkey)
-            self.contacts[lkey].validate()
+            # Optionally pick one of a pool of pre-generated networks instead
+            if n_pool:
+                self.contacts[lkey] = self.sample_dynam_pool(lkey, n_new, n_pool, prev=layer)
+                continue
+
+            # Create the contacts, reusing the existing arrays if requested and possible
+            if not inplace or len(layer) != n_new or layer.keys() != ['p1', 'p2', 'beta']:
+                layer = cvb.Layer()
+                layer['p1']   = np.empty(n_new, dtype=cvd.default_int)
+                layer['p2']   = np.empty(n_new, dtype=cvd.default_int)
+                layer['beta'] = cvm.scalar_array(1.0, n_new) if self.pars.get('scalar_beta') else np.empty(n_new, dtype=cvd.default_float)
+            else:
+                layer._index = None # The arrays are about to be modified in place, so the edge index is no longer valid
+            cvu.choose_r_inplace(pop_size, layer['p1']) # Choose with replacement
+            cvu.choose_r_inplace(pop_size, layer['p2'])
+            layer['beta'].fill(1.0)
+            self.contacts[lkey] = layer
 
         return self.contacts
 
 
+    def sample_dynam_pool(self, lkey, n_new, n_pool, prev=None):
+        '''
+        Return one of a pool of pre-generated random networks for a dynamic layer,
+        chosen at random. Called by update_contacts() if pars['dynam_pool'] is set.
+        The pool is generated the first time it is needed, and regenerated if the
+        number of networks or contacts changes. A larger pool uses more memory,
+        but is closer to generating a new network each day.
+
+        The returned layer is new, but shares its arrays with the pool, so edges
+        can be added or removed (e.g. by clip_edges()) without affecting the pool;
+        the arrays themselves should not be modified in place. The edge index of
+        each network (see Layer.get_index()) is kept with the pool, so it is only
+        built once per network.
+
+        Args:
+            lkey (str): the layer key
+            n_new (int): the number of contacts in each network
+            n_pool (int): the number of networks in the pool
+            prev (Layer): the layer being replaced, whose edge index is kept if it came from the pool
+        '''
+        if self._dynam_pool is None:
+            self._dynam_pool = {}
+        pool = self._dynam_pool.get(lkey)
+
+        # Keep the edge index of the previous network, if one was built
+        if pool is not None and prev is not None and prev.valid_index() is not None:
+            for entry in pool:
+                entry.share_index(prev)
+
+        # Generate the pool if needed
+        if pool is None or len(pool) != n_pool or len(pool[0]) != n_new:
+            pop_size = len(self)
+            pool = []
+            for k in range(n_pool):
+                entry = cvb.Layer()
+                entry['p1']   = np.empty(n_new, dtype=cvd.default_int)
+                entry['p2']   = np.empty(n_new, dtype=cvd.default_int)
+                entry['beta'] = cvm.scalar_array(1.0, n_new) if self.pars.get('scalar_beta') else np.ones(n_new, dtype=cvd.default_float)
+                cvu.choose_r_inplace(pop_size, entry['p1']) # Choose with replacement
+                cvu.choose_r_inplace(pop_size, entry['p2'])
+                pool.append(entry)
+            self._dynam_pool[lkey] = pool
+
+        # Choose a network and return a layer that shares its arrays
+        entry = pool[np.random.randint(n_pool)]
+        layer = cvb.Layer()
+        for key in entry.keys():
+            layer[key] = entry[key]
+        layer.share_index(entry)
+        return layer
+
+
+    def compute_trans_sus(self, beta_layer, viral_load, asymp_factor, iso_factor, quar_factor):
+        '''
+        Calculate everyone's relative transmissibility and susceptibility for a
+        layer, taking into account their current states; see cvu.compute_trans_sus()
+
+        Args:
+            beta_layer (float): the transmissibility of the layer
+            viral_load (array): everyone's current viral load
+            asymp_factor (float): the relative transmissibility of asymptomatic people
+            iso_factor (float): the relative transmissibility of diagnosed people
+            quar_factor (float): the relative transmissibility and susceptibility of quarantined people
+
+        Returns:
+            rel_trans, rel_sus (arrays): the relative transmissibility and susceptibility
+        '''
+        if self._flags is not None:
+            return cvu.compute_trans_sus_packed(self.rel_trans, self.rel_sus, self._flags, beta_layer, viral_load, asymp_factor, iso_factor, quar_factor)
+        else:
+            return cvu.compute_trans_sus(self.rel_trans, self.rel_sus, self.infectious, self.susceptible, beta_layer, viral_load, self.symptomatic, self.diagnosed, self.quarantined, asymp_factor, iso_factor, quar_factor)
+
+
+    def isolation_states(self):
+        '''
+        Return the states needed by cvu.compute_infections_fused() and cvu.compute_infections_sparse()
+        without copying them: the packed states if pars['packed_states'] is True,
+        otherwise the diagnosed and quarantined states, with empty arrays for the
+        ones not used.
+
+        Returns:
+            flags, diag, quar (arrays): the packed, diagnosed, and quarantined states
+        '''
+        if self._flags is not None:
+            empty = np.empty(0, dtype=bool)
+            return self._flags, empty, empty
+        else:
+            return np.empty(0, dtype=np.uint16), self.diagnosed, self.quarantined
+
+
     #%% Methods for updating state
 
-    def check_inds(self, current, date, filter_inds=None):
-        ''' Return indices for which the current state is false and which meet the date criterion '''
+    def set_state(self, key, inds, value):
+        '''
+        Set a state (e.g. 'exposed') for the specified people, updating the
+        running stock counts if they are being used (see count()). All changes
+        to the states counted in the results (e.g. people.severe) should be made
+        via this method, otherwise the running counts will be incorrect.
+
+        Args:
+            key (str): the state to set
+            inds (int or array): the people to set the state for; must not contain duplicates
+            value (bool): the value to set
+        '''
+        arr = self[key]
+        if self._stock_counts is not None and key in self._stock_counts:
+            n_changed = np.count_nonzero(arr[inds] != value)
+            self._stock_counts[key] += n_changed if value else -n_changed
+        if self._index_cache:
+            self.clear_index_cache(key)
+        arr[inds] = value
+        return
+
+
+    def true(self, key):
+        '''
+        Return the indices of people for whom a state (e.g. 'diagnosed') is true.
+        If pars['index_cache'] is True, the indices are only found the first time
+        they are needed in each timestep, and the same array is returned until the
+        state is changed via set_state() (see clear_index_cache()), so it is read-only.
+        '''
+        return self._cached_inds('true', key)
+
+
+    def false(self, key):
+        ''' Return the indices of people for whom a state is false; see true() '''
+        return self._cached_inds('false', key)
+
+
+    def _cached_inds(self, kind, key):
+        ''' Find the indices for true() or false(), or get them from the cache '''
+        if self._index_cache is None:
+            if not self.pars.get('index_cache'):
+                return getattr(super(), kind)(key)
+            self._index_cache = {}
+        try:
+            return self._index_cache[(kind, key)]
+        except KeyError:
+            inds = getattr(super(), kind)(key)
+            inds.flags.writeable = False # The same array is returned to every caller, so it mustn't be changed
+            self._index_cache[(kind, key)] = inds
+            return inds
+
+
+    def clear_index_cache(self, key=None):
+        '''
+        Remove the cached indices of a state (e.g. 'diagnosed'), or of all states if
+        key is None, so they are found again the next time they are needed. Called
+        automatically by set_state() and at the start of each timestep; only needs
+        to be called directly if a state is changed without using set_state()
+        (e.g. people.diagnosed[inds] = True) partway through a timestep.
+        '''
+        if self._index_cache:
+            if key is None:
+                self._index_cache.clear()
+            else:
+                self._index_cache.pop(('true', key), None)
+                self._index_cache.pop(('false', key), None)
+        return
+
+
+    def set_date(self, key, inds, value):
+        '''
+        Set a date (e.g. 'date_tested') for the specified people, updating the
+        index used by on_date() if pars['date_index'] is True. All changes to the
+        indexed dates (see cvd.indexed_dates) should be made via this method,
+        otherwise on_date() may miss people.
+
+        Args:
+            key (str): the date to set
+            inds (int or array): the people to set the date for
+            value (float or array): the date, either the same for everyone or one per person
+        '''
+        self[key][inds] = value
+        if self._date_index is not None and key in cvd.indexed_dates:
+            self._add_to_date_index(key, inds, self[key][inds]) # Use the values as stored, e.g. rounded if pars['int_dates'] is True
+        return
+
+
+    def _add_to_date_index(self, key, inds, value):
+        ''' Record that these people have this date, grouped by whole day; undefined dates are skipped '''
+        inds = np.atleast_1d(inds).astype(np.int64)
+        if np.ndim(value) == 0: # A single person
+            if np.isfinite(value) and len(inds):
+                self._date_index[(key, int(np.floor(value)))].append(inds)
+        else:
+            days = np.floor(np.asarray(value, dtype=np.float64))
+            defined = np.isfinite(days)
+            inds, days = inds[defined], days[defined].astype(np.int64)
+            for day in np.unique(days):
+                self._date_index[(key, int(day))].append(inds[days == day])
+        return
+
+
+    def make_date_index(self, key=None):
+        '''
+        (Re)make the index of the people with each of the indexed dates (see
+        cvd.indexed_dates) on each day, from the current dates. Called automatically
+        if pars['date_index'] is True; only needs to be called directly if one of
+        these dates is changed without using set_date().
+
+        Args:
+            key (str): the date to index; if None, index all of them
+        '''
+        if self._date_index is None:
+            self._date_index = defaultdict(list)
+            self._date_index_start = {}
+            self._date_index_lags = {}
+        keys = cvd.indexed_dates if key is None else [key]
+        for index_key in [k for k in self._date_index.keys() if k[0] in keys]:
+            del self._date_index[index_key]
+        for key in keys:
+            self._date_index_start.pop(key, None) # Every day is indexed again
+            if key in self.keys(): # Dates may not be stored with some people profiles
+                inds = self.defined(key)
+                self._add_to_date_index(key, inds, self[key][inds])
+        return
+
+
+    def prune_date_index(self):
+        '''
+        Drop the days from the date index that are too far in the past to be looked
+        up again, so it doesn't grow over the sim. Each date keeps the days back to
+        the furthest before the current day that it has been looked up (by default,
+        the previous day); on_date() checks everyone for days that have been dropped.
+        Called automatically at the start of each timestep.
+        '''
+        start = {key:self.t - self._date_index_lags.get(key, 1) for key in cvd.indexed_dates}
+        for index_key in [k for k in self._date_index.keys() if k[1] < start[k[0]]]:
+            del self._date_index[index_key]
+        self._date_index_start.update(start)
+        return
+
+
+    def on_date(self, key, day):
+        '''
+        Return the indices of people for whom a date is the specified day, e.g.
+        people.on_date('date_tested', sim.t) returns the people who tested today.
+        Equivalent to cv.true(people[key] == day), but if pars['date_index'] is True
+        and the date is indexed (see cvd.indexed_dates), only the people recorded
+        for that day by set_date() are checked, rather than everyone (except for
+        days already dropped from the index; see prune_date_index()).
+
+        Args:
+            key (str): the date to check, e.g. 'date_diagnosed'
+            day (int): the day to look for
+        '''
+        if self._date_index is None or key not in cvd.indexed_dates:
+            return cvu.true(self[key] == day)
+        index_key = (key, int(np.floor(day)))
+        lag = self.t - index_key[1]
+        if lag > self._date_index_lags.get(key, 1): # Keep this many past days from now on
+            self._date_index_lags[key] = lag
+        if index_key[1] < self._date_index_start.get(key, index_key[1]): # The day has already been dropped from the index
+            return cvu.true(self[key] == day)
+        candidates = self._date_index.get(index_key)
+        if not candidates:
+            return np.empty(0, dtype=np.int64)
+        inds = np.unique(np.concatenate(candidates)) # Remove duplicates and sort, as for cv.true()
+        inds = inds[self[key][inds] == day] # Check that the date hasn't changed since it was recorded
+        self._date_index[index_key] = [inds] # Remove the people whose date has changed, so they aren't checked again
+        return inds.copy()
+
+
+    def count(self, key):
+        '''
+        Count the number of people for a given key. If pars['stock_counts'] is
+        'incremental' or 'check', the states counted in the results (e.g. 'severe')
+        use running counts that are updated by set_state(), rather than checking
+        every person.
+        '''
+        if self._stock_counts is None and self.pars.get('stock_counts', 'recount') != 'recount':
+            self.init_stock_counts()
+        if self._stock_counts is not None and key in self._stock_counts:
+            return self._stock_counts[key]
+        return super().count(key)
+
+
+    def init_stock_counts(self):
+        ''' Initialize the running stock counts from the current states '''
+        self._stock_counts = {key:super(People, self).count(key) for key in cvd.result_stocks.keys()}
+        return
+
+
+    def check_stock_counts(self):
+        ''' Check that the running stock counts match the current states '''
+        if self._stock_counts is not None:
+            for key,count in self._stock_counts.items():
+                actual = super().count(key)
+                if count != actual:
+                    errormsg = f'Running count of "{key}" is {count}, but {actual} people are {key}; was the state modified without using people.set_state()?'
+                    raise RuntimeError(errormsg)
+        return
+
+
+    def check_inds(self, current, date, filter_inds=None, event=None):
+        '''
+        Return indices for which the current state is false and which meet the date
+        criterion. If an event name is supplied (e.g. 'infectious') and the event
+        calendar is being used, only the people scheduled for that event today are
+        checked, rather than everyone in filter_inds.
+        '''
+        if event is not None and self.pars.get('event_calendar'):
+            return self.pop_events(event, current, date, filter_inds)
         if filter_inds is None:
             not_current = cvu.false(current)
         else:
             not_current = cvu.ifalsei(current, filter_inds)
+        if isinstance(date, cvb.IntDays): # Undefined dates are stored as large numbers, so only one integer comparison is needed
+            return not_current[date.values[not_current] <= self.t]
         has_date = cvu.idefinedi(date, not_current)
         inds     = cvu.itrue(self.t >= date[has_date], has_date)
         return inds
@@ -210,54 +908,48 @@ class People(cvb.BasePeople):
 
     def check_infectious(self):
         ''' Check if they become infectious '''
-        inds = self.check_inds(self.infectious, self.date_infectious, filter_inds=self.is_exp)
-        self.infectious[inds] = True
+        inds = self.check_inds(self.infectious, self.date_infectious, filter_inds=self.is_exp, event='infectious')
+        self.set_state('infectious', inds, True)
         return len(inds)
 
 
     def check_symptomatic(self):
         ''' Check for new progressions to symptomatic '''
-        inds = self.check_inds(self.symptomatic, self.date_symptomatic, filter_inds=self.is_exp)
-        self.symptomatic[inds] = True
+        inds = self.check_inds(self.symptomatic, self.date_symptomatic, filter_inds=self.is_exp, event='symptomatic')
+        self.set_state('symptomatic', inds, True)
         return len(inds)
 
 
     def check_severe(self):
         ''' Check for new progressions to severe '''
-        inds = self.check_inds(self.severe, self.date_severe, filter_inds=self.is_exp)
-        self.severe[inds] = True
+        inds = self.check_inds(self.severe, self.date_severe, filter_inds=self.is_exp, event='severe')
+        self.set_state('severe', inds, True)
         return len(inds)
 
 
     def check_critical(self):
         ''' Check for new progressions to critical '''
-        inds = self.check_inds(self.critical, self.date_critical, filter_inds=self.is_exp)
-        self.critical[inds] = True
+        inds = self.check_inds(self.critical, self.date_critical, filter_inds=self.is_exp, event='critical')
+        self.set_state('critical', inds, True)
         return len(inds)
 
 
     def check_recovery(self):
         ''' Check for recovery '''
-        inds = self.check_inds(self.recovered, self.date_recovered, filter_inds=self.is_exp)
-        self.exposed[inds]     = False
-        self.infectious[inds]  = False
-        self.symptomatic[inds] = False
-        self.severe[inds]      = False
-        self.critical[inds]    = False
-        self.recovered[inds]   = True
+        inds = self.check_inds(self.recovered, self.date_recovered, filter_inds=self.is_exp, event='recovered')
+        for key in ['exposed', 'infectious', 'symptomatic', 'severe', 'critical']:
+            self.set_state(key, inds, False)
+        self.set_state('recovered', inds, True)
         return len(inds)
 
 
     def check_death(self):
         ''' Check whether or not this person died on this timestep  '''
-        inds = self.check_inds(self.dead, self.date_dead, filter_inds=self.is_exp)
-        self.exposed[inds]     = False
-        self.infectious[inds]  = False
-        self.symptomatic[inds] = False
-        self.severe[inds]      = False
-        self.critical[inds]    = False
-        self.recovered[inds]   = False
-        self.dead[inds]        = True
+        inds = self.check_inds(self.dead, self.date_dead, filter_inds=self.is_exp, event='dead')
+        for key in ['exposed', 'infectious', 'symptomatic', 'severe', 'critical']:
+            self.set_state(key, inds, False)
+        self.set_state('recovered', inds, False)
+        self.set_state('dead', inds, True)
         return len(inds)
 
 
@@ -276,10 +968,10 @@ class People(cvb.BasePeople):
 
         # Handle people who were actually diagnosed today
         diag_inds  = self.check_inds(self.diagnosed, self.date_diagnosed, filter_inds=None) # Find who was actually diagnosed on this timestep
-        self.diagnosed[diag_inds]   = True # Set these people to be diagnosed
+        self.set_state('diagnosed', diag_inds, True) # Set these people to be diagnosed
         quarantined = cvu.itruei(self.quarantined, diag_inds)
-        self.date_end_quarantine[quarantined] = self.t # Set end quarantine date to match when the person left quarantine (and entered isolation)
-        self.quarantined[diag_inds] = False # If you are diagnosed, you are isolated, not in quarantine
+        self.set_date('date_end_quarantine', quarantined, self.t) # Set end quarantine date to match when the person left quarantine (and entered isolation)
+        self.set_state('quarantined', diag_inds, False) # If you are diagnosed, you are isolated, not in quarantine
 
         return len(test_pos_inds)
 
@@ -288,22 +980,82 @@ class People(cvb.BasePeople):
         ''' Update quarantine state '''
 
         n_quarantined = 0 # Number of people entering quarantine
-        for ind,end_day in self._pending_quarantine[self.t]:
-            if self.quarantined[ind]:
-                self.date_end_quarantine[ind] = max(self.date_end_quarantine[ind], end_day) # Extend quarantine if required
-            elif not (self.dead[ind] or self.recovered[ind] or self.diagnosed[ind]): # Unclear whether recovered should be included here
-                self.quarantined[ind] = True
-                self.date_quarantined[ind] = self.t
-                self.date_end_quarantine[ind] = end_day
-                n_quarantined += 1
+        pending = self._pending_quarantine.pop(self.t, None)
+        if pending:
+
+            # Find the latest end day requested for each person, since each request after the first extends their quarantine if required
+            inds     = np.concatenate([np.atleast_1d(inds) for inds,end_day in pending])
+            end_days = np.concatenate([np.broadcast_to(end_day, np.size(inds)) for inds,end_day in pending])
+            order    = np.argsort(inds, kind='stable')
+            inds, end_days = inds[order], end_days[order]
+            starts   = np.flatnonzero(np.r_[True, inds[1:] != inds[:-1]])
+            inds     = inds[starts]
+            end_days = np.maximum.reduceat(end_days, starts)
+
+            # Extend quarantine for people already in quarantine
+            quar = self.quarantined[inds]
+            extend_inds = inds[quar]
+            self.set_date('date_end_quarantine', extend_inds, np.maximum(self.date_end_quarantine[extend_inds], end_days[quar]))
+
+            # Start quarantine for everyone else who is eligible
+            eligible = ~quar & ~self.dead[inds] & ~self.recovered[inds] & ~self.diagnosed[inds] # Unclear whether recovered should be included here
+            start_inds = inds[eligible]
+            self.set_state('quarantined', start_inds, True)
+            self.set_date('date_quarantined', start_inds, self.t)
+            self.set_date('date_end_quarantine', start_inds, end_days[eligible])
+            n_quarantined = len(start_inds)
 
         # If someone on quarantine has reached the end of their quarantine, release them
         end_inds = self.check_inds(~self.quarantined, self.date_end_quarantine, filter_inds=None) # Note the double-negative here (~)
-        self.quarantined[end_inds] = False # Release from quarantine
+        self.set_state('quarantined', end_inds, False) # Release from quarantine
 
         return n_quarantined
 
 
+    def schedule_events(self, inds):
+        '''
+        Add the disease state transitions of the specified people to the event
+        calendar, based on their dates (e.g. date_infectious). Called by infect()
+        if pars['event_calendar'] is True, so that state updates only need to check
+        the people with a transition scheduled for that day. Since events are
+        validated against the current dates when they are popped, events that
+        become invalid (e.g. due to make_susceptible()) are simply ignored.
+
+        Args:
+            inds (array): the people whose transitions to schedule
+        '''
+        for state in cvd.calendar_states:
+            dates = self[f'date_{state}'][inds]
+            has_date = ~np.isnan(dates)
+            state_inds = inds[has_date]
+            days = np.maximum(np.ceil(dates[has_date]), self._next_event_day).astype(np.int64) # Check on the first day on or after the date; past events are checked as soon as possible
+            for day in np.unique(days):
+                self._events[(day, state)].append(state_inds[days == day])
+        return
+
+
+    def pop_events(self, state, current, date, filter_inds=None):
+        '''
+        Return the people scheduled for an event on the current day that are
+        still valid, using the same criteria as check_inds(). Typically called
+        via check_inds() rather than directly.
+
+        Args:
+            state (str): the event name, e.g. 'infectious'
+            current (array): the boolean state array, e.g. people.infectious
+            date (array): the date array, e.g. people.date_infectious
+            filter_inds (array): if not None, only people in this state are included (here, the exposed)
+        '''
+        scheduled = self._events.pop((self.t, state), [])
+        if not len(scheduled):
+            return np.empty(0, dtype=np.int64)
+        inds = np.unique(np.concatenate(scheduled)).astype(np.int64) # Remove duplicates and sort, as for check_inds()
+        valid = ~current[inds] & (date[inds] <= self.t) # Check they haven't already changed state and are still due, since dates may have changed
+        if filter_inds is not None:
+            valid &= self.exposed[inds] # Only the exposed are used as a filter, so this is faster than checking membership of filter_inds
+        return inds[valid]
+
+
     #%% Methods to make events occur (infection and diagnosis)
 
     def make_susceptible(self, inds):
@@ -312,9 +1064,9 @@ class People(cvb.BasePeople):
         '''
         for key in self.meta.states:
             if key == 'susceptible':
-                self[key][inds] = True
+                self.set_state(key, inds, True)
             else:
-                self[key][inds] = False
+                self.set_state(key, inds, False)
 
         for key in self.meta.dates + self.meta.durs:
             self[key][inds] = np.nan
@@ -335,7 +1087,7 @@ class People(cvb.BasePeople):
             hosp_max (bool):  whether or not there is an acute bed available for this person
             icu_max  (bool):  whether or not there is an ICU bed available for this person
             source   (array): source indices of the people who transmitted this infection (None if an importation or seed infection)
-            layer    (str):   contact layer this infection was transmitted on
+            layer    (str):   contact layer this infection was transmitted on; can also be an array of layer keys, one per infection
 
         Returns:
             count (int): number of people infected
@@ -346,89 +1098,158 @@ class People(cvb.BasePeople):
         inds = inds[unique]
         if source is not None:
             source = source[unique]
+        layer_arr = not isinstance(layer, str) and layer is not None # Whether each infection has its own layer
+        if layer_arr:
+            layer = layer[unique]
 
         # Keep only susceptibles
         keep = self.susceptible[inds] # Unique indices in inds and source that are also susceptible
         inds = inds[keep]
         if source is not None:
             source = source[keep]
+        if layer_arr:
+            layer = layer[keep]
 
         n_infections = len(inds)
         durpars      = self.pars['dur']
+        if not n_infections: # Nothing to do, e.g. for most layers on most timesteps in small populations
+            return 0
 
         # Set states
-        self.susceptible[inds]   = False
-        self.exposed[inds]       = True
-        self.date_exposed[inds]  = self.t
+        self.set_state('susceptible', inds, False)
+        self.set_state('exposed', inds, True)
+        if 'date_exposed' not in self.meta.disabled:
+            self.set_date('date_exposed', inds, self.t)
         self.flows['new_infections'] += len(inds)
 
         # Record transmissions
-        for i, target in enumerate(inds):
-            self.infection_log.append(dict(source=source[i] if source is not None else None, target=target, date=self.t, layer=layer))
+        if 'infection_log' not in self.meta.disabled:
+            self.infection_log.add(target=inds, source=source, date=self.t, layer=layer)
+
+        # Optionally determine everyone's prognoses in a single compiled pass
+        if self.pars.get('batch_infect'):
+            self.compute_prognoses(inds, hosp_max=hosp_max, icu_max=icu_max)
+            if self.pars.get('event_calendar'):
+                self.schedule_events(inds)
+            return n_infections
+
+        # Calculate how long before this person can infect other people
+        # The durations are calculated for these people only (indexed by position rather than by person), and then stored if the people profile includes them
+        dur_exp2inf, dur_inf2sym, dur_sym2sev, dur_sev2crit, dur_disease = [cvb.IntDays(n_infections) if self.pars.get('int_dates') else np.full(n_infections, np.nan, dtype=cvd.default_float) for _ in cvd.PeopleMeta.durs]
+        pos = np.arange(n_infections)
 
         # Calculate how long before this person can infect other people
-        self.dur_exp2inf[inds] = cvu.sample(**durpars['exp2inf'], size=n_infections)
-        self.date_infectious[inds] = self.dur_exp2inf[inds] + self.t
+        dur_exp2inf[pos] = cvu.sample(**durpars['exp2inf'], size=n_infections)
+        self.date_infectious[inds] = dur_exp2inf[pos] + self.t
 
         # Use prognosis probabilities to determine what happens to them
         symp_probs = self.pars['rel_symp_prob']*self.symp_prob[inds] # Calculate their actual probability of being symptomatic
         is_symp = cvu.binomial_arr(symp_probs) # Determine if they develop symptoms
-        symp_inds = inds[is_symp]
-        asymp_inds = inds[~is_symp] # Asymptomatic
+        symp_inds,  symp_pos  = inds[is_symp],  pos[is_symp]
+        asymp_inds, asymp_pos = inds[~is_symp], pos[~is_symp] # Asymptomatic
 
         # CASE 1: Asymptomatic: may infect others, but have no symptoms and do not die
         dur_asym2rec = cvu.sample(**durpars['asym2rec'], size=len(asymp_inds))
         self.date_recovered[asymp_inds] = self.date_infectious[asymp_inds] + dur_asym2rec  # Date they recover
-        self.dur_disease[asymp_inds] = self.dur_exp2inf[asymp_inds] + dur_asym2rec  # Store how long this person had COVID-19
+        dur_disease[asymp_pos] = dur_exp2inf[asymp_pos] + dur_asym2rec  # Store how long this person had COVID-19
 
         # CASE 2: Symptomatic: can either be mild, severe, or critical
         n_symp_inds = len(symp_inds)
-        self.dur_inf2sym[symp_inds] = cvu.sample(**durpars['inf2sym'], size=n_symp_inds) # Store how long this person took to develop symptoms
-        self.date_symptomatic[symp_inds] = self.date_infectious[symp_inds] + self.dur_inf2sym[symp_inds] # Date they become symptomatic
+        dur_inf2sym[symp_pos] = cvu.sample(**durpars['inf2sym'], size=n_symp_inds) # Store how long this person took to develop symptoms
+        self.date_symptomatic[symp_inds] = self.date_infectious[symp_inds] + dur_inf2sym[symp_pos] # Date they become symptomatic
         sev_probs = self.pars['rel_severe_prob'] * self.severe_prob[symp_inds] # Probability of these people being severe
         is_sev = cvu.binomial_arr(sev_probs) # See if they're a severe or mild case
-        sev_inds = symp_inds[is_sev]
-        mild_inds = symp_inds[~is_sev] # Not severe
+        sev_inds,  sev_pos  = symp_inds[is_sev],  symp_pos[is_sev]
+        mild_inds, mild_pos = symp_inds[~is_sev], symp_pos[~is_sev] # Not severe
 
         # CASE 2.1: Mild symptoms, no hospitalization required and no probability of death
         dur_mild2rec = cvu.sample(**durpars['mild2rec'], size=len(mild_inds))
         self.date_recovered[mild_inds] = self.date_symptomatic[mild_inds] + dur_mild2rec  # Date they recover
-        self.dur_disease[mild_inds] = self.dur_exp2inf[mild_inds] + self.dur_inf2sym[mild_inds] + dur_mild2rec  # Store how long this person had COVID-19
+        dur_disease[mild_pos] = dur_exp2inf[mild_pos] + dur_inf2sym[mild_pos] + dur_mild2rec  # Store how long this person had COVID-19
 
         # CASE 2.2: Severe cases: hospitalization required, may become critical
-        self.dur_sym2sev[sev_inds] = cvu.sample(**durpars['sym2sev'], size=len(sev_inds)) # Store how long this person took to develop severe symptoms
-        self.date_severe[sev_inds] = self.date_symptomatic[sev_inds] + self.dur_sym2sev[sev_inds]  # Date symptoms become severe
+        dur_sym2sev[sev_pos] = cvu.sample(**durpars['sym2sev'], size=len(sev_inds)) # Store how long this person took to develop severe symptoms
+        self.date_severe[sev_inds] = self.date_symptomatic[sev_inds] + dur_sym2sev[sev_pos]  # Date symptoms become severe
         crit_probs = self.pars['rel_crit_prob'] * self.crit_prob[sev_inds] * (self.pars['no_hosp_factor'] if hosp_max else 1.)# Probability of these people becoming critical - higher if no beds available
         is_crit = cvu.binomial_arr(crit_probs)  # See if they're a critical case
-        crit_inds = sev_inds[is_crit]
-        non_crit_inds = sev_inds[~is_crit]
+        crit_inds,     crit_pos     = sev_inds[is_crit],  sev_pos[is_crit]
+        non_crit_inds, non_crit_pos = sev_inds[~is_crit], sev_pos[~is_crit]
 
         # CASE 2.2.1 Not critical - they will recover
         dur_sev2rec = cvu.sample(**durpars['sev2rec'], size=len(non_crit_inds))
         self.date_recovered[non_crit_inds] = self.date_severe[non_crit_inds] + dur_sev2rec  # Date they recover
-        self.dur_disease[non_crit_inds] = self.dur_exp2inf[non_crit_inds] + self.dur_inf2sym[non_crit_inds] + self.dur_sym2sev[non_crit_inds] + dur_sev2rec  # Store how long this person had COVID-19
+        dur_disease[non_crit_pos] = dur_exp2inf[non_crit_pos] + dur_inf2sym[non_crit_pos] + dur_sym2sev[non_crit_pos] + dur_sev2rec  # Store how long this person had COVID-19
 
         # CASE 2.2.2: Critical cases: ICU required, may die
-        self.dur_sev2crit[crit_inds] = cvu.sample(**durpars['sev2crit'], size=len(crit_inds))
-        self.date_critical[crit_inds] = self.date_severe[crit_inds] + self.dur_sev2crit[crit_inds]  # Date they become critical
+        dur_sev2crit[crit_pos] = cvu.sample(**durpars['sev2crit'], size=len(crit_inds))
+        self.date_critical[crit_inds] = self.date_severe[crit_inds] + dur_sev2crit[crit_pos]  # Date they become critical
         death_probs = self.pars['rel_death_prob'] * self.death_prob[crit_inds] * (self.pars['no_icu_factor'] if icu_max else 1.) # Probability they'll die
         is_dead = cvu.binomial_arr(death_probs)  # Death outcome
-        dead_inds = crit_inds[is_dead]
-        alive_inds = crit_inds[~is_dead]
+        dead_inds,  dead_pos  = crit_inds[is_dead],  crit_pos[is_dead]
+        alive_inds, alive_pos = crit_inds[~is_dead], crit_pos[~is_dead]
 
         # CASE 2.2.2.1: Did not die
         dur_crit2rec = cvu.sample(**durpars['crit2rec'], size=len(alive_inds))
         self.date_recovered[alive_inds] = self.date_critical[alive_inds] + dur_crit2rec # Date they recover
-        self.dur_disease[alive_inds] = self.dur_exp2inf[alive_inds] + self.dur_inf2sym[alive_inds] + self.dur_sym2sev[alive_inds] + self.dur_sev2crit[alive_inds] + dur_crit2rec  # Store how long this person had COVID-19
+        dur_disease[alive_pos] = dur_exp2inf[alive_pos] + dur_inf2sym[alive_pos] + dur_sym2sev[alive_pos] + dur_sev2crit[alive_pos] + dur_crit2rec  # Store how long this person had COVID-19
 
         # CASE 2.2.2.2: Did die
         dur_crit2die = cvu.sample(**durpars['crit2die'], size=len(dead_inds))
         self.date_dead[dead_inds] = self.date_critical[dead_inds] + dur_crit2die # Date of death
-        self.dur_disease[dead_inds] = self.dur_exp2inf[dead_inds] + self.dur_inf2sym[dead_inds] + self.dur_sym2sev[dead_inds] + self.dur_sev2crit[dead_inds] + dur_crit2die   # Store how long this person had COVID-19
+        dur_disease[dead_pos] = dur_exp2inf[dead_pos] + dur_inf2sym[dead_pos] + dur_sym2sev[dead_pos] + dur_sev2crit[dead_pos] + dur_crit2die   # Store how long this person had COVID-19
+
+        # Store the durations
+        for key,dur in zip(cvd.PeopleMeta.durs, [dur_exp2inf, dur_inf2sym, dur_sym2sev, dur_sev2crit, dur_disease]):
+            if key in self.meta.durs:
+                self[key][inds] = dur[pos]
+
+        # Optionally add the state transitions to the event calendar
+        if self.pars.get('event_calendar'):
+            self.schedule_events(inds)
 
         return n_infections # For incrementing counters
 
 
+    def compute_prognoses(self, inds, hosp_max=None, icu_max=None):
+        '''
+        Determine the outcomes of a batch of new infections, using the same prognosis
+        tree as infect(), but sampling the durations for the whole batch at once and
+        following the branches in a single compiled pass (see cvu.compute_prognoses()).
+        Called by infect() if pars['batch_infect'] is True; results are statistically
+        equivalent, but the random number stream differs.
+
+        Args:
+            inds     (array): array of people who have just been infected
+            hosp_max (bool):  whether or not there is an acute bed available for this person
+            icu_max  (bool):  whether or not there is an ICU bed available for this person
+        '''
+        n        = len(inds)
+        pars     = self.pars
+        durpars  = pars['dur']
+        durs     = np.empty((len(cvd.prognosis_durs), n), dtype=cvd.default_float)
+        for d,key in enumerate(cvd.prognosis_durs):
+            durs[d,:] = cvu.sample(**durpars[key], size=n)
+        draws       = np.random.random((4, n)).astype(cvd.default_float)
+        crit_factor = pars['no_hosp_factor'] if hosp_max else 1.0
+        icu_factor  = pars['no_icu_factor']  if icu_max  else 1.0
+        symp_probs  = cvd.default_float(pars['rel_symp_prob'])              * self.symp_prob[inds]
+        sev_probs   = cvd.default_float(pars['rel_severe_prob'])            * self.severe_prob[inds]
+        crit_probs  = cvd.default_float(pars['rel_crit_prob']*crit_factor)  * self.crit_prob[inds]
+        death_probs = cvd.default_float(pars['rel_death_prob']*icu_factor)  * self.death_prob[inds]
+        keys = ['date_infectious', 'date_symptomatic', 'date_severe', 'date_critical', 'date_recovered', 'date_dead', 'dur_exp2inf', 'dur_inf2sym', 'dur_sym2sev', 'dur_sev2crit', 'dur_disease']
+        inds = np.asarray(inds, dtype=np.int64)
+        stored = [key in self.meta.all_states for key in keys] # Durations are not stored with some people profiles
+        if self.pars.get('int_dates') or not all(stored): # The kernel needs float arrays, so update float copies of these people's values, then store them
+            arrs = [self[key][inds] if is_stored else np.full(n, np.nan, dtype=cvd.default_float) for key,is_stored in zip(keys, stored)]
+            cvu.compute_prognoses(self.t, np.arange(n, dtype=np.int64), symp_probs, sev_probs, crit_probs, death_probs, draws, durs, *arrs)
+            for key,arr,is_stored in zip(keys, arrs, stored):
+                if is_stored:
+                    self[key][inds] = arr
+        else:
+            cvu.compute_prognoses(self.t, inds, symp_probs, sev_probs, crit_probs, death_probs, draws, durs, *[self[key] for key in keys])
+        return
+
+
     def test(self, inds, test_sensitivity=1.0, loss_prob=0.0, test_delay=0):
         '''
         Method to test people. Typically not to be called by the user directly;
@@ -442,8 +1263,8 @@ class People(cvb.BasePeople):
         '''
 
         inds = np.unique(inds)
-        self.tested[inds] = True
-        self.date_tested[inds] = self.t # Only keep the last time they tested
+        self.set_state('tested', inds, True)
+        self.set_date('date_tested', inds, self.t) # Only keep the last time they tested
 
         is_infectious = cvu.itruei(self.infectious, inds)
         pos_test      = cvu.n_binomial(test_sensitivity, len(is_infectious))
@@ -454,8 +1275,8 @@ class People(cvb.BasePeople):
         final_inds    = not_diagnosed[not_lost]
 
         # Store the date the person will be diagnosed, as well as the date they took the test which will come back positive
-        self.date_diagnosed[final_inds] = self.t + test_delay
-        self.date_pos_test[final_inds] = self.t
+        self.set_date('date_diagnosed', final_inds, self.t + test_delay)
+        self.set_date('date_pos_test', final_inds, self.t)
 
         return
 
@@ -478,8 +1299,9 @@ class People(cvb.BasePeople):
 
         start_date = self.t if start_date is None else int(start_date)
         period = self.pars['quar_period'] if period is None else int(period)
-        for ind in inds:
-            self._pending_quarantine[start_date].append((ind, start_date + period))
+        inds = np.array(inds, dtype=np.int64).ravel() # Copy, since the request is only checked on the start date
+        if len(inds):
+            self._pending_quarantine[start_date].append((inds, start_date + period))
         return
 
 
@@ -593,7 +1415,9 @@ class People(cvb.BasePeople):
                 if not np.isnan(date):
                     events.append((date, message))
 
-            for infection in self.infection_log:
+            log = self.infection_log
+            for i in np.nonzero((log.target == uid) | (log.source == uid))[0]: # Only check infections involving this person
+                infection = log[i]
                 lkey = infection['layer']
                 llabel = label_lkey(lkey)
                 if infection['target'] == uid:
@@ -603,7 +1427,7 @@ class People(cvb.BasePeople):
                         events.append((infection['date'], f'was infected with COVID as a seed infection'))
 
                 if infection['source'] == uid:
-                    x = len([a for a in self.infection_log if a['source'] == infection['target']])
+                    x = np.count_nonzero(log.source == infection['target'])
                     events.append((infection['date'],f'gave COVID to {infection["target"]} via the {llabel} layer ({x} secondary infections)'))
 
             if len(events):
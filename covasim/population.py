@@ -4,6 +4,7 @@ Defines functions for making the population.
 
 #%% Imports
 import numpy as np # Needed for a few things not provided by pl
+import scipy.sparse as spsp # For reordering people
 import sciris as sc
 from collections import defaultdict
 from . import requirements as cvreq
@@ -18,7 +19,7 @@ from . import people as cvppl
 # Specify all externally visible functions this file defines
 __all__ = ['make_people', 'make_randpop', 'make_random_contacts',
            'make_microstructured_contacts', 'make_hybrid_contacts',
-           'make_synthpop']
+           'make_synthpop', 'reorder_people']
 
 
 def make_people(sim, popdict=None, save_pop=False, popfile=None, die=True, reset=False, verbose=None, **kwargs):
@@ -87,6 +88,8 @@ def make_people(sim, popdict=None, save_pop=False, popfile=None, die=True, reset
 
     # Actually create the people
     people = cvppl.People(sim.pars, uid=popdict['uid'], age=popdict['age'], sex=popdict['sex'], contacts=popdict['contacts']) # List for storing the people
+    if sim.pars.get('reorder_people'):
+        reorder_people(people, method=sim['reorder_people'])
 
     average_age = sum(popdict['age']/pop_size)
     sc.printv(f'Created {pop_size} people, average age {average_age:0.2f} years', 2, verbose)
@@ -104,6 +107,55 @@ def make_people(sim, popdict=None, save_pop=False, popfile=None, die=True, reset
     return people
 
 
+def reorder_people(people, method='rcm'):
+    '''
+    Renumber the people so that people who are in contact usually have nearby
+    indices. Since transmission looks up the values of both people in each contact,
+    this makes it faster for large populations, as the values are then usually close
+    together in memory. The people's values and contacts are reordered consistently
+    (see people.reorder()), and people.uid keeps each person's original ID. Results
+    are statistically equivalent, but not identical, since the random numbers are
+    drawn in a different order. Called by make_people() if pars['reorder_people'] is
+    set; the people must not have been initialized.
+
+    Args:
+        people (People): the people to reorder, in place
+        method (str): 'rcm' to use the reverse Cuthill-McKee ordering of the static layers (i.e. those not in pars['dynam_layer']), or a layer key (e.g. 'h') to group people by their clusters (connected components) in that layer
+
+    Returns:
+        order (array): the original index of each person, in the new order
+
+    **Example**::
+
+        order = cv.reorder_people(sim.people, 'h') # Number the members of each household consecutively
+    '''
+    n = len(people)
+    if method == 'rcm':
+        dynam_layer = people.pars.get('dynam_layer', {})
+        layers = [layer for lkey,layer in people.contacts.items() if not dynam_layer.get(lkey)] # Dynamic layers are remade during the sim, so aren't used
+    elif method in people.contacts:
+        layers = [people.contacts[method]]
+    else:
+        choicestr = ', '.join(['rcm'] + [str(lkey) for lkey in people.contacts.keys()])
+        errormsg = f'Reordering method "{method}" not available; choices are: {choicestr}'
+        raise ValueError(errormsg)
+
+    # Create the graph of contacts, and find the order
+    p1 = np.concatenate([layer['p1'] for layer in layers] + [np.empty(0, dtype=cvd.default_int)])
+    p2 = np.concatenate([layer['p2'] for layer in layers] + [np.empty(0, dtype=cvd.default_int)])
+    graph = spsp.csr_matrix((np.ones(len(p1), dtype=np.int32), (p1, p2)), shape=(n, n))
+    if not n:
+        order = np.arange(n)
+    elif method == 'rcm':
+        order = spsp.csgraph.reverse_cuthill_mckee(graph, symmetric_mode=False) # The graph isn't symmetric since each edge is only stored once
+    else:
+        _, labels = spsp.csgraph.connected_components(graph, directed=False)
+        order = np.argsort(labels, kind='stable') # Keep the original order within each cluster
+
+    people.reorder(order)
+    return order
+
+
 def make_randpop(sim, use_age_data=True, use_household_data=True, sex_ratio=0.5, microstructure=False):
     '''
     Make a random population, with contacts.
@@ -53,7 +53,10 @@ def set_default_options():
     optdesc.precision = 'Set arithmetic precision for Numba -- 32-bit by default for efficiency'
     options.precision = int(os.getenv('COVASIM_PRECISION', 32))
 
-    optdesc.numba_parallel = 'Set Numba multithreading -- about 20% faster, but simulations become nondeterministic'
+    optdesc.scratch_dir = 'Set the folder for the files used by memory-mapped arrays (see the people_storage parameter); if None, use the system temporary folder'
+    options.scratch_dir = os.getenv('COVASIM_SCRATCH_DIR', None)
+
+    optdesc.numba_parallel = 'Set Numba multithreading -- about 20% faster, but simulations become nondeterministic unless the rand_streams parameter is used'
     options.numba_parallel = bool(int(os.getenv('COVASIM_NUMBA_PARALLEL', 0)))
 
     return options, optdesc
@@ -91,6 +94,7 @@ def set_option(key=None, value=None, **kwargs):
         - interactive:    convenience method to set show, close, and backend
         - precision:      the arithmetic to use in calculations
         - numba_parallel: whether to parallelize Numba
+        - scratch_dir:    the folder for memory-mapped arrays
 
     **Examples**::
 
@@ -67,6 +67,9 @@ class Sim(cvb.BaseSim):
         self.results_ready = False    # Whether or not results are ready
         self._default_ver  = version  # Default version of parameters used
         self._orig_pars    = None     # Store original parameters to optionally restore at the end of the simulation
+        self._viral_load   = None     # Viral load of each person, reused on each timestep
+        self._initial_people = None   # The values and contacts of the people as created, if pars['rewindable'] is True; see rewind()
+        self._step_calls   = None     # The functions to call for the interventions and analyzers on each timestep, if pars['fast_mode'] is True; see init_step_calls()
 
         # Update the parameters
         default_pars = cvpar.make_pars(version=version) # Start with default pars
@@ -112,6 +115,9 @@ class Sim(cvb.BaseSim):
         self.validate_layer_pars() # Once the population is initialized, validate the layer parameters again
         self.init_interventions() # Initialize the interventions
         self.init_analyzers() # ...and the interventions
+        self._step_calls = None
+        if self['fast_mode']:
+            self.init_step_calls() # Check the interventions and analyzers once, rather than on every timestep
         self.set_seed() # Reset the random seed again so the random number stream is consistent
         self.initialized   = True
         self.complete      = False
@@ -185,6 +191,28 @@ class Sim(cvb.BaseSim):
         return
 
 
+    def check_people_fields(self, fields, label):
+        '''
+        Raise an error if the people profile (see pars['people_profile']) doesn't
+        store all of the fields that an intervention, analyzer, or analysis needs.
+
+        Args:
+            fields (list): the names of the fields, e.g. ['date_exposed', 'infection_log']
+            label (str): what needs the fields, for the error message
+        '''
+        profile  = self['people_profile']
+        disabled = cvd.people_profiles.get(profile, [])
+        if self.people is not None and self.people.meta.disabled: # The people may have been created with a different profile
+            profile  = self.people.meta.profile
+            disabled = disabled + self.people.meta.disabled
+        missing = [field for field in fields if field in disabled]
+        if missing:
+            missingstr = ', '.join(missing)
+            errormsg = f'{label} needs {missingstr}, which are not stored with the people profile "{profile}"; use pars["people_profile"] = "full" to store them'
+            raise ValueError(errormsg)
+        return
+
+
     def validate_pars(self, validate_layers=True):
         '''
         Some parameters can take multiple types; this makes them consistent.
@@ -234,17 +262,52 @@ class Sim(cvb.BaseSim):
             errormsg = f'Population type "{choice}" not available; choices are: {choicestr}'
             raise ValueError(errormsg)
 
+        # Handle the transmission mode
+        trans_choices = ['layered', 'fused', 'sparse']
+        if self['trans_mode'] not in trans_choices:
+            choicestr = ', '.join(trans_choices)
+            errormsg = f'Transmission mode "{self["trans_mode"]}" not available; choices are: {choicestr}'
+            raise ValueError(errormsg)
+
+        # Handle the stock counting method
+        count_choices = ['recount', 'incremental', 'check']
+        if self['stock_counts'] not in count_choices:
+            choicestr = ', '.join(count_choices)
+            errormsg = f'Stock counting method "{self["stock_counts"]}" not available; choices are: {choicestr}'
+            raise ValueError(errormsg)
+
+        # Handle how people are stored
+        storage_choices = ['arrays', 'blocks', 'memmap']
+        if self['people_storage'] not in storage_choices:
+            choicestr = ', '.join(storage_choices)
+            errormsg = f'People storage "{self["people_storage"]}" not available; choices are: {choicestr}'
+            raise ValueError(errormsg)
+        if self['people_profile'] not in cvd.people_profiles:
+            choicestr = ', '.join(cvd.people_profiles.keys())
+            errormsg = f'People profile "{self["people_profile"]}" not available; choices are: {choicestr}'
+            raise ValueError(errormsg)
+
         # Handle interventions and analyzers
         self['interventions'] = sc.promotetolist(self['interventions'], keepnone=False)
         for i,interv in enumerate(self['interventions']):
             if isinstance(interv, dict): # It's a dictionary representation of an intervention
                 self['interventions'][i] = cvi.InterventionDict(**interv)
         self['analyzers'] = sc.promotetolist(self['analyzers'], keepnone=False)
+        for obj in self['interventions'] + self['analyzers']:
+            if hasattr(obj, 'people_fields'): # Functions can't declare their fields, so they need a people profile that stores them
+                self.check_people_fields(obj.people_fields(), obj.__class__.__name__)
 
         # Optionally handle layer parameters
         if validate_layers:
             self.validate_layer_pars()
 
+        # Handle how the people are reordered
+        reorder = self['reorder_people']
+        if reorder is not None and reorder != 'rcm' and reorder not in self.layer_keys():
+            choicestr = ', '.join(['rcm'] + [str(lkey) for lkey in self.layer_keys()])
+            errormsg = f'Reordering method "{reorder}" not available; choices are: None, {choicestr}'
+            raise ValueError(errormsg)
+
         # Handle verbose
         if self['verbose'] == 'brief':
             self['verbose'] = -1
@@ -381,7 +444,10 @@ class Sim(cvb.BaseSim):
             self.load_population(popfile=popfile)
 
         # Actually make the people
+        people = self.people
         self.people = cvpop.make_people(self, save_pop=save_pop, popfile=popfile, reset=reset, verbose=verbose, **kwargs)
+        if self['rewindable'] and not self.people.initialized and (self._initial_people is None or self.people is not people): # Keep a copy of newly created people, so the sim can be rewound; not needed when rewinding
+            self._initial_people = (self.people.snapshot(), sc.dcp(self.people.contacts))
         self.people.initialize() # Fully initialize the people
 
         # Create the seed infections
@@ -433,6 +499,28 @@ class Sim(cvb.BaseSim):
         return
 
 
+    def init_step_calls(self):
+        '''
+        Check the interventions and analyzers, and store the function to call for
+        each one on every timestep, so they don't need to be checked on every timestep.
+        Called by initialize() if pars['fast_mode'] is True; if the interventions or
+        analyzers are changed after that, this must be called again.
+        '''
+        self._step_calls = {}
+        for key,objclass,label in [('interventions', cvi.Intervention, 'Intervention'), ('analyzers', cva.Analyzer, 'Analyzer')]:
+            calls = []
+            for obj in self[key]:
+                if isinstance(obj, objclass):
+                    calls.append(obj.apply) # If it's an intervention or analyzer, call the apply() method
+                elif callable(obj):
+                    calls.append(obj) # If it's a function, call it directly
+                else:
+                    errormsg = f'{label} {obj} is neither callable nor an {label} object'
+                    raise ValueError(errormsg)
+            self._step_calls[key] = calls
+        return
+
+
     def rescale(self):
         ''' Dynamically rescale the population -- used during step() '''
         if self['rescale']:
@@ -469,8 +557,9 @@ class Sim(cvb.BaseSim):
         t = self.t
 
         # Perform initial operations
-        self.rescale() # Check if we need to rescale
         people   = self.people # Shorten this for later use
+        people.clear_index_cache() # States may have changed since the cached indices were found, e.g. if modified between timesteps
+        self.rescale() # Check if we need to rescale
         people.update_states_pre(t=t) # Update the state of everyone and count the flows
         contacts = people.update_contacts() # Compute new contacts
         hosp_max = people.count('severe')   > self['n_beds_hosp'] if self['n_beds_hosp'] else False # Check for acute bed constraint
@@ -483,14 +572,19 @@ class Sim(cvb.BaseSim):
             people.infect(inds=importation_inds, hosp_max=hosp_max, icu_max=icu_max, layer='importation')
 
         # Apply interventions
-        for intervention in self['interventions']:
-            if isinstance(intervention, cvi.Intervention):
-                intervention.apply(self) # If it's an intervention, call the apply() method
-            elif callable(intervention):
-                intervention(self) # If it's a function, call it directly
-            else:
-                errormsg = f'Intervention {intervention} is neither callable nor an Intervention object'
-                raise ValueError(errormsg)
+        step_calls = getattr(self, '_step_calls', None) # May not exist for sims saved by older versions
+        if step_calls is not None: # They've already been checked
+            for apply in step_calls['interventions']:
+                apply(self)
+        else:
+            for intervention in self['interventions']:
+                if isinstance(intervention, cvi.Intervention):
+                    intervention.apply(self) # If it's an intervention, call the apply() method
+                elif callable(intervention):
+                    intervention(self) # If it's a function, call it directly
+                else:
+                    errormsg = f'Intervention {intervention} is neither callable nor an Intervention object'
+                    raise ValueError(errormsg)
 
         people.update_states_post() # Check for state changes after interventions
 
@@ -503,32 +597,88 @@ class Sim(cvb.BaseSim):
         date_inf     = people.date_infectious
         date_rec     = people.date_recovered
         date_dead    = people.date_dead
-        viral_load = cvu.compute_viral_load(t, date_inf, date_rec, date_dead, frac_time, load_ratio, high_cap)
-
-        for lkey,layer in contacts.items():
-            p1 = layer['p1']
-            p2 = layer['p2']
-            betas   = layer['beta']
-
-            # Compute relative transmission and susceptibility
-            rel_trans   = people.rel_trans
-            rel_sus     = people.rel_sus
-            inf         = people.infectious
-            sus         = people.susceptible
-            symp        = people.symptomatic
-            diag        = people.diagnosed
-            quar        = people.quarantined
-            iso_factor  = cvd.default_float(self['iso_factor'][lkey])
-            quar_factor = cvd.default_float(self['quar_factor'][lkey])
-            beta_layer  = cvd.default_float(self['beta_layer'][lkey])
-            rel_trans, rel_sus = cvu.compute_trans_sus(rel_trans, rel_sus, inf, sus, beta_layer, viral_load, symp, diag, quar, asymp_factor, iso_factor, quar_factor)
-
-            # Calculate actual transmission
-            for sources,targets in [[p1,p2], [p2,p1]]: # Loop over the contact network from p1->p2 and p2->p1
-                source_inds, target_inds = cvu.compute_infections(beta, sources, targets, betas, rel_trans, rel_sus) # Calculate transmission!
-                people.infect(inds=target_inds, hosp_max=hosp_max, icu_max=icu_max, source=source_inds, layer=lkey) # Actually infect people
+        viral_load   = getattr(self, '_viral_load', None)
+        if viral_load is None or len(viral_load) != len(people): # Allocate the viral load array once; values are only used for people who are infectious
+            viral_load = self._viral_load = np.ones(len(people), dtype=cvd.default_float)
+        inf_inds = people.true('infectious')
+        if all(isinstance(dates, cvb.IntDays) for dates in [date_inf, date_rec, date_dead]): # Read whole days directly rather than converting everyone's dates to floats
+            cvu.compute_viral_load_sparse_int(t, inf_inds, date_inf.values, date_rec.values, date_dead.values, np.int16(cvb.IntDays.sentinel), frac_time, load_ratio, high_cap, viral_load)
+        else:
+            cvu.compute_viral_load_sparse(t, inf_inds, np.asarray(date_inf), np.asarray(date_rec), np.asarray(date_dead), frac_time, load_ratio, high_cap, viral_load) # Only calculate the viral load of people who are infectious
+        streams = self['rand_streams'] # Whether to use counter-based random numbers for transmission
+        keys = np.array([self.rng.key('transmission', t, l) if streams else 0 for l in range(len(contacts.keys()))], dtype=np.uint64) # One random stream per layer
+        batch = self['batch_infect'] # Whether to collect the infections from every layer and infect them in a single batch
+        infections = [] # Target, source, and layer arrays, if batching
+
+        # Default method -- compute transmission separately for each layer and direction
+        if self['trans_mode'] == 'layered':
+            for l,(lkey,layer) in enumerate(contacts.items()):
+                p1 = layer['p1']
+                p2 = layer['p2']
+                betas   = layer['beta']
+                scalar_beta = layer.scalar_beta() # If every edge has the same beta and it's only stored once, include it in the overall beta instead
+
+                # Compute relative transmission and susceptibility
+                iso_factor  = cvd.default_float(self['iso_factor'][lkey])
+                quar_factor = cvd.default_float(self['quar_factor'][lkey])
+                beta_layer  = cvd.default_float(self['beta_layer'][lkey])
+                rel_trans, rel_sus = people.compute_trans_sus(beta_layer, viral_load, asymp_factor, iso_factor, quar_factor)
+
+                # Calculate actual transmission
+                for direction,(sources,targets) in enumerate([[p1,p2], [p2,p1]]): # Loop over the contact network from p1->p2 and p2->p1
+                    if streams:
+                        source_inds, target_inds = cvu.compute_infections_streams(beta, sources, targets, betas, rel_trans, rel_sus, keys[l], direction)
+                    elif scalar_beta is not None:
+                        source_inds, target_inds = cvu.compute_infections_scalar(cvd.default_float(beta*scalar_beta), sources, targets, rel_trans, rel_sus)
+                    else:
+                        source_inds, target_inds = cvu.compute_infections(beta, sources, targets, betas, rel_trans, rel_sus) # Calculate transmission!
+                    if batch:
+                        infections.append((target_inds, source_inds, np.full(len(target_inds), lkey, dtype=object)))
+                    else:
+                        people.infect(inds=target_inds, hosp_max=hosp_max, icu_max=icu_max, source=source_inds, layer=lkey) # Actually infect people
+
+        # Sparse method -- only check the contacts of people who are infectious
+        elif self['trans_mode'] == 'sparse':
+            one = cvd.default_float(1.0)
+            n_people = len(people)
+            rel_trans, rel_sus = people.compute_trans_sus(one, viral_load, asymp_factor, one, one) # Layer-independent factors only
+            flags, diag, quar = people.isolation_states() # Read directly from the packed states, if used
+            sources = rel_trans.nonzero()[0]
+            for l,(lkey,layer) in enumerate(contacts.items()):
+                offsets, edges = layer.get_index(n_people)
+                iso_factor  = cvd.default_float(self['iso_factor'][lkey])
+                quar_factor = cvd.default_float(self['quar_factor'][lkey])
+                beta_layer  = cvd.default_float(self['beta_layer'][lkey])
+                source_inds, target_inds = cvu.compute_infections_sparse(beta, sources, offsets, edges, layer['p1'], layer['p2'], layer['beta'], beta_layer, iso_factor, quar_factor, rel_trans, rel_sus, flags, diag, quar, keys[l], streams)
+                if batch:
+                    infections.append((target_inds, source_inds, np.full(len(target_inds), lkey, dtype=object)))
+                else:
+                    people.infect(inds=target_inds, hosp_max=hosp_max, icu_max=icu_max, source=source_inds, layer=lkey)
+
+        # Alternate method -- compute transmission across all layers at once, then infect everyone in a single batch
+        else:
+            lkeys = contacts.keys()
+            one   = cvd.default_float(1.0)
+            rel_trans, rel_sus = people.compute_trans_sus(one, viral_load, asymp_factor, one, one) # Layer-independent factors only
+            flags, diag, quar = people.isolation_states() # Read directly from the packed states, if used
+            p1s          = cvu.typed_list([layer['p1']   for layer in contacts.values()], cvd.nbint)
+            p2s          = cvu.typed_list([layer['p2']   for layer in contacts.values()], cvd.nbint)
+            layer_betas  = cvu.typed_list([layer['beta'] if layer.scalar_beta() is None else layer['beta'][:1] for layer in contacts.values()], cvd.nbfloat) # Only pass one value if it's the same for every edge
+            beta_layers  = np.array([self['beta_layer'][lkey]  for lkey in lkeys], dtype=cvd.default_float)
+            iso_factors  = np.array([self['iso_factor'][lkey]  for lkey in lkeys], dtype=cvd.default_float)
+            quar_factors = np.array([self['quar_factor'][lkey] for lkey in lkeys], dtype=cvd.default_float)
+            source_inds, target_inds, layer_inds = cvu.compute_infections_fused(beta, p1s, p2s, layer_betas, beta_layers, iso_factors, quar_factors, rel_trans, rel_sus, flags, diag, quar, keys, streams)
+            layers = np.array(lkeys, dtype=object)[layer_inds] # Convert from layer indices to layer keys
+            people.infect(inds=target_inds, hosp_max=hosp_max, icu_max=icu_max, source=source_inds, layer=layers)
+
+        # If batching, infect everyone at once; people infected in more than one layer are attributed to the first, as they would be otherwise
+        if infections:
+            target_inds, source_inds, layers = [np.concatenate(arrs) for arrs in zip(*infections)]
+            people.infect(inds=target_inds, hosp_max=hosp_max, icu_max=icu_max, source=source_inds, layer=layers)
 
         # Update counts for this time step: stocks
+        if self['stock_counts'] == 'check':
+            people.check_stock_counts()
         for key in cvd.result_stocks.keys():
             self.results[f'n_{key}'][t] = people.count(key)
 
@@ -537,14 +687,18 @@ class Sim(cvb.BaseSim):
             self.results[key][t] += count
 
         # Apply analyzers -- same syntax as interventions
-        for analyzer in self['analyzers']:
-            if isinstance(analyzer, cva.Analyzer):
-                analyzer.apply(self) # If it's an intervention, call the apply() method
-            elif callable(analyzer):
-                analyzer(self) # If it's a function, call it directly
-            else:
-                errormsg = f'Analyzer {analyzer} is neither callable nor an Analyzer object'
-                raise ValueError(errormsg)
+        if step_calls is not None:
+            for apply in step_calls['analyzers']:
+                apply(self)
+        else:
+            for analyzer in self['analyzers']:
+                if isinstance(analyzer, cva.Analyzer):
+                    analyzer.apply(self) # If it's an intervention, call the apply() method
+                elif callable(analyzer):
+                    analyzer(self) # If it's a function, call it directly
+                else:
+                    errormsg = f'Analyzer {analyzer} is neither callable nor an Analyzer object'
+                    raise ValueError(errormsg)
 
         # Tidy up
         self.t += 1
@@ -596,27 +750,35 @@ class Sim(cvb.BaseSim):
         if self.t >= until: # NB. At the start, self.t is None so this check must occur after initialization
             raise AlreadyRunError(f'Simulation is currently at t={self.t}, requested to run until t={until} which has already been reached')
 
+        # Work out which checks are needed on each timestep: in fast mode, progress isn't printed
+        timelimit = self['timelimit']
+        stopping_func = self['stopping_func']
+        show_progress = verbose and not self['fast_mode']
+        check = timelimit or stopping_func or show_progress
+
         # Main simulation loop
         while self.t < until:
 
-            # Check if we were asked to stop
-            elapsed = sc.toc(T, output=True)
-            if self['timelimit'] and elapsed > self['timelimit']:
-                sc.printv(f"Time limit ({self['timelimit']} s) exceeded; call sim.finalize() to compute results if desired", 1, verbose)
-                return
-            elif self['stopping_func'] and self['stopping_func'](self):
-                sc.printv("Stopping function terminated the simulation; call sim.finalize() to compute results if desired", 1, verbose)
-                return
-
-            # Print progress
-            if verbose:
-                simlabel = f'"{self.label}": ' if self.label else ''
-                string = f'  Running {simlabel}{self.datevec[self.t]} ({self.t:2.0f}/{self.pars["n_days"]}) ({elapsed:0.2f} s) '
-                if verbose >= 2:
-                    sc.heading(string)
-                elif verbose>0:
-                    if not (self.t % int(1.0/verbose)):
-                        sc.progressbar(self.t+1, self.npts, label=string, length=20, newline=True)
+            if check:
+
+                # Check if we were asked to stop
+                elapsed = sc.toc(T, output=True)
+                if timelimit and elapsed > timelimit:
+                    sc.printv(f"Time limit ({timelimit} s) exceeded; call sim.finalize() to compute results if desired", 1, verbose)
+                    return
+                elif stopping_func and stopping_func(self):
+                    sc.printv("Stopping function terminated the simulation; call sim.finalize() to compute results if desired", 1, verbose)
+                    return
+
+                # Print progress
+                if show_progress:
+                    simlabel = f'"{self.label}": ' if self.label else ''
+                    string = f'  Running {simlabel}{self.datevec[self.t]} ({self.t:2.0f}/{self.pars["n_days"]}) ({elapsed:0.2f} s) '
+                    if verbose >= 2:
+                        sc.heading(string)
+                    elif verbose>0:
+                        if not (self.t % int(1.0/verbose)):
+                            sc.progressbar(self.t+1, self.npts, label=string, length=20, newline=True)
 
             # Do the heavy lifting -- actually run the model!
             self.step()
@@ -624,7 +786,7 @@ class Sim(cvb.BaseSim):
         # If simulation reached the end, finalize the results
         if self.complete:
             self.finalize(verbose=verbose, restore_pars=restore_pars)
-            sc.printv(f'Run finished after {elapsed:0.2f} s.\n', 1, verbose)
+            sc.printv(f'Run finished after {sc.toc(T, output=True):0.2f} s.\n', 1, verbose)
             if do_plot: # Optionally plot
                 self.plot(**kwargs)
             if output:
@@ -661,12 +823,8 @@ class Sim(cvb.BaseSim):
         self.compute_results(verbose=verbose) # Calculate the rest of the results
         self.results = sc.objdict(self.results) # Convert results to a odicts/objdict to allow e.g. sim.results.diagnoses
 
-        if restore_pars and self._orig_pars:
-            preserved = ['analyzers', 'interventions']
-            orig_pars_keys = list(self._orig_pars.keys()) # Get a list of keys so we can iterate over them
-            for key in orig_pars_keys:
-                if key not in preserved:
-                    self.pars[key] = self._orig_pars.pop(key) # Restore everything except for the analyzers and interventions
+        if restore_pars:
+            self.restore_pars()
 
         # Optionally print summary output
         if verbose: # Verbose is any non-zero value
@@ -678,6 +836,54 @@ class Sim(cvb.BaseSim):
         return
 
 
+    def restore_pars(self):
+        ''' Restore the parameters from before the run, except for the analyzers and interventions, which are restored by initialize() '''
+        if self._orig_pars:
+            preserved = ['analyzers', 'interventions']
+            orig_pars_keys = list(self._orig_pars.keys()) # Get a list of keys so we can iterate over them
+            for key in orig_pars_keys:
+                if key not in preserved:
+                    self.pars[key] = self._orig_pars.pop(key) # Restore everything except for the analyzers and interventions
+        return
+
+
+    def rewind(self, **kwargs):
+        '''
+        Reset the sim so it can be run again from the start, by restoring the people
+        as they were created (which only requires copying arrays), rather than creating
+        them again: only their prognoses and the seed infections are recalculated.
+        Requires pars['rewindable'] to be True when the sim is initialized. Parameters
+        that don't change the population (e.g. rand_seed or beta) can be updated:
+        the population is the same as before, but otherwise the results are identical
+        to those of a new sim with these parameters.
+
+        Args:
+            kwargs (dict): parameters to update
+
+        **Example**::
+
+            sim = cv.Sim(rewindable=True)
+            sim.run()
+            for seed in range(2, 10):
+                sim.rewind(rand_seed=seed)
+                sim.run()
+        '''
+        if self._initial_people is None:
+            errormsg = 'This sim cannot be rewound, since the people were not kept when it was initialized: please create it with rewindable=True'
+            raise ValueError(errormsg)
+        for key in ['pop_size', 'pop_type', 'location', 'contacts', 'packed_states', 'int_dates', 'people_storage', 'people_profile', 'reorder_people']:
+            if key in kwargs and kwargs[key] != self[key]:
+                errormsg = f'Cannot change "{key}" when rewinding, since the people are not recreated; use sim.initialize(reset=True) instead'
+                raise ValueError(errormsg)
+
+        self.restore_pars() # In case the sim was not run to the end
+        self.update_pars(kwargs)
+        self.people.reset(*self._initial_people)
+        self.initialize()
+        self._orig_pars = sc.dcp(self.pars) # As for run(), so the interventions and analyzers can be restored the next time
+        return
+
+
     def compute_results(self, verbose=None):
         ''' Perform final calculations on the results '''
         self.compute_prev_inci()
@@ -795,9 +1001,10 @@ class Sim(cvb.BaseSim):
 
         # Alternate (traditional) method -- count from the date of infection or outcome
         elif method in ['infectious', 'outcome']:
+            self.check_people_fields(['infection_log'], f'compute_r_eff(method="{method}")')
 
             # Store a mapping from each source to their date
-            source_dates = {}
+            source_dates = np.full(len(self.people), -1, dtype=np.int64) # -1 indicates no date
 
             for t in self.tvec:
 
@@ -811,18 +1018,13 @@ class Sim(cvb.BaseSim):
                 sources[t] = len(inds)
 
                 # Create the mapping from sources to dates
-                for ind in inds:
-                    source_dates[ind] = t
+                source_dates[inds] = t
 
-            # Targets are hard -- loop over the transmission tree
-            for transdict in self.people.infection_log:
-                source = transdict['source']
-                if source is not None and source in source_dates: # Skip seed infections and people with e.g. recovery after the end of the sim
-                    source_date = source_dates[source]
-                    targets[source_date] += 1
-
-                # for ind in inds:
-                #     targets[t] += len(self.people.transtree.targets[ind])
+            # Targets are hard -- use the transmission tree
+            sources_log = self.people.infection_log.source
+            log_dates = source_dates[sources_log[sources_log >= 0]] # Skip seed infections
+            log_dates = log_dates[log_dates >= 0] # Skip people with e.g. recovery after the end of the sim
+            targets += np.bincount(log_dates, minlength=self.npts)[:self.npts]
 
             # Populate the array -- to avoid divide-by-zero, skip indices that are 0
             r_eff = np.divide(targets, sources, out=np.full(self.npts, np.nan), where=sources > 0)
@@ -854,29 +1056,23 @@ class Sim(cvb.BaseSim):
         Returns:
             gen_time (dict): the generation time results
         '''
-
-        intervals1 = np.zeros(len(self.people))
-        intervals2 = np.zeros(len(self.people))
-        pos1 = 0
-        pos2 = 0
+        self.check_people_fields(['date_exposed', 'infection_log'], 'compute_gen_time()')
+        log = self.people.infection_log
+        has_source = log.source >= 0 # Skip seed infections
+        source_inds = log.source[has_source]
+        target_inds = log.target[has_source]
         date_exposed = self.people.date_exposed
         date_symptomatic = self.people.date_symptomatic
 
-        for infection in self.people.infection_log:
-            if infection['source'] is not None:
-                source_ind = infection['source']
-                target_ind = infection['target']
-                intervals1[pos1] = date_exposed[target_ind] - date_exposed[source_ind]
-                pos1 += 1
-                if np.isfinite(date_symptomatic[source_ind]) and np.isfinite(date_symptomatic[target_ind]):
-                    intervals2[pos2] = date_symptomatic[target_ind] - date_symptomatic[source_ind]
-                    pos2 += 1
+        intervals1 = (date_exposed[target_inds] - date_exposed[source_inds]).astype(np.float64)
+        both_symp = np.isfinite(date_symptomatic[source_inds]) & np.isfinite(date_symptomatic[target_inds])
+        intervals2 = (date_symptomatic[target_inds[both_symp]] - date_symptomatic[source_inds[both_symp]]).astype(np.float64)
 
         self.results['gen_time'] = {
-                'true':         np.mean(intervals1[:pos1]),
-                'true_std':     np.std(intervals1[:pos1]),
-                'clinical':     np.mean(intervals2[:pos2]),
-                'clinical_std': np.std(intervals2[:pos2])}
+                'true':         np.mean(intervals1),
+                'true_std':     np.std(intervals1),
+                'clinical':     np.mean(intervals2),
+                'clinical_std': np.std(intervals2)}
         return self.results['gen_time']
 
 
@@ -1062,6 +1258,7 @@ class Sim(cvb.BaseSim):
             sim.run()
             tt = sim.make_transtree()
         '''
+        self.check_people_fields(['date_exposed', 'infection_log'], 'make_transtree()')
         tt = cva.TransTree(self, *args, **kwargs)
         if output:
             return tt
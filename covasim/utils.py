@@ -19,11 +19,128 @@ __all__ = []
 nbbool  = nb.bool_
 nbint   = cvd.nbint
 nbfloat = cvd.nbfloat
+nbinds  = nb.types.Array(nb.int64, 1, 'A', readonly=True) # Indices that are only read, so they can also be read-only arrays, e.g. from people.true() if pars['index_cache'] is True
 
-# Specify whether to allow parallel Numba calculation -- about 20% faster, but the random number stream becomes nondeterministic
+# Specify whether to allow parallel Numba calculation -- about 20% faster, but the random number stream becomes nondeterministic unless counter-based random numbers are used (see RandStreams)
 parallel = cvo.numba_parallel
 
 
+#%% Counter-based random numbers
+
+__all__ += ['RandStreams']
+
+# Stream IDs used by RandStreams; new streams should be added at the end so existing streams are unchanged
+stream_ids = dict(
+    transmission = 1,
+    prognosis    = 2,
+    testing      = 3,
+    tracing      = 4,
+    population   = 5,
+)
+
+
+@nb.njit((nb.uint64,), cache=True)
+def mix64(x): # pragma: no cover
+    ''' The SplitMix64 finalizer: a fast, high-quality bijective hash of a 64-bit integer '''
+    x = (x ^ (x >> nb.uint64(30))) * nb.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> nb.uint64(27))) * nb.uint64(0x94D049BB133111EB)
+    return x ^ (x >> nb.uint64(31))
+
+
+@nb.njit((nb.uint64, nb.uint64), cache=True)
+def rand_counter(key, counter): # pragma: no cover
+    '''
+    A counter-based random number: a uniform number in [0,1) that depends only on
+    the key and the counter. Since no state is shared, draws can be made in any
+    order (including in parallel) and still give identical results.
+    '''
+    x = mix64(key ^ mix64(counter + nb.uint64(0x9E3779B97F4A7C15)))
+    return (x >> nb.uint64(11)) * (1.0/9007199254740992.0) # Use the top 53 bits, as for a double
+
+
+@nb.njit((nb.uint64, nb.int64, nb.int64), cache=True, parallel=parallel)
+def rand_counter_arr(key, start, n): # pragma: no cover
+    ''' Array version of rand_counter() for counters start, start+1, ..., start+n-1 '''
+    output = np.empty(n, dtype=np.float64)
+    for i in nb.prange(n):
+        output[i] = rand_counter(key, nb.uint64(start + i))
+    return output
+
+
+class RandStreams:
+    '''
+    Independent, reproducible random number streams derived from a single seed,
+    one for each subsystem of the model (transmission, prognosis, testing,
+    tracing, population). Each stream is split further by any number of integer
+    counters (e.g. the day, layer, or thread chunk), so that draws never depend
+    on the order in which they are made. Accessible via sim.rng.
+
+    Args:
+        seed (int): the random seed; if None, use a random one
+
+    **Examples**::
+
+        rng = cv.RandStreams(seed=1)
+        key = rng.key('transmission', 10, 2) # Key for day 10, layer 2
+        u = rng.random('testing', 100, 10) # 100 uniform numbers for testing on day 10
+        gen = rng.generator('tracing', 10) # A Numpy generator for tracing on day 10
+    '''
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = np.random.randint(1e9)
+        self.seed = int(seed)
+        return
+
+
+    def __repr__(self):
+        return f'RandStreams(seed={self.seed})'
+
+
+    def key(self, stream, *counters):
+        '''
+        Get the key (a 64-bit integer) for a stream, optionally split by counters
+
+        Args:
+            stream (str): the name of the stream, e.g. 'transmission'
+            counters (int): any number of non-negative integers to further split the stream
+        '''
+        try:
+            stream_id = stream_ids[stream]
+        except KeyError:
+            errormsg = f'Random stream "{stream}" not found; choices are: {", ".join(stream_ids.keys())}'
+            raise ValueError(errormsg)
+        key = mix64(np.uint64(self.seed))
+        for val in (stream_id,) + counters:
+            key = mix64(np.uint64(key ^ mix64(np.uint64(val))))
+        return np.uint64(key)
+
+
+    def random(self, stream, n, *counters):
+        '''
+        Draw n uniform random numbers in [0,1) from a stream; calling this again
+        with the same arguments gives the same numbers
+
+        Args:
+            stream (str): the name of the stream
+            n (int): the number of random numbers
+            counters (int): passed to rng.key()
+        '''
+        return rand_counter_arr(self.key(stream, *counters), 0, n)
+
+
+    def generator(self, stream, *counters):
+        '''
+        Get a Numpy random number generator for a stream, e.g. for sampling from
+        distributions other than the uniform distribution
+
+        Args:
+            stream (str): the name of the stream
+            counters (int): passed to rng.key()
+        '''
+        return np.random.Generator(np.random.Philox(key=int(self.key(stream, *counters))))
+
+
 #%% The core Covasim functions -- compute the infections
 
 @nb.njit(             (nbint, nbfloat[:], nbfloat[:],     nbfloat[:], nbfloat,   nbfloat,    nbfloat), cache=True, parallel=parallel)
@@ -69,6 +186,73 @@ def compute_viral_load(t,     time_start, time_recovered, time_dead,  frac_time,
     return load
 
 
+@nb.njit(             (nbint, nbinds,      nbfloat[:], nbfloat[:],     nbfloat[:], nbfloat,   nbfloat,    nbfloat,  nbfloat[:]), cache=True, parallel=parallel, error_model='numpy')
+def compute_viral_load_sparse(t, inds,     time_start, time_recovered, time_dead,  frac_time, load_ratio, high_cap, load): # pragma: no cover
+    '''
+    Version of compute_viral_load() that only calculates the viral load for the
+    specified people (e.g. those who are infectious), and stores it in an
+    existing array rather than allocating new ones. The results for these people
+    are identical to compute_viral_load(); the values for everyone else are left
+    unchanged, so the array should only be used in combination with an infectious
+    filter (as in compute_trans_sus()).
+
+    Args:
+        t: (int) timestep
+        inds: (int[]) indices of the people to calculate the viral load for
+        time_start, time_recovered, time_dead, frac_time, load_ratio, high_cap: as for compute_viral_load()
+        load: (float[]) array of viral loads to update in place
+    '''
+    one = cvd.default_float(1.0)
+    high = (load_ratio*True + one*False)/(one + frac_time*(load_ratio - one)) # Written the same way as compute_viral_load() for identical rounding
+    low  = (load_ratio*False + one*True)/(one + frac_time*(load_ratio - one))
+    for j in nb.prange(len(inds)):
+        i = inds[j]
+        time_stop = time_recovered[i]
+        if not np.isnan(time_dead[i]):
+            time_stop = time_dead[i]
+        infect_days_total = time_stop - time_start[i]
+        trans_point = frac_time
+        if frac_time*infect_days_total > high_cap: # Switch from high to low at the cap
+            trans_point = high_cap/infect_days_total
+        if (t - time_start[i])/infect_days_total < trans_point: # Early phase
+            load[i] = high
+        else:
+            load[i] = low
+    return
+
+
+@nb.njit(             (nbint, nbinds,      nb.int16[:], nb.int16[:],    nb.int16[:], nb.int16, nbfloat,   nbfloat,    nbfloat,  nbfloat[:]), cache=True, parallel=parallel, error_model='numpy')
+def compute_viral_load_sparse_int(t, inds, time_start, time_recovered, time_dead,   sentinel, frac_time, load_ratio, high_cap, load): # pragma: no cover
+    '''
+    Version of compute_viral_load_sparse() for dates stored as whole days (see
+    cv.IntDays), which reads the 16-bit values directly, so the dates of everyone
+    else don't need to be converted to floats. Gives identical results.
+
+    Args:
+        sentinel: (int) the value used for undefined dates, i.e. IntDays.sentinel
+        others: as for compute_viral_load_sparse()
+    '''
+    one = cvd.default_float(1.0)
+    nan = cvd.default_float(np.nan)
+    high = (load_ratio*True + one*False)/(one + frac_time*(load_ratio - one)) # Written the same way as compute_viral_load() for identical rounding
+    low  = (load_ratio*False + one*True)/(one + frac_time*(load_ratio - one))
+    for j in nb.prange(len(inds)):
+        i = inds[j]
+        start = cvd.default_float(time_start[i]) if time_start[i] != sentinel else nan
+        time_stop = cvd.default_float(time_recovered[i]) if time_recovered[i] != sentinel else nan
+        if time_dead[i] != sentinel:
+            time_stop = cvd.default_float(time_dead[i])
+        infect_days_total = time_stop - start
+        trans_point = frac_time
+        if frac_time*infect_days_total > high_cap: # Switch from high to low at the cap
+            trans_point = high_cap/infect_days_total
+        if (t - start)/infect_days_total < trans_point: # Early phase
+            load[i] = high
+        else:
+            load[i] = low
+    return
+
+
 @nb.njit(            (nbfloat[:], nbfloat[:], nbbool[:], nbbool[:], nbfloat,    nbfloat[:], nbbool[:], nbbool[:], nbbool[:], nbfloat,      nbfloat,    nbfloat), cache=True, parallel=parallel)
 def compute_trans_sus(rel_trans,  rel_sus,    inf,       sus,       beta_layer, viral_load, symp,      diag,      quar,      asymp_factor, iso_factor, quar_factor): # pragma: no cover
     ''' Calculate relative transmissibility and susceptibility '''
@@ -80,6 +264,34 @@ def compute_trans_sus(rel_trans,  rel_sus,    inf,       sus,       beta_layer,
     return rel_trans, rel_sus
 
 
+# Constants used by compute_trans_sus_packed()
+_one  = cvd.default_float(1.0)
+_zero = cvd.default_float(0.0)
+_sus_bit   = cvd.state_bits['susceptible']
+_inf_bit   = cvd.state_bits['infectious']
+_symp_bit  = cvd.state_bits['symptomatic']
+_diag_bit  = cvd.state_bits['diagnosed']
+_quar_bit  = cvd.state_bits['quarantined']
+
+@nb.njit(                    (nbfloat[:], nbfloat[:], nb.uint16[:], nbfloat,    nbfloat[:], nbfloat,      nbfloat,    nbfloat), cache=True, parallel=parallel)
+def compute_trans_sus_packed(rel_trans,  rel_sus,    flags,         beta_layer, viral_load, asymp_factor, iso_factor, quar_factor): # pragma: no cover
+    '''
+    Version of compute_trans_sus() that reads the states directly from the packed
+    array of states (see cv.PackedState). Gives identical results.
+    '''
+    n = len(flags)
+    trans = np.empty(n, dtype=rel_trans.dtype)
+    sus   = np.empty(n, dtype=rel_sus.dtype)
+    for i in nb.prange(n):
+        f = flags[i]
+        f_quar  = quar_factor if (f >> _quar_bit) & 1 else _one
+        f_asymp = _one if (f >> _symp_bit) & 1 else asymp_factor
+        f_iso   = iso_factor if (f >> _diag_bit) & 1 else _one
+        trans[i] = rel_trans[i] * f_quar * f_asymp * f_iso * beta_layer * viral_load[i] if (f >> _inf_bit) & 1 else _zero
+        sus[i]   = rel_sus[i] * f_quar if (f >> _sus_bit) & 1 else _zero
+    return trans, sus
+
+
 @nb.njit(             (nbfloat,  nbint[:], nbint[:],  nbfloat[:],  nbfloat[:], nbfloat[:]), cache=True, parallel=parallel)
 def compute_infections(beta,     sources,  targets,   layer_betas, rel_trans,  rel_sus):
     ''' The heaviest step of the model -- figure out who gets infected on this timestep '''
@@ -94,7 +306,318 @@ def compute_infections(beta,     sources,  targets,   layer_betas, rel_trans,  r
     return source_inds, target_inds
 
 
-@nb.njit((nbint[:], nbint[:], nb.int64[:]), cache=True)
+@nb.njit(             (nbfloat,  nbint[:], nbint[:],  nbfloat[:], nbfloat[:]), cache=True, parallel=parallel)
+def compute_infections_scalar(beta, sources, targets,  rel_trans,  rel_sus): # pragma: no cover
+    '''
+    Version of compute_infections() for layers where every edge has the same beta
+    (see Layer.compact_beta()), which should be multiplied into beta, so the beta
+    of each edge doesn't need to be looked up. Gives identical results.
+    '''
+    betas           = beta * rel_trans[sources] * rel_sus[targets] # Calculate the raw transmission probabilities
+    nonzero_inds    = betas.nonzero()[0] # Find nonzero entries
+    nonzero_betas   = betas[nonzero_inds] # Remove zero entries from beta
+    nonzero_sources = sources[nonzero_inds] # Remove zero entries from the sources
+    nonzero_targets = targets[nonzero_inds] # Remove zero entries from the targets
+    transmissions   = (np.random.random(len(nonzero_betas)) < nonzero_betas).nonzero()[0] # Compute the actual infections!
+    source_inds     = nonzero_sources[transmissions]
+    target_inds     = nonzero_targets[transmissions] # Filter the targets on the actual infections
+    return source_inds, target_inds
+
+
+@nb.njit(             (nbfloat,  nbint[:], nbint[:],  nbfloat[:],  nbfloat[:], nbfloat[:], nb.uint64, nb.int64), cache=True, parallel=parallel)
+def compute_infections_streams(beta, sources, targets,  layer_betas, rel_trans,  rel_sus,    key,       direction): # pragma: no cover
+    '''
+    Version of compute_infections() that uses counter-based random numbers: the
+    draw for edge i is rand_counter(key, 2*i+direction), so each edge and
+    direction always gets the same number for a given key. Since the draws do not
+    depend on the order in which the edges are processed, the results are the
+    same whether or not Numba parallelization is used.
+    '''
+    n = len(sources)
+    infected = np.zeros(n, dtype=np.bool_)
+    for i in nb.prange(n):
+        prob = beta * layer_betas[i] * rel_trans[sources[i]] * rel_sus[targets[i]]
+        if prob > 0:
+            infected[i] = rand_counter(key, nb.uint64(2*i + direction)) < prob
+    transmissions = infected.nonzero()[0]
+    source_inds   = sources[transmissions]
+    target_inds   = targets[transmissions]
+    return source_inds, target_inds
+
+
+@nb.njit(cache=True)
+def get_state(flags, states, bit, i): # pragma: no cover
+    '''
+    Read a state of person i: from the packed states (see cv.PackedState) if
+    flags isn't empty, otherwise from the boolean array of the state. Used by
+    compute_infections_fused() and compute_infections_sparse() so that packed
+    states don't need to be unpacked.
+    '''
+    if len(flags):
+        return ((flags[i] >> bit) & 1) != 0
+    return states[i]
+
+
+@nb.njit(cache=True)
+def edge_prob(source, target, trans, sus, beta_l, beta_e, iso_factor, quar_factor, flags, diag, quar): # pragma: no cover
+    '''
+    The probability of transmission along an edge, given the nonzero layer-independent
+    transmissibility of the source and susceptibility of the target; see
+    compute_infections_fused(). Only called for these edges, since passing arrays
+    to a function on every edge is slow.
+    '''
+    if get_state(flags, diag, _diag_bit, source):
+        trans *= iso_factor
+    if get_state(flags, quar, _quar_bit, source):
+        trans *= quar_factor
+    if get_state(flags, quar, _quar_bit, target):
+        sus *= quar_factor
+    return beta_l * beta_e * trans * sus
+
+
+@nb.njit(                   (nbfloat, nb.types.ListType(nbint[::1]), nb.types.ListType(nbint[::1]), nb.types.ListType(nbfloat[::1]), nbfloat[:],  nbfloat[:],  nbfloat[:],   nbfloat[:], nbfloat[:], nb.uint16[:], nbbool[:], nbbool[:], nb.uint64[:], nbbool), cache=True, parallel=parallel)
+def compute_infections_fused(beta,    p1s,                           p2s,                           layer_betas,                     beta_layers, iso_factors, quar_factors, rel_trans,  rel_sus,    flags,        diag,      quar,      keys,         streams): # pragma: no cover
+    '''
+    Fused version of compute_trans_sus() and compute_infections() across all
+    layers. Each edge is evaluated in both directions in a single pass, and the
+    layer-specific isolation and quarantine factors are applied on the fly, so
+    no population- or edge-length temporary arrays are allocated. With counter-based
+    random numbers, the edges of each layer are checked in parallel (if Numba
+    parallelization is used), which requires one boolean per edge and direction.
+
+    Args:
+        beta (float): overall transmissibility
+        p1s (list): typed list of the p1 array of each layer
+        p2s (list): typed list of the p2 array of each layer
+        layer_betas (list): typed list of the per-edge beta array of each layer, or of a single value if every edge of the layer has the same beta
+        beta_layers (float[]): transmissibility of each layer
+        iso_factors (float[]): isolation factor of each layer
+        quar_factors (float[]): quarantine factor of each layer
+        rel_trans (float[]): layer-independent transmissibility, i.e. already including infectiousness, viral load, and the asymptomatic factor
+        rel_sus (float[]): layer-independent susceptibility, i.e. already including whether or not people are susceptible
+        flags (uint16[]): the packed states, if pars['packed_states'] is True, otherwise empty; see people.isolation_states()
+        diag (bool[]): whether each person is diagnosed, if the states aren't packed, otherwise empty
+        quar (bool[]): whether each person is in quarantine, if the states aren't packed, otherwise empty
+        keys (uint64[]): if streams is True, the random stream key of each layer, from RandStreams.key()
+        streams (bool): whether to use counter-based random numbers (see compute_infections_streams()) instead of Numba's random number stream
+
+    Returns:
+        source_inds, target_inds, layer_inds (int[]): one entry per infection, in order of layer and then edge
+    '''
+    n_alloc = 256
+    source_inds = np.empty(n_alloc, dtype=cvd.default_int)
+    target_inds = np.empty(n_alloc, dtype=cvd.default_int)
+    layer_inds  = np.empty(n_alloc, dtype=cvd.default_int)
+    count = 0
+    for l in range(len(p1s)):
+        p1 = p1s[l]
+        p2 = p2s[l]
+        betas = layer_betas[l]
+        scalar_beta = len(betas) < len(p1) # Whether to use the same beta for every edge
+        beta_l = beta*beta_layers[l]
+        iso_factor = iso_factors[l]
+        quar_factor = quar_factors[l]
+        n = 2*len(p1) # Each edge in both directions: k = 2*edge + direction, i.e. p1->p2 and then p2->p1
+
+        # Counter-based draws don't depend on the order, so check every edge in parallel first
+        infected = np.zeros(n if streams else 0, dtype=np.bool_)
+        if streams:
+            for k in nb.prange(n):
+                i = k // 2
+                source = p1[i] if k % 2 == 0 else p2[i]
+                target = p2[i] if k % 2 == 0 else p1[i]
+                trans = rel_trans[source]
+                if trans == 0:
+                    continue
+                sus = rel_sus[target]
+                if sus == 0:
+                    continue
+                prob = edge_prob(source, target, trans, sus, beta_l, betas[0] if scalar_beta else betas[i], iso_factor, quar_factor, flags, diag, quar)
+                if prob > 0:
+                    infected[k] = rand_counter(keys[l], nb.uint64(k)) < prob
+
+        # Collect the infections in order, drawing the random numbers now if not using counter-based ones
+        for k in range(n):
+            if streams and not infected[k]:
+                continue
+            i = k // 2
+            source = p1[i] if k % 2 == 0 else p2[i]
+            target = p2[i] if k % 2 == 0 else p1[i]
+            if not streams:
+                trans = rel_trans[source]
+                if trans == 0:
+                    continue
+                sus = rel_sus[target]
+                if sus == 0:
+                    continue
+                prob = edge_prob(source, target, trans, sus, beta_l, betas[0] if scalar_beta else betas[i], iso_factor, quar_factor, flags, diag, quar)
+                if prob <= 0 or np.random.random() >= prob: # Compute the actual infection
+                    continue
+            if count == n_alloc: # Out of room, double the size of the output arrays
+                n_alloc *= 2
+                source_inds = np.resize(source_inds, n_alloc)
+                target_inds = np.resize(target_inds, n_alloc)
+                layer_inds  = np.resize(layer_inds, n_alloc)
+            source_inds[count] = source
+            target_inds[count] = target
+            layer_inds[count]  = l
+            count += 1
+    return source_inds[:count], target_inds[:count], layer_inds[:count]
+
+
+def typed_list(arrays, nbtype):
+    '''
+    Convert a list of arrays into a Numba typed list of contiguous arrays, as
+    required by compute_infections_fused(). Only the list is new; the arrays
+    themselves are not copied unless they are not contiguous.
+
+    Args:
+        arrays (list): the arrays to include
+        nbtype (type): the Numba type of the array elements, e.g. cvd.nbint
+    '''
+    output = nb.typed.List.empty_list(nbtype[::1])
+    for arr in arrays:
+        output.append(np.ascontiguousarray(arr))
+    return output
+
+
+@nb.njit(             (nbfloat, nb.int64[:], nb.int64[:], nb.int64[:], nbint[:], nbint[:], nbfloat[:],  nbfloat,    nbfloat,    nbfloat,     nbfloat[:], nbfloat[:], nb.uint16[:], nbbool[:], nbbool[:], nb.uint64, nbbool), cache=True, parallel=parallel)
+def compute_infections_sparse(beta, sources, offsets,   edges,       p1,       p2,       layer_betas, beta_layer, iso_factor, quar_factor, rel_trans,  rel_sus,    flags,        diag,      quar,      key,       streams): # pragma: no cover
+    '''
+    Sparse version of compute_trans_sus() and compute_infections() for a single
+    layer. Rather than looping over every edge, only the edges incident to the
+    specified sources are checked, using the index returned by Layer.get_index().
+    The cost is thus proportional to the number of infectious people times their
+    number of contacts, rather than to the total number of contacts. With
+    counter-based random numbers, the sources are checked in parallel (if Numba
+    parallelization is used).
+
+    Args:
+        beta (float): overall transmissibility
+        sources (int[]): indices of the people who could transmit, i.e. those with nonzero rel_trans
+        offsets (int[]): for each person, the offset into edges of their incident edges
+        edges (int[]): indices of the edges incident to each person
+        p1 (int[]): the p1 array of the layer
+        p2 (int[]): the p2 array of the layer
+        layer_betas (float[]): the per-edge beta array of the layer
+        beta_layer (float): transmissibility of the layer
+        iso_factor (float): isolation factor of the layer
+        quar_factor (float): quarantine factor of the layer
+        rel_trans (float[]): layer-independent transmissibility, as for compute_infections_fused()
+        rel_sus (float[]): layer-independent susceptibility, as for compute_infections_fused()
+        flags (uint16[]): the packed states, or empty, as for compute_infections_fused()
+        diag (bool[]): whether each person is diagnosed, or empty, as for compute_infections_fused()
+        quar (bool[]): whether each person is in quarantine, or empty, as for compute_infections_fused()
+        key (uint64): if streams is True, the random stream key of the layer, from RandStreams.key()
+        streams (bool): whether to use counter-based random numbers (see compute_infections_streams()) instead of Numba's random number stream
+
+    Returns:
+        source_inds, target_inds (int[]): one entry per infection, in order of source and then edge
+    '''
+    n_alloc = 256
+    source_inds = np.empty(n_alloc, dtype=cvd.default_int)
+    target_inds = np.empty(n_alloc, dtype=cvd.default_int)
+    count = 0
+    beta_l = beta*beta_layer
+    n_sources = len(sources)
+
+    # Counter-based draws don't depend on the order, so check every source in parallel first, with one entry per incident edge
+    starts = np.zeros(n_sources+1 if streams else 1, dtype=np.int64)
+    if streams:
+        for s in range(n_sources):
+            starts[s+1] = starts[s] + offsets[sources[s]+1] - offsets[sources[s]]
+    infected = np.zeros(starts[-1], dtype=np.bool_)
+    if streams:
+        for s in nb.prange(n_sources):
+            source = sources[s]
+            trans = rel_trans[source]
+            if trans == 0:
+                continue
+            if get_state(flags, diag, _diag_bit, source):
+                trans *= iso_factor
+            if get_state(flags, quar, _quar_bit, source):
+                trans *= quar_factor
+            for j in range(offsets[source], offsets[source+1]):
+                e = edges[j]
+                direction = 0 if p1[e] == source else 1 # Work out which end of the edge the source is on
+                target = p2[e] if direction == 0 else p1[e]
+                sus = rel_sus[target]
+                if sus == 0:
+                    continue
+                if get_state(flags, quar, _quar_bit, target):
+                    sus *= quar_factor
+                prob = beta_l * layer_betas[e] * trans * sus
+                if prob > 0:
+                    infected[starts[s] + j - offsets[source]] = rand_counter(key, nb.uint64(2*e + direction)) < prob
+
+    # Collect the infections in order, drawing the random numbers now if not using counter-based ones
+    for s in range(n_sources):
+        source = sources[s]
+        trans = rel_trans[source]
+        if trans == 0:
+            continue
+        if get_state(flags, diag, _diag_bit, source):
+            trans *= iso_factor
+        if get_state(flags, quar, _quar_bit, source):
+            trans *= quar_factor
+        for j in range(offsets[source], offsets[source+1]):
+            if streams and not infected[starts[s] + j - offsets[source]]:
+                continue
+            e = edges[j]
+            target = p2[e] if p1[e] == source else p1[e]
+            if not streams:
+                sus = rel_sus[target]
+                if sus == 0:
+                    continue
+                if get_state(flags, quar, _quar_bit, target):
+                    sus *= quar_factor
+                prob = beta_l * layer_betas[e] * trans * sus
+                if prob <= 0 or np.random.random() >= prob: # Compute the actual infection
+                    continue
+            if count == n_alloc: # Out of room, double the size of the output arrays
+                n_alloc *= 2
+                source_inds = np.resize(source_inds, n_alloc)
+                target_inds = np.resize(target_inds, n_alloc)
+            source_inds[count] = source
+            target_inds[count] = target
+            count += 1
+    return source_inds[:count], target_inds[:count]
+
+
+@nb.njit((nbint[:], nbint[:], nb.int64), cache=True)
+def build_edge_index(p1, p2, n): # pragma: no cover
+    '''
+    Numba for Layer.get_index(): a compressed sparse row (CSR) index from each
+    person to the edges they are part of, in either position. The edges of person
+    i are edges[offsets[i]:offsets[i+1]], in ascending order.
+
+    Args:
+        p1 (int[]): the p1 array of the layer
+        p2 (int[]): the p2 array of the layer
+        n (int): the number of people; must be greater than any index in p1 or p2
+
+    Returns:
+        offsets (int[]): an array of length n+1 of offsets into edges
+        edges (int[]): the edge indices, grouped by person
+    '''
+    n_edges = len(p1)
+    offsets = np.zeros(n+1, dtype=np.int64)
+    for e in range(n_edges): # Count the number of edges for each person
+        offsets[p1[e]+1] += 1
+        offsets[p2[e]+1] += 1
+    for i in range(n): # Convert to offsets
+        offsets[i+1] += offsets[i]
+    fill = offsets[:-1].copy()
+    edges = np.empty(2*n_edges, dtype=np.int64)
+    for e in range(n_edges): # Fill in the edges; since they're processed in order, each person's edges are sorted
+        edges[fill[p1[e]]] = e
+        fill[p1[e]] += 1
+        edges[fill[p2[e]]] = e
+        fill[p2[e]] += 1
+    return offsets, edges
+
+
+@nb.njit((nbint[:], nbint[:], nbinds), cache=True)
 def find_contacts(p1, p2, inds): # pragma: no cover
     """
     Numba for Layer.find_contacts()
@@ -113,6 +636,76 @@ def find_contacts(p1, p2, inds): # pragma: no cover
     return pairing_partners
 
 
+@nb.njit((nb.int64[:], nb.int64[:], nbint[:], nbint[:], nbinds), cache=True)
+def find_contacts_index(offsets, edges, p1, p2, inds): # pragma: no cover
+    """
+    Numba for Layer.find_contacts() using the edge index from Layer.get_index(),
+    so only the edges of the specified people are checked. Returns an unsorted
+    array of pairing partners, which may contain duplicates. Indices not in the
+    index (i.e. people without contacts) are skipped.
+    """
+    n = len(offsets) - 1
+    count = 0
+    for i in inds: # Count the edges first so the output can be preallocated
+        if 0 <= i < n:
+            count += offsets[i+1] - offsets[i]
+    pairing_partners = np.empty(count, dtype=p1.dtype)
+    count = 0
+    for i in inds:
+        if 0 <= i < n:
+            for k in range(offsets[i], offsets[i+1]):
+                e = edges[k]
+                pairing_partners[count] = p2[e] if p1[e] == i else p1[e]
+                count += 1
+    return pairing_partners
+
+
+@nb.njit(             (nbint, nbinds,      nbfloat[:], nbfloat[:], nbfloat[:], nbfloat[:], nbfloat[:,:], nbfloat[:,:], nbfloat[:],      nbfloat[:],       nbfloat[:],  nbfloat[:],    nbfloat[:],     nbfloat[:], nbfloat[:],  nbfloat[:],  nbfloat[:],  nbfloat[:],   nbfloat[:]), cache=True)
+def compute_prognoses(t,     inds,        symp_probs, sev_probs,  crit_probs, death_probs, draws,        durs,         date_infectious, date_symptomatic, date_severe, date_critical, date_recovered, date_dead,  dur_exp2inf, dur_inf2sym, dur_sym2sev, dur_sev2crit, dur_disease): # pragma: no cover
+    '''
+    Numba for People.infect() with batch_infect: walk each newly infected person
+    down the prognosis tree (asymptomatic, mild, severe, critical, dead) and set
+    their dates and durations in place.
+
+    Args:
+        t (int): the current timestep
+        inds (int[]): the people being infected
+        symp_probs, sev_probs, crit_probs, death_probs (float[]): the probability of each outcome, one per infection, conditional on reaching the previous one
+        draws (float[4,:]): uniform random numbers for the four branches, in the same order as the probabilities
+        durs (float[9,:]): sampled durations for exp2inf, asym2rec, inf2sym, mild2rec, sym2sev, sev2rec, sev2crit, crit2rec, and crit2die
+        date_*, dur_* (float[]): the people's arrays to update
+    '''
+    for j in range(len(inds)):
+        i = inds[j]
+        dur_exp2inf[i] = durs[0,j]
+        date_infectious[i] = durs[0,j] + t
+        if draws[0,j] >= symp_probs[j]: # Asymptomatic
+            date_recovered[i] = date_infectious[i] + durs[1,j]
+            dur_disease[i] = dur_exp2inf[i] + durs[1,j]
+            continue
+        dur_inf2sym[i] = durs[2,j]
+        date_symptomatic[i] = date_infectious[i] + dur_inf2sym[i]
+        if draws[1,j] >= sev_probs[j]: # Mild
+            date_recovered[i] = date_symptomatic[i] + durs[3,j]
+            dur_disease[i] = dur_exp2inf[i] + dur_inf2sym[i] + durs[3,j]
+            continue
+        dur_sym2sev[i] = durs[4,j]
+        date_severe[i] = date_symptomatic[i] + dur_sym2sev[i]
+        if draws[2,j] >= crit_probs[j]: # Severe, but not critical
+            date_recovered[i] = date_severe[i] + durs[5,j]
+            dur_disease[i] = dur_exp2inf[i] + dur_inf2sym[i] + dur_sym2sev[i] + durs[5,j]
+            continue
+        dur_sev2crit[i] = durs[6,j]
+        date_critical[i] = date_severe[i] + dur_sev2crit[i]
+        if draws[3,j] >= death_probs[j]: # Critical, but recovers
+            date_recovered[i] = date_critical[i] + durs[7,j]
+            dur_disease[i] = dur_exp2inf[i] + dur_inf2sym[i] + dur_sym2sev[i] + dur_sev2crit[i] + durs[7,j]
+        else: # Dies
+            date_dead[i] = date_critical[i] + durs[8,j]
+            dur_disease[i] = dur_exp2inf[i] + dur_inf2sym[i] + dur_sym2sev[i] + dur_sev2crit[i] + durs[8,j]
+    return
+
+
 #%% Sampling and seed methods
 
 __all__ += ['sample', 'get_pdf', 'set_seed']
@@ -227,6 +820,12 @@ def get_pdf(dist=None, par1=None, par2=None):
     return pdf
 
 
+@nb.njit((nbint,), cache=True)
+def set_seed_numba(seed): # pragma: no cover
+    ''' Reset Numba's random number stream; defined here so it is only compiled once '''
+    return np.random.seed(seed)
+
+
 def set_seed(seed=None):
     '''
     Reset the random seed -- complicated because of Numba, which requires special
@@ -237,18 +836,11 @@ def set_seed(seed=None):
         seed (int): the random seed
     '''
 
-    @nb.njit((nbint,), cache=True)
-    def set_seed_numba(seed):
-        return np.random.seed(seed)
-
-    def set_seed_regular(seed):
-        return np.random.seed(seed)
-
     # Dies if a float is given
     if seed is not None:
         seed = int(seed)
 
-    set_seed_regular(seed) # If None, reinitializes it
+    np.random.seed(seed) # If None, reinitializes it
     if seed is None: # Numba can't accept a None seed, so use our just-reinitialized Numpy stream to generate one
         seed = np.random.randint(1e9)
     set_seed_numba(seed)
@@ -260,7 +852,7 @@ def set_seed(seed=None):
 #%% Probabilities -- mostly not jitted since performance gain is minimal
 
 __all__ += ['n_binomial', 'binomial_filter', 'binomial_arr', 'n_multinomial',
-            'poisson', 'n_poisson', 'n_neg_binomial', 'choose', 'choose_r', 'choose_w']
+            'poisson', 'n_poisson', 'n_neg_binomial', 'choose', 'choose_r', 'choose_r_inplace', 'choose_w']
 
 def n_binomial(prob, n):
     '''
@@ -418,6 +1010,27 @@ def choose_r(max_n, n):
     return np.random.choice(max_n, n, replace=True)
 
 
+@nb.njit((nbint, nbint[:]), cache=True)
+def choose_r_inplace(max_n, out): # pragma: no cover
+    '''
+    Choose a subset of items (e.g., people), with replacement, writing them into
+    an existing array rather than allocating a new one. Gives the same values as
+    choose_r(max_n, len(out)).
+
+    Args:
+        max_n (int): the total number of items
+        out (array): the array to fill
+
+    **Example**::
+
+        choices = np.empty(10, dtype=cv.default_int)
+        cv.choose_r_inplace(5, choices) # choose 10 out of 5 people with equal probability (with repeats)
+    '''
+    for i in range(len(out)):
+        out[i] = np.random.randint(0, max_n)
+    return
+
+
 def choose_w(probs, n, unique=True):
     '''
     Choose n items (e.g. people), each with a probability from the distribution probs.
@@ -140,6 +140,29 @@ def test_data_interventions():
     return
 
 
+def test_clip_edges_inplace():
+    sc.heading('Testing clipping edges in place')
+
+    # Clipping in place should remove the same number of edges, and restore the original edges
+    pars = dict(pop_size=2000, pop_type='hybrid', n_days=40, verbose=verbose)
+    sim = cv.Sim(pars, interventions=[cv.clip_edges([10, 20, 30], [0.3, 0.6, 1.0], layers=['s', 'w'], inplace=True), cv.contact_tracing()])
+    sim.initialize()
+    orig = {lkey:sorted(zip(sim.people.contacts[lkey]['p1'], sim.people.contacts[lkey]['p2'])) for lkey in ['s', 'w']}
+    n_orig = {lkey:len(edges) for lkey,edges in orig.items()}
+    sim.run(until=15)
+    for lkey in ['s', 'w']:
+        assert len(sim.people.contacts[lkey]) == n_orig[lkey] - int((1 - 0.3)*n_orig[lkey])
+
+    # If the layer is replaced, the edges that were removed should still be restored
+    layer = sim.people.contacts['s']
+    sim.people.contacts['s'] = cv.Layer(**{key:layer[key].copy() for key in layer.keys()})
+    sim.run()
+    for lkey in ['s', 'w']:
+        assert sorted(zip(sim.people.contacts[lkey]['p1'], sim.people.contacts[lkey]['p2'])) == orig[lkey]
+
+    return sim
+
+
 #%% Run as a script
 if __name__ == '__main__':
 
@@ -149,6 +172,7 @@ if __name__ == '__main__':
 
     test_all_interventions()
     test_data_interventions()
+    test_clip_edges_inplace()
 
     sc.toc(T)
     print('Done.')
\ No newline at end of file
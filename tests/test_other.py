@@ -6,6 +6,7 @@ corner cases or otherwise not part of major workflows.
 #%% Imports and settings
 import os
 import pytest
+import numpy as np
 import sciris as sc
 import covasim as cv
 
@@ -104,6 +105,17 @@ def test_base():
     df = hospitals_layer.to_df()
     hospitals_layer.from_df(df)
 
+    # Edge index
+    layer = cv.Layer(p1=[0, 1, 2, 0], p2=[1, 2, 3, 3], beta=[1, 1, 1, 1])
+    offsets, edges = layer.get_index(5)
+    assert list(edges[offsets[0]:offsets[1]]) == [0, 3]
+    assert list(edges[offsets[2]:offsets[3]]) == [1, 2]
+    assert offsets[4] == offsets[5] # Person 4 has no contacts
+    assert layer.get_index(5)[1] is edges # Index is reused
+    layer.append(dict(p1=[4], p2=[0], beta=[1]))
+    offsets, edges = layer.get_index(5)
+    assert list(edges[offsets[0]:offsets[1]]) == [0, 3, 4] # Index is rebuilt
+
     # Tidy up
     remove_files(json_path, sim_path)
 
@@ -208,6 +220,19 @@ def test_people():
     for person in [25, 79]:
         sim.people.story(person)
 
+    # Test the infection log
+    log = sim.people.infection_log
+    entries = log.to_list()
+    assert len(entries) == len(log) == sim.results['cum_infections'][-1]
+    assert entries[0]['source'] is None and log.source[0] == -1 # Seed infection
+    assert [e['target'] for e in log] == log.target.tolist()
+    assert log[-1] == entries[-1]
+    log2 = cv.InfectionLog(entries) # Convert from a list of dicts
+    log2.append(dict(source=1, target=2, date=3, layer='a'))
+    assert np.array_equal(log2.target[:-1], log.target)
+    assert log2[-1] == dict(source=1, target=2, date=3, layer='a')
+    assert len(log2.to_df()) == len(log)+1
+
     return
 
 
@@ -3,8 +3,13 @@ Simple example usage for the Covid-19 agent-based model
 '''
 
 #%% Imports and settings
+import io
 import os
+import pickle
+import copyreg
 import pytest
+import numpy as np
+import tracemalloc
 import sciris as sc
 import covasim as cv
 
@@ -134,6 +139,661 @@ def test_dynamic_resampling(do_plot=False): # If being run via pytest, turn off
     return sim
 
 
+def test_trans_mode():
+    sc.heading('Test transmission modes')
+
+    # Fused and sparse transmission should be statistically equivalent to the default
+    pars = dict(pop_size=5000, pop_type='hybrid', n_days=40, verbose=0)
+    n_inf = sc.objdict(layered=0, fused=0, sparse=0)
+    for mode in n_inf.keys():
+        for seed in range(4):
+            sim = cv.Sim(pars, trans_mode=mode, rand_seed=seed)
+            sim.run()
+            n_inf[mode] += sim.results['cum_infections'][-1]
+    for mode in ['fused', 'sparse']:
+        assert 0.5 < n_inf[mode]/n_inf.layered < 2.0, f'Transmission mode "{mode}" gave {n_inf[mode]} infections vs. {n_inf.layered} for layered'
+
+    # Counter-based random streams should be reproducible for each mode
+    for mode in n_inf.keys():
+        results = [cv.Sim(pars, trans_mode=mode, rand_streams=True).run(output=True) for i in range(2)]
+        assert results[0]['cum_infections'][-1] == results[1]['cum_infections'][-1]
+
+    # Check that infections are attributed to the correct layers
+    layers = set([entry['layer'] for entry in sim.people.infection_log])
+    assert layers.issubset(set(sim.people.contacts.keys()) | {'seed_infection', 'importation'})
+
+    # Check that invalid modes are caught
+    with pytest.raises(ValueError):
+        cv.Sim(pars, trans_mode='invalid').initialize()
+
+    return sim
+
+
+def test_event_calendar():
+    sc.heading('Test event calendar')
+
+    # The event calendar should give identical results to checking every day
+    pars = dict(pop_size=5000, n_days=60, verbose=0, interventions=cv.test_prob(symp_prob=0.1))
+    s1 = cv.Sim(pars)
+    s2 = cv.Sim(pars, event_calendar=True)
+    for sim in [s1, s2]:
+        sim.run()
+    for key in ['infectious', 'symptomatic', 'severe', 'critical', 'dead', 'recovered']:
+        assert np.array_equal(s1.people[key], s2.people[key]), f'Event calendar gave different results for "{key}"'
+    assert s1.summary == s2.summary
+    assert len(s2.people._events) > 0 # Events scheduled after the end of the sim are still stored
+
+    return s2
+
+
+def test_stock_counts():
+    sc.heading('Test stock counting methods')
+
+    # Running counts should give identical results to recounting
+    pars = dict(pop_size=5000, n_days=60, verbose=0, interventions=cv.test_prob(symp_prob=0.1))
+    s1 = cv.Sim(pars)
+    s2 = cv.Sim(pars, stock_counts='check')
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # Changing a state without using set_state() should be caught
+    s3 = cv.Sim(pars, stock_counts='check', n_days=20)
+    s3.run(until=10)
+    s3.people.severe[:100] = True
+    with pytest.raises(RuntimeError):
+        s3.run()
+
+    return s2
+
+
+def test_batch_infect():
+    sc.heading('Test batched infection')
+
+    # Batched infections should be reproducible in every transmission mode, and give similar results to the default
+    pars = dict(pop_size=5000, n_days=60, verbose=0)
+    base = cv.Sim(pars).run(output=True)['cum_infections'][-1]
+    for trans_mode in ['layered', 'sparse', 'fused']:
+        s1, s2 = [cv.Sim(pars, batch_infect=True, trans_mode=trans_mode) for i in range(2)]
+        for sim in [s1, s2]:
+            sim.run()
+        assert s1.summary == s2.summary
+        assert 0.5*base < s1.results['cum_infections'][-1] < 2*base
+
+    # Each person's dates should follow the prognosis tree
+    ppl = s1.people
+    inds = cv.true(ppl.exposed | ppl.recovered | ppl.dead)
+    assert np.all(np.isnan(ppl.date_recovered[inds]) != np.isnan(ppl.date_dead[inds])) # Everyone either recovers or dies
+    assert np.all(ppl.date_infectious[inds] >= ppl.date_exposed[inds])
+    dead = cv.defined(ppl.date_dead)
+    assert np.all(~np.isnan(ppl.date_critical[dead])) and np.all(np.isnan(ppl.date_recovered[dead]))
+    assert np.allclose(ppl.dur_disease[dead], (ppl.date_dead - ppl.date_exposed)[dead])
+
+    return s1
+
+
+def test_dynam_inplace():
+    sc.heading('Test in-place dynamic layers')
+
+    # Regenerating dynamic layers in place should give identical results, including for layers that are not last
+    pars = dict(pop_size=5000, n_days=40, pop_type='hybrid', verbose=0, dynam_layer=dict(h=0, s=0, w=1, c=1))
+    s1 = cv.Sim(pars)
+    s2 = cv.Sim(pars, dynam_inplace=True)
+    s3 = cv.Sim(pars, dynam_inplace=True, trans_mode='sparse')
+    s4 = cv.Sim(pars, trans_mode='sparse')
+    for sim in [s1, s2, s3, s4]:
+        sim.run()
+    assert s1.summary == s2.summary
+    assert s3.summary == s4.summary
+    assert s2.people.contacts.keys() == s1.people.contacts.keys()
+
+    # The arrays should be reused
+    p1 = s2.people.contacts['c']['p1']
+    s2.people.update_contacts()
+    assert s2.people.contacts['c']['p1'] is p1
+
+    return s2
+
+
+def test_dynam_pool():
+    sc.heading('Test pools of dynamic networks')
+
+    # Each day should use one of the pre-generated networks, without modifying it
+    pars = dict(pop_size=5000, n_days=40, pop_type='hybrid', verbose=0, dynam_layer=dict(c=1), dynam_pool=3)
+    s1 = cv.Sim(pars, interventions=cv.clip_edges(days=20, changes=0.5, layers='c'))
+    s2 = cv.Sim(pars)
+    for sim in [s1, s2]:
+        sim.run()
+    pool = s1.people._dynam_pool['c']
+    assert len(pool) == 3
+    assert all([len(entry) == len(pool[0]) for entry in pool]) # Clipping edges should not have affected the pool
+    assert any([s2.people.contacts['c']['p1'] is entry['p1'] for entry in s2.people._dynam_pool['c']])
+
+    # Results should be reproducible, and similar to generating a new network each day
+    s3 = cv.Sim(pars)
+    s4 = cv.Sim(pars, dynam_pool=0)
+    for sim in [s3, s4]:
+        sim.run()
+    assert s2.summary == s3.summary
+    assert 0.5*s4.results['cum_infections'][-1] < s2.results['cum_infections'][-1] < 2*s4.results['cum_infections'][-1]
+
+    return s2
+
+
+def test_packed_states():
+    sc.heading('Test packed states')
+
+    # Packed states should give identical results
+    pars = dict(pop_size=5000, n_days=60, verbose=0, interventions=[cv.test_prob(symp_prob=0.1), cv.contact_tracing(trace_probs=0.5)])
+    s1 = cv.Sim(pars)
+    s2 = cv.Sim(pars, packed_states=True)
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # The states should behave like boolean arrays
+    ppl = s2.people
+    assert isinstance(ppl.exposed, cv.PackedState)
+    for key in ppl.meta.states:
+        assert np.array_equal(np.asarray(ppl[key]), s1.people[key])
+        assert np.array_equal(ppl.true(key), s1.people.true(key))
+    inds = np.arange(10)
+    ppl.tested[inds] = True
+    ppl.tested[inds[::2]] = False
+    assert ppl.tested[inds].sum() == 5
+    ppl.tested[:] = s1.people.tested
+    assert np.array_equal(~ppl.tested, ~s1.people.tested)
+    assert np.array_equal(ppl.tested & ppl.diagnosed, s1.people.tested & s1.people.diagnosed)
+    assert ppl._flags.nbytes < s1.people.exposed.nbytes*len(ppl.meta.states)/5
+
+    # Transmission should read the packed states directly in every mode, rather than unpacking them
+    n_unpacked = {}
+    to_array = cv.PackedState.__array__
+    for trans_mode in ['layered', 'fused', 'sparse']:
+        sims = [cv.Sim(pars, trans_mode=trans_mode, packed_states=packed) for packed in [False, True]]
+        for sim in sims:
+            sim.initialize()
+        n_unpacked[trans_mode] = 0
+        def counted(self, *args, **kwargs):
+            n_unpacked[trans_mode] += 1
+            return to_array(self, *args, **kwargs)
+        cv.PackedState.__array__ = counted
+        try:
+            for sim in sims:
+                sim.run()
+        finally:
+            cv.PackedState.__array__ = to_array
+        assert sims[0].summary == sims[1].summary
+    assert n_unpacked['fused'] == n_unpacked['sparse'] == n_unpacked['layered']
+
+    return s2
+
+
+def test_int_dates():
+    sc.heading('Test integer dates')
+
+    # Storing dates as whole days should give identical results
+    pars = dict(pop_size=5000, n_days=60, verbose=0, interventions=[cv.test_prob(symp_prob=0.1, quar_policy='both'), cv.contact_tracing(trace_probs=0.5)])
+    s1 = cv.Sim(pars)
+    s2 = cv.Sim(pars, int_dates=True)
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # The dates should behave like float arrays
+    ppl = s2.people
+    assert isinstance(ppl.date_recovered, cv.IntDays)
+    for key in ppl.meta.dates + ppl.meta.durs:
+        assert np.array_equal(np.asarray(ppl[key]), s1.people[key], equal_nan=True)
+    t = 30
+    for op in [np.equal, np.less, np.less_equal, np.greater, np.greater_equal]:
+        assert np.array_equal(op(ppl.date_symptomatic, t), op(s1.people.date_symptomatic, t))
+        assert np.array_equal(op(t, ppl.date_symptomatic), op(t, s1.people.date_symptomatic))
+    assert np.array_equal(ppl.defined('date_dead'), s1.people.defined('date_dead'))
+    assert np.isnan(ppl.date_dead[cv.false(ppl.dead)[0]])
+
+    # Each timestep should not convert everyone's dates to floats
+    s3 = cv.Sim(pop_size=5000, n_days=20, verbose=0, int_dates=True)
+    s3.initialize()
+    to_array = cv.IntDays.__array__
+    n_converted = []
+    def counting_array(self, *args, **kwargs):
+        n_converted.append(len(self))
+        return to_array(self, *args, **kwargs)
+    cv.IntDays.__array__ = counting_array
+    try:
+        for t in range(10):
+            s3.step()
+    finally:
+        cv.IntDays.__array__ = to_array
+    assert not n_converted
+
+    # Non-integer values are rounded up, and out-of-range values raise an error
+    dates = cv.IntDays(3)
+    dates[:] = [1.2, np.nan, -3]
+    assert np.array_equal(dates, [2, np.nan, -3], equal_nan=True)
+    with pytest.raises(OverflowError):
+        dates[0] = 1e6
+
+    return s2
+
+
+def test_people_storage():
+    sc.heading('Test storing people in blocks')
+
+    # Storing the arrays in blocks should give identical results, including with packed states and integer dates
+    pars = dict(pop_size=5000, n_days=60, verbose=0, interventions=[cv.test_prob(symp_prob=0.1), cv.contact_tracing(trace_probs=0.5)])
+    s1 = cv.Sim(pars)
+    s2 = cv.Sim(pars, people_storage='blocks')
+    s3 = cv.Sim(pars, people_storage='blocks', packed_states=True, int_dates=True)
+    for sim in [s1, s2, s3]:
+        sim.run()
+    assert s1.summary == s2.summary == s3.summary
+
+    # Every array should still be a row of a block, including after copying
+    for ppl in [s2.people, s3.people, sc.dcp(s3.people)]:
+        for name,arr in ppl.storage_arrays().items():
+            dtype,row = ppl._block_rows[name]
+            assert np.shares_memory(arr, ppl._blocks[dtype])
+    assert len(s2.people._blocks) == 3 # Integers, floats, and booleans
+
+    # Snapshots should restore everything
+    ppl = s3.people
+    snap = ppl.snapshot()
+    n_rec = ppl.count('recovered')
+    ppl.recovered[:] = True
+    ppl.date_recovered[:] = 0
+    ppl.restore(snap)
+    assert ppl.count('recovered') == n_rec
+    assert np.array_equal(np.asarray(ppl.date_recovered), s1.people.date_recovered, equal_nan=True)
+
+    # Resizing should keep the blocks
+    ppl2 = s2.people + s2.people
+    assert len(ppl2) == 2*len(s2.people)
+    assert np.shares_memory(ppl2.age, ppl2._blocks[ppl2.age.dtype.str])
+    with pytest.raises(ValueError):
+        cv.Sim(pars, people_storage='invalid').initialize()
+
+    return s2
+
+
+def test_memmap():
+    sc.heading('Test memory-mapped storage')
+
+    # Memory-mapped storage should give identical results
+    pars = dict(pop_size=5000, pop_type='hybrid', n_days=60, verbose=0, dynam_layer=dict(c=1))
+    ints = lambda: [cv.test_prob(symp_prob=0.1), cv.contact_tracing(trace_probs=0.5), cv.clip_edges(days=20, changes=0.5, layers='w')]
+    s1 = cv.Sim(pars, interventions=ints())
+    s2 = cv.Sim(pars, interventions=ints(), people_storage='memmap')
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # The blocks and static layers should be memory-mapped, including after copying
+    for ppl in [s2.people, sc.dcp(s2.people)]:
+        assert all([isinstance(block, np.memmap) for block in ppl._blocks.values()])
+        assert isinstance(ppl.contacts['h']['p1'].base, np.memmap)
+        assert not isinstance(ppl.contacts['c']['p1'].base, np.memmap) # Dynamic layers are kept in memory
+    arr = cv.memmap_array(np.arange(10))
+    assert isinstance(arr, np.memmap) and arr.sum() == 45
+
+    # Creating memory-mapped people should not allocate their values in memory first
+    peaks = {}
+    for storage in ['arrays', 'memmap']:
+        tracemalloc.start()
+        ppl = cv.People(cv.make_pars(pop_size=100e3, people_storage=storage, packed_states=True))
+        peaks[storage] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert np.array_equal(ppl.uid, np.arange(len(ppl))) and ppl.susceptible.all() and np.isnan(ppl.date_dead).all()
+    assert peaks['memmap'] < 0.1*peaks['arrays']
+
+    # The static layers should be memory-mapped as soon as the people are created
+    ppl = cv.make_people(cv.Sim(pars, people_storage='memmap'))
+    assert not ppl.initialized
+    assert isinstance(ppl.contacts['h']['p1'].base, np.memmap)
+    assert not isinstance(ppl.contacts['c']['p1'].base, np.memmap)
+
+    return s2
+
+
+def test_people_profile():
+    sc.heading('Test people profiles')
+
+    # Storing fewer fields should give identical results, including with batched prognoses
+    pars = dict(pop_size=5000, n_days=60, verbose=0)
+    ints = lambda: [cv.test_prob(symp_prob=0.1), cv.contact_tracing(trace_probs=0.5)]
+    sims = [cv.Sim(pars, interventions=ints(), people_profile=profile) for profile in ['full', 'standard', 'results']]
+    sims += [cv.Sim(pars, interventions=ints(), people_profile=profile, batch_infect=True) for profile in ['full', 'results']]
+    for sim in sims:
+        sim.run()
+    assert sims[0].summary == sims[1].summary == sims[2].summary
+    assert sims[3].summary == sims[4].summary
+
+    # Fields that aren't stored should give a clear error, and not be included in the keys
+    ppl = sims[2].people
+    assert 'dur_disease' not in ppl.keys() and 'date_exposed' not in ppl.keys()
+    for key in ['dur_disease', 'date_exposed', 'infection_log']:
+        with pytest.raises(AttributeError, match='people profile'):
+            getattr(ppl, key)
+    with pytest.raises(AttributeError, match='people profile'):
+        ppl['dur_disease']
+    assert len(ppl + ppl) == 2*len(ppl)
+    with pytest.raises(ValueError):
+        cv.Sim(pars, people_profile='invalid').initialize()
+
+    # Analyzers and analyses that need fields that aren't stored should fail before running
+    for analyzer in [cv.age_histogram(), cv.daily_stats(verbose=False)]:
+        with pytest.raises(ValueError, match='people profile'):
+            cv.Sim(pars, people_profile='results', analyzers=analyzer).initialize()
+    cv.Sim(pars, people_profile='standard', analyzers=cv.age_histogram()).run() # Stores all the dates it needs
+    cv.Sim(pars, people_profile='results', analyzers=cv.age_histogram(states=['dead', 'diagnosed'])).run()
+    for method in [sims[2].compute_gen_time, sims[2].make_transtree, lambda: sims[2].compute_r_eff(method='outcome')]:
+        with pytest.raises(ValueError, match='people profile'):
+            method()
+
+    return sims[2]
+
+
+def test_index_cache():
+    sc.heading('Test caching indices within each timestep')
+
+    # Caching the indices should give identical results
+    pars = dict(pop_size=5000, n_days=60, verbose=0)
+    ints = lambda: [cv.test_num(daily_tests=200, quar_policy='daily'), cv.test_prob(symp_prob=0.1), cv.contact_tracing(trace_probs=0.5)]
+    s1 = cv.Sim(pars, interventions=ints())
+    s2 = cv.Sim(pars, interventions=ints(), index_cache=True)
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # The same indices should be returned until the state is changed
+    ppl = s2.people
+    inds = ppl.true('diagnosed')
+    assert ppl.true('diagnosed') is inds
+    with pytest.raises(ValueError): # Shared by every caller, so it can't be changed
+        inds[0] = -1
+    ppl.set_state('diagnosed', ppl.false('diagnosed')[:10], True)
+    assert len(ppl.true('diagnosed')) == len(inds) + 10
+    ppl.diagnosed[:] = False # Not changed via set_state(), so the cache must be cleared
+    ppl.clear_index_cache()
+    assert len(ppl.true('diagnosed')) == 0
+
+    return s2
+
+
+def test_date_index():
+    sc.heading('Test looking up dates by day')
+
+    # Indexing the dates should give identical results
+    pars = dict(pop_size=5000, n_days=60, verbose=0)
+    ints = lambda: [cv.test_num(daily_tests=200, quar_policy='both'), cv.test_prob(symp_prob=0.1, test_delay=2), cv.contact_tracing(trace_probs=0.5)]
+    s1 = cv.Sim(pars, interventions=ints())
+    s2 = cv.Sim(pars, interventions=ints(), date_index=True)
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # Past days should be dropped from the index once they can't be looked up again
+    ppl = s2.people
+    assert min(day for key,day in ppl._date_index.keys()) >= ppl.t - 1
+    n_indexed = sum(len(inds) for inds_list in ppl._date_index.values() for inds in inds_list)
+    n_current = sum((ppl[key] >= ppl.t - 1).sum() for key in cv.defaults.indexed_dates)
+    assert n_indexed < 2*n_current
+
+    # The indexed lookups should match checking everyone, including after the dates change
+    for key in cv.defaults.indexed_dates:
+        for day in range(s2['n_days']+3):
+            assert np.array_equal(ppl.on_date(key, day), cv.true(ppl[key] == day))
+    inds = ppl.on_date('date_tested', 30)[:5]
+    ppl.set_date('date_tested', inds, 61)
+    assert np.array_equal(ppl.on_date('date_tested', 61), inds)
+    assert not np.isin(inds, ppl.on_date('date_tested', 30)).any()
+
+    return s2
+
+
+def test_quarantine():
+    sc.heading('Test scheduling quarantine')
+
+    sim = cv.Sim(pop_size=1000, pop_infected=0, n_days=30, quar_period=10, verbose=0)
+    sim.initialize()
+    ppl = sim.people
+    ppl.set_state('diagnosed', np.array([2]), True) # Not eligible for quarantine
+
+    # Later requests for the same person should extend their quarantine, and ineligible people should be skipped
+    ppl.schedule_quarantine([0, 1, 2], start_date=0)
+    ppl.schedule_quarantine([1, 1], start_date=0, period=14)
+    ppl.schedule_quarantine(3, start_date=0, period=5)
+    ppl.schedule_quarantine([0], start_date=2, period=20)
+    assert ppl.check_quar() == 3
+    assert ppl.quarantined[[0, 1, 3]].all() and not ppl.quarantined[2]
+    assert np.array_equal(ppl.date_end_quarantine[[0, 1, 3]], [10, 14, 5])
+    ppl.t = 2
+    assert ppl.check_quar() == 0 # Already in quarantine, so only extended
+    assert ppl.date_end_quarantine[0] == 22 and ppl.date_quarantined[0] == 0
+
+    return sim
+
+
+def test_rewind():
+    sc.heading('Test rewinding a sim')
+
+    # Rewinding should give identical results to a new sim, including after a partial run and with different parameters
+    pars = dict(pop_size=5000, pop_type='hybrid', n_days=60, verbose=0)
+    ints = lambda: [cv.test_prob(symp_prob=0.1), cv.contact_tracing(trace_probs=0.5), cv.clip_edges(days=20, changes=0.5)]
+    s1 = cv.Sim(pars, interventions=ints())
+    s2 = cv.Sim(pars, interventions=ints(), beta=0.02)
+    s3 = cv.Sim(pars, interventions=ints(), rewindable=True)
+    for sim in [s1, s2, s3]:
+        sim.run()
+    sim = s3
+    initial_people = sim._initial_people
+    sim.rewind(rand_seed=2)
+    assert sim._initial_people is initial_people # The people are only copied when they're created
+    sim.run(until=30)
+    sim.rewind(rand_seed=s1['rand_seed'], beta=0.02)
+    sim.run()
+    assert sim.summary == s2.summary
+    sim.rewind(beta=s1['beta'])
+    sim.run()
+    assert sim.summary == s1.summary
+
+    # Population and people storage parameters can't be changed, and the people must have been kept
+    with pytest.raises(ValueError):
+        sim.rewind(pop_size=1000)
+    for key,value in dict(packed_states=True, int_dates=True, people_storage='blocks', people_profile='results', reorder_people='rcm').items():
+        with pytest.raises(ValueError, match=key):
+            sim.rewind(**{key:value})
+    with pytest.raises(ValueError):
+        s1.rewind()
+
+    return sim
+
+
+def test_fast_mode():
+    sc.heading('Test fast mode')
+
+    # Skipping the checks should give identical results, including with functions as interventions and analyzers
+    pars = dict(pop_size=2000, n_days=60, verbose=0)
+    func = lambda sim: None
+    kwargs = lambda: dict(interventions=[cv.test_prob(symp_prob=0.1), cv.contact_tracing(trace_probs=0.5), func], analyzers=[cv.age_histogram(), func])
+    s1 = cv.Sim(pars, **kwargs())
+    s2 = cv.Sim(pars, **kwargs(), fast_mode=True)
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # Invalid interventions should be caught when the sim is initialized, and the time limit should still be used
+    with pytest.raises(ValueError):
+        cv.Sim(pars, fast_mode=True, interventions=['invalid']).initialize()
+    s3 = cv.Sim(pars, fast_mode=True, timelimit=1e-9)
+    s3.run()
+    assert not s3.complete
+
+    # Progress shouldn't be printed on each timestep, even with the default verbose
+    s4 = cv.Sim(pars, **kwargs(), fast_mode=True)
+    s4['verbose'] = cv.make_pars()['verbose']
+    progressbar = sc.progressbar
+    sc.progressbar = lambda *args, **kwargs: pytest.fail('Progress was printed in fast mode')
+    try:
+        s4.run()
+    finally:
+        sc.progressbar = progressbar
+    assert s4.summary == s2.summary
+
+    return s2
+
+
+def test_layer_index():
+    sc.heading('Test layer queries using the edge index')
+
+    # Queries should give the same results with and without the index, which should be reused until the layer changes
+    layer = cv.Layer(p1=[1,2,3,4,6], p2=[2,3,1,4,2], beta=np.ones(5))
+    for build in [False, True]:
+        if build:
+            layer.get_index()
+        assert np.array_equal(layer.find_contacts([1,3]), [1,2,3])
+        assert layer.find_contacts([4, 5, 100], as_array=False) == {4}
+        assert np.array_equal(layer.members, [1,2,3,4,6])
+        assert 6 in layer and 5 not in layer and 100 not in layer
+        assert (layer.valid_index() is not None) == build # Queries shouldn't build an index themselves
+    index = layer._index
+    layer.find_contacts([2])
+    assert layer._index is index
+    layer.append(dict(p1=np.array([5], dtype=cv.default_int), p2=np.array([1], dtype=cv.default_int), beta=np.ones(1, dtype=cv.default_float)))
+    assert layer.valid_index() is None
+    assert 5 in layer
+    assert np.array_equal(layer.find_contacts([1]), [2,3,5])
+
+    # Modifying an array in place shouldn't give stale results, and setting it again should stop the index being used
+    layer['p1'][0] = 4
+    assert np.array_equal(layer.find_contacts([4]), [2,4])
+    layer.get_index()
+    layer['p1'][0] = 1
+    layer['p1'] = layer['p1']
+    assert layer.valid_index() is None
+    assert np.array_equal(layer.find_contacts([4]), [4])
+
+    return layer
+
+
+def test_edge_table():
+    sc.heading('Test storing all layers in a single edge table')
+
+    # Consolidating the layers should give identical results, including with dynamic layers
+    pars = dict(pop_size=2000, pop_type='hybrid', n_days=40, dynam_layer={'c':1}, verbose=0)
+    s1 = cv.Sim(pars)
+    s2 = cv.Sim(pars)
+    s2.initialize()
+    table = s2.people.contacts.consolidate()
+    assert len(table) == len(s2.people.contacts)
+    for l,(lkey,layer) in enumerate(s2.people.contacts.items()):
+        inds = table['layer'] == l
+        assert np.array_equal(table['p1'][inds], layer['p1'])
+        assert np.array_equal(table['p2'][inds], layer['p2'])
+        assert np.shares_memory(table['p1'], layer['p1'])
+    assert s2.people.contacts.edge_table() is table
+    for sim in [s1, s2]:
+        sim.run()
+    assert s1.summary == s2.summary
+
+    # The table should be made again once a layer has been replaced
+    new_table = s2.people.contacts.edge_table()
+    assert new_table is not table
+    assert len(new_table) == len(s2.people.contacts)
+    assert not cv.is_memmap(new_table['p1'])
+
+    # If the layers are stored in files, so should the table be
+    s3 = cv.Sim(pars, people_storage='memmap')
+    s3.initialize()
+    table = s3.people.contacts.consolidate()
+    assert all(cv.is_memmap(table[key]) for key in ['p1', 'p2', 'beta', 'layer'])
+    assert len(table) == len(s3.people.contacts)
+    assert cv.is_memmap(s3.people.contacts['h']['p1']) # The layers are now views of the table
+
+    return s2
+
+
+def test_scalar_beta():
+    sc.heading('Test layers with a single beta for every edge')
+
+    # Storing the beta once should give identical results, including for dynamic layers and layers whose beta isn't 1
+    pars = dict(pop_size=2000, pop_type='hybrid', n_days=40, dynam_layer={'c':1}, dynam_inplace=True, verbose=0)
+    sims = []
+    for scalar_beta in [False, True]:
+        sim = cv.Sim(pars, scalar_beta=scalar_beta, interventions=cv.clip_edges(10, 0.5, layers='w'))
+        sim.initialize()
+        layer = sim.people.contacts['w']
+        layer['beta'] = layer['beta']*0.5
+        if scalar_beta:
+            layer.compact_beta()
+        sim.run()
+        sims.append(sim)
+    assert sims[0].summary == sims[1].summary
+    assert sims[1].people.contacts['w'].scalar_beta() == 0.5
+    assert sims[1].people.contacts['c'].scalar_beta() == 1.0
+    assert sims[1].people.contacts['c']['beta'].strides == (0,)
+
+    # The single beta should be kept when copying or saving
+    for people in [sc.dcp(sims[1].people), sc.loadstr(sc.dumpstr(sims[1].people))]:
+        for lkey,layer in people.contacts.items():
+            orig = sims[1].people.contacts[lkey]
+            assert layer.scalar_beta() == orig.scalar_beta() and layer.meta == orig.meta
+            assert all([np.array_equal(layer[key], orig[key]) for key in orig.keys()])
+        assert people.contacts['w']['beta'].strides == (0,)
+
+    # Layers where the edges have different betas should be unchanged
+    layer = cv.Layer(p1=[0,1,2], p2=[1,2,3], beta=[1.0, 1.0, 0.5])
+    assert not layer.compact_beta()
+    assert layer.scalar_beta() is None
+    layer = cv.Layer(p1=[0,1,2], p2=[1,2,3], beta=0.5)
+    assert layer.scalar_beta() == 0.5
+    popped = layer.pop_inds([0])
+    layer.append(popped)
+    assert layer.scalar_beta() == 0.5 and len(layer['beta']) == 3
+
+    # Layers saved by earlier versions, as a dict plus attributes, should still load
+    pickler = lambda obj: (copyreg.__newobj__, (cv.Layer,), dict(meta=obj.meta, basekey=obj.basekey), None, iter(dict(obj).items()))
+    with io.BytesIO() as f:
+        p = pickle.Pickler(f)
+        p.dispatch_table = {cv.Layer: pickler}
+        p.dump(layer)
+        legacy = pickle.loads(f.getvalue())
+    assert legacy.meta == layer.meta and legacy.basekey == layer.basekey
+    assert all(np.array_equal(legacy[key], layer[key]) for key in layer.keys())
+    assert np.array_equal(legacy.find_contacts([1]), [0,2])
+
+    return sims[1]
+
+
+def test_reorder_people():
+    sc.heading('Test reordering the people')
+
+    # Reordering should give the same people and contacts, with people.uid giving the original indices
+    pars = dict(pop_size=2000, pop_type='hybrid', n_days=30, verbose=0)
+    s1 = cv.Sim(pars)
+    s1.initialize()
+    for method in ['rcm', 'h']:
+        s2 = cv.Sim(pars, reorder_people=method)
+        s2.initialize()
+        p1, p2 = s1.people, s2.people
+        assert np.array_equal(p2.age, p1.age[p2.uid])
+        for lkey in p1.contacts.keys():
+            edges1 = sorted(zip(p1.uid[p1.contacts[lkey]['p1']], p1.uid[p1.contacts[lkey]['p2']]))
+            edges2 = sorted(zip(p2.uid[p2.contacts[lkey]['p1']], p2.uid[p2.contacts[lkey]['p2']]))
+            assert edges1 == edges2
+            assert np.all(np.diff(p2.contacts[lkey]['p1']) >= 0) # Edges are sorted
+        s2.run()
+
+    # Invalid methods, and reordering people who have been initialized, should raise errors
+    with pytest.raises(ValueError):
+        cv.Sim(pars, reorder_people='invalid').initialize()
+    with pytest.raises(RuntimeError):
+        cv.reorder_people(s2.people)
+
+    return s2
+
+
 
 #%% Run as a script
 if __name__ == '__main__':
@@ -148,6 +808,26 @@ if __name__ == '__main__':
     json = test_fileio()
     sim2 = test_sim_data(do_plot=do_plot)
     sim3 = test_dynamic_resampling(do_plot=do_plot)
+    sim4 = test_trans_mode()
+    sim5 = test_event_calendar()
+    sim6 = test_stock_counts()
+    sim7 = test_batch_infect()
+    sim8 = test_dynam_inplace()
+    sim9 = test_dynam_pool()
+    sim10 = test_packed_states()
+    sim11 = test_int_dates()
+    sim12 = test_people_storage()
+    sim13 = test_memmap()
+    sim14 = test_people_profile()
+    sim15 = test_index_cache()
+    sim16 = test_date_index()
+    sim17 = test_quarantine()
+    sim18 = test_rewind()
+    sim19 = test_fast_mode()
+    layer = test_layer_index()
+    sim20 = test_edge_table()
+    sim21 = test_scalar_beta()
+    sim22 = test_reorder_people()
 
     sc.toc(T)
     print('Done.')
@@ -171,6 +171,79 @@ def test_doubling_time():
     return d
 
 
+def test_rand_streams():
+    sc.heading('Counter-based random streams')
+    rng = cv.RandStreams(seed=1)
+    u1 = rng.random('transmission', 1000, 5)
+    u2 = rng.random('transmission', 1000, 5)
+    u3 = rng.random('transmission', 1000, 6)
+    u4 = cv.RandStreams(seed=2).random('transmission', 1000, 5)
+    assert np.array_equal(u1, u2) # Same stream and counters give the same numbers
+    assert not np.array_equal(u1, u3) # Different counters give different numbers
+    assert not np.array_equal(u1, u4) # Different seeds give different numbers
+    assert u1.min() >= 0 and u1.max() < 1
+    assert 0.45 < u1.mean() < 0.55
+    assert rng.generator('testing', 3).random() == rng.generator('testing', 3).random()
+    with pytest.raises(ValueError):
+        rng.key('not_a_stream')
+    return u1
+
+
+def test_viral_load():
+    sc.heading('Sparse viral load')
+    sim = cv.Sim(pop_size=2000, n_days=30, verbose=0)
+    sim.run()
+    ppl = sim.people
+    fl = cv.default_float
+    args = (fl(sim['viral_dist']['frac_time']), fl(sim['viral_dist']['load_ratio']), fl(sim['viral_dist']['high_cap']))
+    full = cv.utils.compute_viral_load(sim.t, ppl.date_infectious, ppl.date_recovered, ppl.date_dead, *args)
+    inds = ppl.true('exposed')
+    load = np.zeros(len(ppl), dtype=fl)
+    cv.utils.compute_viral_load_sparse(sim.t, inds, ppl.date_infectious, ppl.date_recovered, ppl.date_dead, *args, load)
+    assert len(inds)
+    assert np.array_equal(full[inds], load[inds]) # Identical for the people included
+    assert not load[ppl.false('exposed')].any() # Unchanged for everyone else
+    return load
+
+
+def test_stream_transmission():
+    sc.heading('Transmission with counter-based random streams')
+    sim = cv.Sim(pop_size=2000, pop_type='hybrid', n_days=30, rand_streams=True, verbose=0)
+    sim.run(until=20)
+    ppl = sim.people
+    fl = cv.default_float
+    one = fl(1.0)
+    rel_trans, rel_sus = ppl.compute_trans_sus(one, np.ones(len(ppl), dtype=fl), fl(sim['asymp_factor']), one, one)
+    flags, diag, quar = ppl.isolation_states()
+    lkeys = ppl.contacts.keys()
+    keys = np.array([sim.rng.key('transmission', sim.t, l) for l in range(len(lkeys))], dtype=np.uint64)
+    beta = fl(sim['beta'])
+    factors = [np.array([sim[par][lkey] for lkey in lkeys], dtype=fl) for par in ['beta_layer', 'iso_factor', 'quar_factor']]
+
+    # The compiled kernels, which may be parallelized, should match running them in order in Python
+    p1s, p2s, betas = [cv.utils.typed_list([layer[key] for layer in ppl.contacts.values()], nbtype) for key,nbtype in [('p1', cv.defaults.nbint), ('p2', cv.defaults.nbint), ('beta', cv.defaults.nbfloat)]]
+    args = (beta, p1s, p2s, betas, *factors, rel_trans, rel_sus, flags, diag, quar, keys, True)
+    fused = cv.utils.compute_infections_fused(*args)
+    assert len(fused[0])
+    for arr,py_arr in zip(fused, cv.utils.compute_infections_fused.py_func(*args)):
+        assert np.array_equal(arr, py_arr)
+
+    # The sparse kernel should give the same infections in each layer, in a different order
+    sources = rel_trans.nonzero()[0]
+    for l,layer in enumerate(ppl.contacts.values()):
+        offsets, edges = layer.get_index(len(ppl))
+        args = (beta, sources, offsets, edges, layer['p1'], layer['p2'], layer['beta'], factors[0][l], factors[1][l], factors[2][l], rel_trans, rel_sus, flags, diag, quar, keys[l], True)
+        sparse = cv.utils.compute_infections_sparse(*args)
+        for arr,py_arr in zip(sparse, cv.utils.compute_infections_sparse.py_func(*args)):
+            assert np.array_equal(arr, py_arr)
+        in_layer = fused[2] == l
+        assert set(zip(*sparse)) == set(zip(fused[0][in_layer], fused[1][in_layer]))
+
+    return fused
+
+
+
+
 #%% Run as a script
 if __name__ == '__main__':
 
@@ -184,6 +257,9 @@ if __name__ == '__main__':
     people1 = test_choose()
     people2 = test_choose_w()
     dt      = test_doubling_time()
+    streams = test_rand_streams()
+    load    = test_viral_load()
+    fused   = test_stream_transmission()
 
     print('\n'*2)
     sc.toc(T)